@@ -0,0 +1,107 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import metrics
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by (document, query embedding).
+
+    A new question about the same document whose embedding is within
+    `threshold` cosine similarity of a cached one gets that answer and its
+    sources back without retrieval or an LLM call. Entries are evicted
+    least-recently-used beyond `max_entries` and expire after `ttl_seconds`.
+    """
+
+    def __init__(self, threshold=0.92, max_entries=512, ttl_seconds=3600):
+        self.threshold = threshold
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now):
+        if not self.ttl_seconds:
+            return
+        # Insertion order == creation order, so expired entries sit at the
+        # front unless a hit moved them; scan everything to be safe
+        for key in [k for k, e in self._entries.items() if now - e["created"] > self.ttl_seconds]:
+            del self._entries[key]
+            self.expirations += 1
+
+    def lookup(self, doc_key, query_vector):
+        """Best cached entry for `doc_key` above the threshold, or None"""
+        query = self._normalize(query_vector)
+        with self._lock:
+            self._expire(time.time())
+            best_key, best_sim = None, -1.0
+            for key, entry in self._entries.items():
+                if entry["doc_key"] != doc_key:
+                    continue
+                sim = float(np.dot(entry["vector"], query))
+                if sim > best_sim:
+                    best_key, best_sim = key, sim
+            if best_key is not None and best_sim >= self.threshold:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                metrics.inc("rag_answer_cache_requests_total", result="hit")
+                entry = self._entries[best_key]
+                return {
+                    "question": entry["question"],
+                    "answer": entry["answer"],
+                    "sources": entry["sources"],
+                    "similarity": best_sim,
+                }
+            self.misses += 1
+            metrics.inc("rag_answer_cache_requests_total", result="miss")
+            return None
+
+    def store(self, doc_key, question, query_vector, answer, sources=None):
+        with self._lock:
+            self._entries[next(self._ids)] = {
+                "doc_key": doc_key,
+                "question": question,
+                "vector": self._normalize(query_vector),
+                "answer": answer,
+                "sources": sources or [],
+                "created": time.time(),
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, doc_key):
+        """Drop every cached answer for a document (e.g. after it changed)"""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e["doc_key"] == doc_key]:
+                del self._entries[key]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
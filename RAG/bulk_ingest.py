@@ -0,0 +1,314 @@
+"""
+Bulk ingestion: index every PDF under a directory ahead of time.
+
+Each PDF goes through the same pipeline as an upload (iter_ingest) and
+its index is written into the index cache folder under the same key the
+app computes, so uploading any of those files later opens the finished
+index instead of processing it again. Files are spread over a process
+pool; every finished file is appended to a JSONL checkpoint, so an
+interrupted run picks up where it stopped. A file that kills its worker
+(out of memory, a crash in a native library) is recorded as failed in the
+"crash" stage and the run goes on in a new pool. Files already indexed
+with the current settings are skipped by content hash.
+
+    python RAG/bulk_ingest.py archive/ --workers 4
+    python RAG/bulk_ingest.py archive/ --retry-failed
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from metrics import configure_logging, logger, peak_rss_mb, reset_peak_rss, stage_listeners  # noqa: E402
+
+CHECKPOINT_FILE = "bulk_checkpoint.jsonl"
+# Statuses that need no work when the file is unchanged since the record
+SETTLED = ("done", "unchanged", "duplicate")
+
+
+def find_pdfs(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+def read_checkpoint(path):
+    """Latest record per file from a checkpoint (later lines win)"""
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A run killed mid-write leaves a truncated last line
+                continue
+            records[record["path"]] = record
+    return records
+
+
+# ----- worker process -----
+
+def _init_worker(ocr_workers):
+    import rag_utils_ocr
+
+    configure_logging()
+    # Files are already processed in parallel; one OCR process per file
+    # (by default) keeps the machine from being oversubscribed
+    rag_utils_ocr.OCR_WORKERS = ocr_workers
+
+
+def _ingest_file(record, persist_directory, index_dir):
+    """Runs in a worker: index one PDF and return its finished checkpoint record"""
+    from index_cache import IndexCache
+    from rag_utils_ocr import iter_ingest, pdf_collection_name
+
+    failed = []
+
+    def on_stage(name, event):
+        # The innermost stage that raised (ocr rather than extract)
+        if event == "failed" and not failed:
+            failed.append(name)
+
+    stage_listeners.append(on_stage)
+    # Workers take many files: report each file's own peak memory
+    reset_peak_rss()
+    start = time.perf_counter()
+    progress = None
+    try:
+        for progress in iter_ingest(
+            record["path"],
+            persist_directory=persist_directory,
+            collection_name=pdf_collection_name(record["key"]),
+        ):
+            pass
+        IndexCache(persist_dir=index_dir).mark_complete(record["key"])
+        record.update(status="done", pages=progress["pages_done"], chunks=progress["chunks"],
+                      methods=progress["methods"])
+    except Exception as e:
+        if failed:
+            stage = failed[0]
+        elif progress is not None:
+            # Every batch went through but no text came out of any page
+            stage = "extract"
+        else:
+            # Before the first batch: loading the embedding model or opening the file
+            stage = "setup"
+        record.update(status="failed", stage=stage, error=str(e))
+    finally:
+        stage_listeners.remove(on_stage)
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    record["peak_rss_mb"] = round(peak_rss_mb() or 0, 1)
+    # Largest of this file's OCR pool processes, as they reported it
+    record["ocr_peak_rss_mb"] = (progress or {}).get("ocr_peak_rss_mb") or 0.0
+    return record
+
+
+# ----- driver -----
+
+class BulkIngest:
+    """Plans which files need work, runs them and keeps the checkpoint and totals"""
+
+    def __init__(self, directory, index_dir, checkpoint=None, retry_failed=False):
+        from index_cache import IndexCache
+
+        self.directory = directory
+        self.index_cache = IndexCache(persist_dir=index_dir)
+        self.checkpoint = checkpoint or os.path.join(index_dir, CHECKPOINT_FILE)
+        self.retry_failed = retry_failed
+        self.previous = read_checkpoint(self.checkpoint)
+        self.counts = {}
+        self.failures = {}
+        self.pages = 0
+        self.chunks = 0
+        self.peak_rss_mb = 0.0
+        self.ocr_peak_rss_mb = 0.0
+        self._finished = 0
+        self._total = 0
+
+    def _record(self, record):
+        with open(self.checkpoint, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.counts[record["status"]] = self.counts.get(record["status"], 0) + 1
+        if record["status"] == "failed":
+            self.failures[record["stage"]] = self.failures.get(record["stage"], 0) + 1
+        self.pages += record.get("pages", 0)
+        self.chunks += record.get("chunks", 0)
+        self.peak_rss_mb = max(self.peak_rss_mb, record.get("peak_rss_mb", 0))
+        self.ocr_peak_rss_mb = max(self.ocr_peak_rss_mb, record.get("ocr_peak_rss_mb", 0))
+
+    def _resumed(self, path, stat):
+        """True if the checkpoint already settles this exact file"""
+        old = self.previous.get(path)
+        if old is None or old["size"] != stat.st_size or old["mtime"] != stat.st_mtime:
+            return False
+        if old["status"] == "failed":
+            return not self.retry_failed
+        # The index may have been deleted since
+        return old["status"] in SETTLED and self.index_cache.is_complete(old["key"])
+
+    def plan(self):
+        """Checkpoint records of the files that still need indexing"""
+        from index_cache import content_hash
+        from rag_utils_ocr import pdf_index_key
+
+        todo, keys = [], set()
+        for path in find_pdfs(self.directory):
+            stat = os.stat(path)
+            if self._resumed(path, stat):
+                self.counts["resumed"] = self.counts.get("resumed", 0) + 1
+                continue
+            with open(path, "rb") as f:
+                doc_hash = content_hash(f.read())
+            record = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime,
+                      "sha256": doc_hash, "key": pdf_index_key(doc_hash)}
+            if self.index_cache.is_complete(record["key"]):
+                self._record(dict(record, status="unchanged"))
+            elif record["key"] in keys:
+                # Same content under another name: one build serves both
+                self._record(dict(record, status="duplicate"))
+            else:
+                keys.add(record["key"])
+                todo.append(record)
+        return todo
+
+    def _finish(self, record):
+        """Checkpoint and log one file's final record"""
+        self._record(record)
+        self._finished += 1
+        n, total = self._finished, self._total
+        if record["status"] == "done":
+            logger.info(f"✅ [{n}/{total}] {record['path']}: {record['pages']} pages, "
+                        f"{record['chunks']} chunks ({record['seconds']:.1f}s, "
+                        f"peak {record['peak_rss_mb']:.0f} MB)")
+        else:
+            logger.warning(f"❌ [{n}/{total}] {record['path']} failed in "
+                           f"{record['stage']}: {record['error']}")
+
+    def _run_pool(self, records, workers, ocr_workers):
+        """
+        Ingest `records` in a fresh pool with at most `workers` files in
+        flight. If a worker process dies (out of memory, segfault in a native
+        library) the pool is unusable: returns (files not started yet, files
+        that were in flight), else two empty lists.
+        """
+        pending, running = deque(records), {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(ocr_workers,)) as pool:
+            try:
+                while pending or running:
+                    while pending and len(running) < workers:
+                        record = pending.popleft()
+                        future = pool.submit(_ingest_file, record, self.index_cache.prepare_build(record["key"]),
+                                             self.index_cache.persist_dir)
+                        running[future] = record
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    if any(isinstance(f.exception(), BrokenProcessPool) for f in finished):
+                        # Every other file in flight fails the same way
+                        wait(running)
+                        finished = list(running)
+                    crashed = []
+                    for future in finished:
+                        record = running.pop(future)
+                        error = future.exception()
+                        if isinstance(error, BrokenProcessPool):
+                            crashed.append(record)
+                        elif error is not None:
+                            self._finish(dict(record, status="failed", stage="crash", error=str(error)))
+                        else:
+                            self._finish(future.result())
+                    if crashed:
+                        return list(pending), crashed
+            except KeyboardInterrupt:
+                logger.warning("⏹️ Interrupted: finished files are checkpointed, rerun to resume")
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        return [], []
+
+    def run(self, workers, ocr_workers=1):
+        start = time.perf_counter()
+        todo = self.plan()
+        self._total = len(todo)
+        logger.info(f"📚 {len(todo)} PDFs to index with {workers} workers "
+                    f"({sum(self.counts.values())} already done or skipped)")
+        suspects = []
+        while todo:
+            todo, crashed = self._run_pool(todo, workers, ocr_workers)
+            if crashed:
+                logger.warning(f"💥 An ingest worker died with {len(crashed)} files in flight; "
+                               f"continuing in a new pool, those files are retried one at a time")
+                suspects += crashed
+        # Alone in a pool of its own, each suspect either finishes or is the
+        # file that kills its worker
+        for record in suspects:
+            _, crashed = self._run_pool([record], 1, ocr_workers)
+            for record in crashed:
+                self._finish(dict(record, status="failed", stage="crash",
+                                  error="Ingestion worker crashed (out of memory or a native library)"))
+        return self.summary(time.perf_counter() - start)
+
+    def summary(self, seconds):
+        done = self.counts.get("done", 0)
+        minutes = seconds / 60 or 1e-9
+        return {
+            "seconds": round(seconds, 1),
+            "counts": dict(self.counts),
+            "failures_by_stage": dict(self.failures),
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "docs_per_min": round(done / minutes, 2),
+            "pages_per_min": round(self.pages / minutes, 1),
+            # Highest per-file peak of any ingest worker, and of any OCR process
+            "peak_rss_mb": self.peak_rss_mb,
+            "ocr_peak_rss_mb": self.ocr_peak_rss_mb,
+        }
+
+
+def main():
+    from ingest_jobs import DEFAULT_INDEX_DIR
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="folder searched recursively for *.pdf")
+    parser.add_argument("--index-dir", default=os.getenv("INDEX_CACHE_DIR") or DEFAULT_INDEX_DIR,
+                        help="index cache folder the app reads (default: INDEX_CACHE_DIR or ./rag_index)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="PDFs processed in parallel (each loads its own embedding model)")
+    parser.add_argument("--ocr-workers", type=int, default=1, help="OCR processes per PDF")
+    parser.add_argument("--checkpoint", help=f"JSONL progress file (default: <index-dir>/{CHECKPOINT_FILE})")
+    parser.add_argument("--retry-failed", action="store_true", help="retry files that failed in an earlier run")
+    parser.add_argument("--out", help="write the summary as JSON")
+    args = parser.parse_args()
+
+    configure_logging()
+    bulk = BulkIngest(args.directory, args.index_dir, args.checkpoint, args.retry_failed)
+    summary = bulk.run(args.workers, args.ocr_workers)
+
+    counts = summary["counts"]
+    print(f"\n📊 {counts.get('done', 0)} indexed, {counts.get('failed', 0)} failed, "
+          f"{counts.get('unchanged', 0) + counts.get('duplicate', 0)} unchanged/duplicate, "
+          f"{counts.get('resumed', 0)} resumed from checkpoint in {summary['seconds']:.1f}s")
+    print(f"   {summary['docs_per_min']:.1f} docs/min, {summary['pages_per_min']:.0f} pages/min, "
+          f"{summary['pages']} pages, {summary['chunks']} chunks")
+    print(f"   peak memory per file: {summary['peak_rss_mb']:.0f} MB "
+          f"(OCR processes: {summary['ocr_peak_rss_mb']:.0f} MB)")
+    if summary["failures_by_stage"]:
+        print("   failures by stage: " + ", ".join(
+            f"{stage} {count}" for stage, count in sorted(summary["failures_by_stage"].items())
+        ))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
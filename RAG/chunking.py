@@ -0,0 +1,134 @@
+"""
+Page-aware span chunker.
+
+The page texts of a batch are joined once into a shared buffer, and a
+chunk is only (page, start, end) character offsets into it, kept in
+compact arrays. Splitting is faster than RecursiveCharacterTextSplitter
+and every chunk's page (and offset within the page) is exact. Ingestion
+turns the spans into Documents right away (the embedder, the vector
+store and the BM25 index all keep their own strings), so a batch ends up
+using about as much memory as with the recursive splitter.
+
+Boundaries follow the same preference as RecursiveCharacterTextSplitter:
+paragraph, then line, then word, then anywhere. Consecutive chunks share
+up to `chunk_overlap` characters, starting on a word boundary. A chunk
+never crosses a page.
+"""
+from array import array
+
+SEPARATORS = ("\n\n", "\n", " ")
+PAGE_SEPARATOR = "\n\n"
+
+
+class PageBuffer:
+    """Per-page Documents' text joined into one string, with each page's offset"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.offsets = array("q")
+        position = 0
+        for doc in documents:
+            self.offsets.append(position)
+            position += len(doc.page_content) + len(PAGE_SEPARATOR)
+        self.text = PAGE_SEPARATOR.join(doc.page_content for doc in documents)
+
+    def bounds(self, page):
+        start = self.offsets[page]
+        return start, start + len(self.documents[page].page_content)
+
+
+class Chunks:
+    """(page, start, end) spans over a PageBuffer; Documents are built on access"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.pages = array("I")
+        self.starts = array("q")
+        self.ends = array("q")
+
+    def append(self, page, start, end):
+        self.pages.append(page)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def text(self, i):
+        return self.buffer.text[self.starts[i]:self.ends[i]]
+
+    def document(self, i):
+        """Chunk i as a Document carrying its page's metadata plus start_index within the page"""
+        from langchain_core.documents import Document
+
+        page = self.pages[i]
+        metadata = dict(self.buffer.documents[page].metadata)
+        metadata["start_index"] = self.starts[i] - self.buffer.offsets[page]
+        return Document(page_content=self.text(i), metadata=metadata)
+
+    def __getitem__(self, i):
+        return self.document(i)
+
+    def __iter__(self):
+        return (self.document(i) for i in range(len(self)))
+
+    def documents(self):
+        return [self.document(i) for i in range(len(self))]
+
+
+def _skip_space(text, pos, end):
+    while pos < end and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _break(text, start, limit, min_end):
+    """Where to end a chunk starting at `start` that cannot reach past `limit`"""
+    for separator in SEPARATORS:
+        pos = text.rfind(separator, min_end, limit)
+        if pos != -1:
+            return pos
+    # One word longer than the chunk: cut it
+    return limit
+
+
+def _word_start(text, pos, end):
+    while pos < end and not text[pos - 1].isspace():
+        pos += 1
+    return pos
+
+
+def _page_spans(text, lo, hi, chunk_size, chunk_overlap):
+    start = _skip_space(text, lo, hi)
+    while start < hi:
+        limit = start + chunk_size
+        if limit >= hi:
+            end = hi
+        else:
+            # End past start + overlap so the next chunk still moves forward
+            end = _break(text, start, limit, start + chunk_overlap + 1)
+        trimmed = end
+        while trimmed > start and text[trimmed - 1].isspace():
+            trimmed -= 1
+        if trimmed > start:
+            yield start, trimmed
+        if end >= hi:
+            return
+        overlap_start = _word_start(text, max(trimmed - chunk_overlap, start + 1), end)
+        start = _skip_space(text, overlap_start, hi)
+
+
+def split_pages(documents, chunk_size, chunk_overlap):
+    """
+    Chunk per-page Documents (one per page, as extract_page_documents
+    returns them) into Chunks over a shared buffer.
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError(f"❌ chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+    buffer = PageBuffer(documents)
+    chunks = Chunks(buffer)
+    for page in range(len(documents)):
+        lo, hi = buffer.bounds(page)
+        for start, end in _page_spans(buffer.text, lo, hi, chunk_size, chunk_overlap):
+            chunks.append(page, start, end)
+    return chunks
@@ -0,0 +1,224 @@
+"""
+Context assembly: turn retrieved chunks into the prompt's context.
+
+Joining chunks verbatim repeats the CHUNK_OVERLAP characters neighbouring
+chunks share and has no size limit. Instead, in order:
+
+    merge     chunks of the same page that overlap or touch become one span
+              (by their start_index; by matching text for indexes built
+              before chunks carried it)
+    dedupe    drop chunks whose word shingles mostly repeat a better-ranked one
+    mmr       optional: re-order for diversity so the budget drops the most
+              redundant chunks (embeds the chunks, off by default)
+    budget    keep chunks in rank order until CONTEXT_MAX_TOKENS is reached
+
+Tokens are estimated from characters (no tokenizer dependency), which is
+close enough for budgeting.
+"""
+import os
+
+from metrics import log_event, metrics
+
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS") or 3000)
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD") or 0.85)
+CONTEXT_MMR = (os.getenv("CONTEXT_MMR") or "0").lower() in ("1", "true", "yes")
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA") or 0.7)
+
+CHARS_PER_TOKEN = 4
+# Shortest shared text taken as a real overlap when offsets are unknown
+MIN_TEXT_OVERLAP = 30
+SHINGLE_WORDS = 3
+SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _copy(doc, text, **metadata):
+    from langchain_core.documents import Document
+
+    return Document(page_content=text, metadata={**doc.metadata, **metadata})
+
+
+def _span(doc, text, count, **metadata):
+    return doc if count == 1 else _copy(doc, text, merged_chunks=count, **metadata)
+
+
+def _text_overlap(a, b):
+    """Length of the longest suffix of `a` that `b` starts with (0 if below MIN_TEXT_OVERLAP)"""
+    head = b[:MIN_TEXT_OVERLAP]
+    if len(head) < MIN_TEXT_OVERLAP:
+        return 0
+    pos = a.find(head, max(0, len(a) - len(b)))
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(head, pos + 1)
+    return 0
+
+
+def merge_adjacent(docs):
+    """
+    Merge chunks of the same source page that overlap or touch. The merged
+    span keeps the rank of its best chunk; order is otherwise unchanged.
+    """
+    groups = {}
+    for rank, doc in enumerate(docs):
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        groups.setdefault(key, []).append((rank, doc))
+
+    spans = []  # (rank, doc)
+    for members in groups.values():
+        if len(members) == 1:
+            spans.append(members[0])
+            continue
+        if all(isinstance(doc.metadata.get("start_index"), int) for _, doc in members):
+            spans.extend(_merge_by_offset(members))
+        else:
+            spans.extend(_merge_by_text(members))
+    spans.sort(key=lambda span: span[0])
+    return [doc for _, doc in spans]
+
+
+def _merge_by_offset(members):
+    members = sorted(members, key=lambda m: m[1].metadata["start_index"])
+    merged = []
+    rank, doc = members[0]
+    start, text, count = doc.metadata["start_index"], doc.page_content, 1
+    for next_rank, next_doc in members[1:]:
+        next_start = next_doc.metadata["start_index"]
+        end = start + len(text)
+        if next_start <= end:
+            # Overlapping or touching: append only the part not already covered
+            text += next_doc.page_content[end - next_start:]
+            rank, count = min(rank, next_rank), count + 1
+            continue
+        merged.append((rank, _span(doc, text, count, start_index=start)))
+        rank, doc = next_rank, next_doc
+        start, text, count = next_start, next_doc.page_content, 1
+    merged.append((rank, _span(doc, text, count, start_index=start)))
+    return merged
+
+
+def _merge_by_text(members):
+    # No offsets (older index): chain chunks whose text overlaps, in either order
+    pending = list(members)
+    merged = []
+    while pending:
+        rank, doc = pending.pop(0)
+        text, count = doc.page_content, 1
+        grown = True
+        while grown:
+            grown = False
+            for i, (other_rank, other) in enumerate(pending):
+                overlap = _text_overlap(text, other.page_content)
+                if overlap:
+                    text += other.page_content[overlap:]
+                elif _text_overlap(other.page_content, text):
+                    text = other.page_content + text[_text_overlap(other.page_content, text):]
+                else:
+                    continue
+                rank, count = min(rank, other_rank), count + 1
+                pending.pop(i)
+                grown = True
+                break
+        merged.append((rank, _span(doc, text, count)))
+    return merged
+
+
+def _shingles(text):
+    words = text.lower().split()
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def drop_near_duplicates(docs, threshold=None):
+    """
+    Drop chunks whose shingles are mostly contained in a better-ranked chunk
+    (the same passage repeated across pages or documents, boilerplate).
+    """
+    threshold = CONTEXT_DEDUP_THRESHOLD if threshold is None else threshold
+    kept, kept_shingles = [], []
+    for doc in docs:
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & seen) / max(1, len(shingles)) >= threshold for seen in kept_shingles):
+            continue
+        kept.append(doc)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def mmr_select(docs, question, embeddings, lambda_mult=None, k=None):
+    """
+    Maximal marginal relevance: repeatedly pick the chunk most similar to
+    the question and least similar to those already picked.
+    """
+    import numpy as np
+
+    if len(docs) < 3:
+        return docs
+    lambda_mult = CONTEXT_MMR_LAMBDA if lambda_mult is None else lambda_mult
+    k = min(k or len(docs), len(docs))
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in docs]), dtype=np.float32)
+    query = np.asarray(embeddings.embed_query(question), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    query /= np.linalg.norm(query) + 1e-12
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    picked = [int(np.argmax(relevance))]
+    while len(picked) < k:
+        redundancy = similarity[:, picked].max(axis=1)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[picked] = -np.inf
+        picked.append(int(np.argmax(scores)))
+    return [docs[i] for i in picked]
+
+
+def fit_to_budget(docs, max_tokens=None):
+    """
+    Keep chunks in order until the token budget is used up; the chunk that
+    crosses it is cut at a word boundary if a useful part still fits.
+    """
+    max_tokens = CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+    kept, used = [], 0
+    for doc in docs:
+        cost = estimate_tokens(doc.page_content) + (estimate_tokens(SEPARATOR) if kept else 0)
+        if used + cost <= max_tokens:
+            kept.append(doc)
+            used += cost
+            continue
+        room = (max_tokens - used) * CHARS_PER_TOKEN
+        if room >= MIN_TEXT_OVERLAP * 4:
+            text = doc.page_content[:room].rsplit(None, 1)[0]
+            kept.append(_copy(doc, text, truncated=True))
+        break
+    return kept
+
+
+def assemble_context(docs, question=None, max_tokens=None, mmr=None, embeddings=None):
+    """
+    The prompt context for `docs` (in retrieval order): merged, deduplicated,
+    optionally MMR-diversified and fitted to the token budget. Logs and
+    records the tokens saved against joining the chunks verbatim.
+    """
+    raw_tokens = estimate_tokens(SEPARATOR.join(doc.page_content for doc in docs))
+    selected = drop_near_duplicates(merge_adjacent(docs))
+    if (CONTEXT_MMR if mmr is None else mmr) and question:
+        if embeddings is None:
+            from embedding_service import get_embedding_service
+            from rag_utils_ocr import EMBEDDING_MODEL
+
+            embeddings = get_embedding_service(EMBEDDING_MODEL)
+        selected = mmr_select(selected, question, embeddings)
+    selected = fit_to_budget(selected, max_tokens)
+    context = SEPARATOR.join(doc.page_content for doc in selected)
+
+    tokens = estimate_tokens(context)
+    metrics.observe("rag_context_tokens", tokens, help="Estimated prompt context tokens per question")
+    metrics.inc("rag_context_tokens_saved_total", raw_tokens - tokens,
+                help="Estimated context tokens saved by merging, dedup and budgeting")
+    log_event("🧩 Context assembled", chunks=len(docs), spans=len(selected), tokens=tokens,
+              tokens_saved=raw_tokens - tokens)
+    return context
@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import time
+
+from embedding_service import get_embedding_service
+from index_cache import content_hash
+from metrics import logger
+from rag_utils_ocr import (
+    iter_chunk_batches,
+    PdfDocument,
+    extraction_failed,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    CHUNKER,
+    EMBEDDING_MODEL,
+)
+
+MANIFEST_NAME = "manifest.json"
+
+
+class Corpus:
+    """
+    Persistent library of PDFs sharing one on-disk Chroma collection.
+
+    Every chunk carries a `doc_id` in its metadata and a deterministic id
+    (`<doc_id>:<n>`, `<doc_id>#<generation>:<n>` for later versions), so a
+    document can be replaced or dropped without touching the rest. A
+    manifest next to the index records each document's content hash and
+    chunk count; adding a file whose hash and chunking settings are
+    unchanged is a no-op.
+    """
+
+    def __init__(self, directory, collection_name="corpus"):
+        from langchain_community.vectorstores import Chroma
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.RLock()
+        self._manifest = self._read_manifest()
+        self.vectorstore = Chroma(
+            collection_name=collection_name,
+            persist_directory=directory,
+            embedding_function=get_embedding_service(EMBEDDING_MODEL),
+        )
+        self._drop_unfinished()
+
+    # ----- manifest -----
+
+    def _read_manifest(self):
+        if not os.path.exists(self._manifest_path):
+            return {}
+        with open(self._manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _drop_unfinished(self):
+        # A crash mid-add leaves chunks behind with status "indexing"
+        for doc_id, entry in list(self._manifest.items()):
+            if entry.get("status") != "ready":
+                logger.info(f"🧹 Removing half-indexed document '{doc_id}'")
+                self.remove(doc_id)
+            elif entry.get("replacing", {}).get("status") == "ready":
+                # The new version was complete, only the old one's removal was cut short
+                self._replace(doc_id, entry)
+            elif "replacing" in entry:
+                logger.info(f"🧹 Removing half-indexed new version of '{doc_id}'")
+                self._discard_replacement(doc_id, entry)
+
+    @staticmethod
+    def _chunk_ids(doc_id, entry, first=0, count=None):
+        # Each version of a document has its own ids, so a new one can be
+        # indexed while the old one still answers queries
+        prefix = f"{doc_id}#{entry['generation']}" if entry.get("generation") else doc_id
+        count = entry["chunks"] - first if count is None else count
+        return [f"{prefix}:{n}" for n in range(first, first + count)]
+
+    def _delete_chunks(self, doc_id, entry):
+        if entry.get("chunks"):
+            self.vectorstore.delete(ids=self._chunk_ids(doc_id, entry))
+
+    def _replace(self, doc_id, old):
+        """Swap in old["replacing"], now fully indexed, and drop the old version's chunks"""
+        new = old["replacing"]
+        self._delete_chunks(doc_id, old)
+        self._manifest[doc_id] = new
+        self._write_manifest()
+
+    def _discard_replacement(self, doc_id, old):
+        """Drop a new version that failed to index; the old one stays"""
+        self._delete_chunks(doc_id, old.pop("replacing"))
+        self._write_manifest()
+
+    @staticmethod
+    def _settings():
+        return {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "chunker": CHUNKER,
+                "model": EMBEDDING_MODEL}
+
+    # ----- queries -----
+
+    def __contains__(self, doc_id):
+        return doc_id in self._manifest
+
+    def __len__(self):
+        return len(self._manifest)
+
+    def documents(self):
+        """Manifest entries of every indexed document, sorted by id"""
+        # No lock: a long add_pdf holds it, and listing must stay responsive
+        return [dict(entry, doc_id=doc_id) for doc_id, entry in sorted(list(self._manifest.items()))]
+
+    def is_current(self, doc_id, doc_hash):
+        entry = self._manifest.get(doc_id)
+        return (
+            entry is not None
+            and entry.get("status") == "ready"
+            and entry["sha256"] == doc_hash
+            and entry.get("settings") == self._settings()
+        )
+
+    def as_retriever(self, doc_ids=None, **kwargs):
+        """
+        Retriever over the whole library, or only the given documents
+        """
+        search_kwargs = dict(kwargs.pop("search_kwargs", {}))
+        if doc_ids:
+            doc_ids = list(doc_ids)
+            search_kwargs["filter"] = (
+                {"doc_id": doc_ids[0]} if len(doc_ids) == 1 else {"doc_id": {"$in": doc_ids}}
+            )
+        return self.vectorstore.as_retriever(search_kwargs=search_kwargs, **kwargs)
+
+    # ----- updates -----
+
+    def add_pdf(self, source, doc_id=None, name=None, doc_hash=None):
+        """
+        Index one PDF under `doc_id` (defaults to the file name).
+        source: path, bytes or file-like object; it is read into memory once.
+
+        Returns "unchanged" when the same content is already indexed,
+        "updated" when an older version was replaced, "added" otherwise.
+        Only new or changed documents are extracted and embedded.
+        """
+        pdf = PdfDocument(source, name)
+        name = pdf.name
+        doc_id = doc_id or name
+        if doc_hash is None:
+            doc_hash = content_hash(pdf.data)
+
+        with self._lock:
+            if self.is_current(doc_id, doc_hash):
+                logger.info(f"⏭️ '{doc_id}' unchanged, skipping")
+                return "unchanged"
+            old = self._manifest.get(doc_id)
+            status = "updated" if old is not None else "added"
+            if old is not None and old.get("status") != "ready":
+                self.remove(doc_id)
+                old = None
+
+            entry = {
+                "name": name,
+                "sha256": doc_hash,
+                "settings": self._settings(),
+                "status": "indexing",
+                "pages": 0,
+                "chunks": 0,
+                "methods": {},
+                "added_at": time.time(),
+                "generation": old.get("generation", 0) + 1 if old is not None else 0,
+            }
+            if old is None:
+                self._manifest[doc_id] = entry
+            else:
+                # The old version stays searchable until the new one is complete
+                old["replacing"] = entry
+            self._write_manifest()
+
+            try:
+                for batch in iter_chunk_batches(pdf):
+                    chunks = batch["chunks"]
+                    for chunk in chunks:
+                        chunk.metadata["doc_id"] = doc_id
+                        chunk.metadata["source"] = name
+                    if chunks:
+                        ids = self._chunk_ids(doc_id, entry, entry["chunks"], len(chunks))
+                        # Count the ids before writing them so a crash
+                        # mid-batch still knows what to clean up
+                        entry["chunks"] += len(chunks)
+                        self._write_manifest()
+                        self.vectorstore.add_documents(chunks, ids=ids)
+                    for doc in batch["documents"]:
+                        method = doc.metadata["method"]
+                        entry["methods"][method] = entry["methods"].get(method, 0) + 1
+                    entry["pages"] += batch["pages"]
+                if not entry["chunks"]:
+                    raise extraction_failed("+".join(sorted(entry["methods"])))
+            except Exception:
+                if old is None:
+                    self.remove(doc_id)
+                else:
+                    self._discard_replacement(doc_id, old)
+                raise
+            finally:
+                pdf.close()
+
+            entry["status"] = "ready"
+            self._write_manifest()
+            if old is not None:
+                self._replace(doc_id, old)
+            logger.info(f"📚 {status.capitalize()} '{doc_id}': {entry['pages']} pages, {entry['chunks']} chunks")
+            return status
+
+    def remove(self, doc_id):
+        """Drop a document and all of its chunks. Returns False if unknown."""
+        with self._lock:
+            entry = self._manifest.get(doc_id)
+            if entry is None:
+                return False
+            self._delete_chunks(doc_id, entry)
+            if "replacing" in entry:
+                self._delete_chunks(doc_id, entry["replacing"])
+            del self._manifest[doc_id]
+            self._write_manifest()
+            return True
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+from metrics import log_event, metrics
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE") or 64)
+RECENT_QUERIES = 128
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+class EmbeddingService(Embeddings):
+    """
+    One loaded sentence-transformers model shared by every caller in the
+    process. Chunks are encoded in batches of `batch_size` (tunable at any
+    time) and throughput is tracked so it can be shown or logged.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=DEFAULT_BATCH_SIZE):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        self.model_name = model_name
+        self.batch_size = max(1, int(batch_size))
+        start = time.perf_counter()
+        self._model = HuggingFaceEmbeddings(model_name=model_name)
+        self.load_seconds = time.perf_counter() - start
+        # torch already spreads one encode over all cores; serializing calls
+        # keeps concurrent sessions from oversubscribing the CPU
+        self._encode_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.chunks_encoded = 0
+        self.batches_encoded = 0
+        self.encode_seconds = 0.0
+        self.last_batch_seconds = 0.0
+        self.queries_encoded = 0
+        self._recent_queries = OrderedDict()
+        log_event(f"✅ Embedding model '{model_name}' loaded", seconds=round(self.load_seconds, 2))
+
+    def _encode_batch(self, texts):
+        start = time.perf_counter()
+        with self._encode_lock:
+            vectors = self._model.client.encode(
+                texts,
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.chunks_encoded += len(texts)
+            self.batches_encoded += 1
+            self.encode_seconds += elapsed
+            self.last_batch_seconds = elapsed
+        metrics.observe("rag_embed_batch_seconds", elapsed, help="Time to encode one chunk batch")
+        metrics.inc("rag_chunks_embedded_total", len(texts), help="Chunks encoded by the embedding model")
+        return [v.tolist() for v in vectors]
+
+    def embed_documents(self, texts):
+        texts = [t.replace("\n", " ") for t in texts]
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode_batch(texts[i:i + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text):
+        # The answer cache and the retriever both embed the same question
+        # back to back; remember recent ones so the model runs once
+        with self._stats_lock:
+            vector = self._recent_queries.get(text)
+            if vector is not None:
+                self._recent_queries.move_to_end(text)
+                return list(vector)
+        start = time.perf_counter()
+        with self._encode_lock:
+            vector = self._model.embed_query(text)
+        metrics.observe("rag_embed_query_seconds", time.perf_counter() - start, help="Time to embed one question")
+        with self._stats_lock:
+            self.queries_encoded += 1
+            self._recent_queries[text] = vector
+            while len(self._recent_queries) > RECENT_QUERIES:
+                self._recent_queries.popitem(last=False)
+        return list(vector)
+
+    @property
+    def chunks_per_second(self):
+        if not self.encode_seconds:
+            return 0.0
+        return self.chunks_encoded / self.encode_seconds
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "batch_size": self.batch_size,
+                "load_seconds": self.load_seconds,
+                "chunks_encoded": self.chunks_encoded,
+                "batches_encoded": self.batches_encoded,
+                "encode_seconds": self.encode_seconds,
+                "last_batch_seconds": self.last_batch_seconds,
+                "chunks_per_second": self.chunks_per_second,
+                "queries_encoded": self.queries_encoded,
+            }
+
+
+def get_embedding_service(model_name=DEFAULT_MODEL, batch_size=None):
+    """
+    Return the process-wide service for `model_name`, loading it on first use.
+    Passing batch_size retunes the shared instance.
+    """
+    with _services_lock:
+        service = _services.get(model_name)
+        if service is None:
+            service = EmbeddingService(
+                model_name,
+                batch_size if batch_size is not None else DEFAULT_BATCH_SIZE,
+            )
+            _services[model_name] = service
+        elif batch_size is not None:
+            service.batch_size = max(1, int(batch_size))
+    return service
@@ -0,0 +1,171 @@
+import math
+import os
+import pickle
+import re
+from array import array
+from collections import Counter
+from typing import Any
+
+from langchain_core.retrievers import BaseRetriever
+
+# How dense and lexical results are combined: "rrf" (reciprocal rank
+# fusion) or "weighted" (min-max normalized scores, HYBRID_ALPHA = dense share)
+HYBRID_FUSION = os.getenv("HYBRID_FUSION") or "rrf"
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA") or 0.5)
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*", re.UNICODE)
+_SPLIT_RE = re.compile(r"[-./]")
+
+
+def tokenize(text):
+    """
+    Lowercased word tokens. Identifiers such as "AB-1234" or "4.2.1" are
+    kept whole and also split into their parts, so both forms match.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if _SPLIT_RE.search(token):
+            tokens.extend(part for part in _SPLIT_RE.split(token) if part)
+    return tokens
+
+
+def is_identifier_query(query, max_tokens=4):
+    """
+    Short queries that are mostly a code/number ("4.2.1", "part AB-1234",
+    "clause 17(b)") are better answered by exact term match; dense search
+    tends to return anything that looks vaguely similar.
+    """
+    words = query.split()
+    if not words or len(words) > max_tokens:
+        return False
+    return any(any(c.isdigit() for c in w) and (len(w) > 1 or len(words) == 1) for w in words)
+
+
+class BM25Index:
+    """
+    Compact in-memory BM25 inverted index over chunk Documents.
+
+    Postings are two parallel `array`s per term (chunk ids, term counts),
+    so a few hundred thousand chunks cost a few MB rather than a dict per
+    posting. Chunks can be appended batch by batch while ingesting.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = []
+        self.doc_lengths = array("I")
+        self.total_length = 0
+        self.postings = {}  # term -> (array of chunk ids, array of term counts)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add_documents(self, docs):
+        for doc in docs:
+            doc_id = len(self.docs)
+            counts = Counter(tokenize(doc.page_content))
+            self.docs.append(doc)
+            length = sum(counts.values())
+            self.doc_lengths.append(length)
+            self.total_length += length
+            for term, count in counts.items():
+                ids, tfs = self.postings.setdefault(term, (array("I"), array("I")))
+                ids.append(doc_id)
+                tfs.append(count)
+
+    def search(self, query, k=4):
+        """[(Document, score)] best first; empty if no query term occurs"""
+        if not self.docs:
+            return []
+        n_docs = len(self.docs)
+        avg_length = self.total_length / n_docs or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, tfs = posting
+            idf = math.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            for doc_id, tf in zip(ids, tfs):
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.docs[doc_id], score) for doc_id, score in best]
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def _doc_key(doc):
+    return (doc.metadata.get("doc_id"), doc.metadata.get("page"), doc.page_content)
+
+
+def _min_max(scored):
+    if not scored:
+        return []
+    values = [score for _, score in scored]
+    low, high = min(values), max(values)
+    span = (high - low) or 1.0
+    return [(doc, (score - low) / span) for doc, score in scored]
+
+
+def fuse(dense, lexical, k, fusion=None, alpha=None, rrf_k=RRF_K):
+    """
+    Merge two ranked [(Document, score)] lists into the top-k Documents.
+    "rrf" only uses ranks; "weighted" blends normalized scores.
+    """
+    fusion = fusion or HYBRID_FUSION
+    alpha = HYBRID_ALPHA if alpha is None else alpha
+    combined = {}
+    docs = {}
+    if fusion == "weighted":
+        for weight, scored in ((alpha, _min_max(dense)), (1 - alpha, _min_max(lexical))):
+            for doc, score in scored:
+                key = _doc_key(doc)
+                docs.setdefault(key, doc)
+                combined[key] = combined.get(key, 0.0) + weight * score
+    else:
+        for scored in (dense, lexical):
+            for rank, (doc, _) in enumerate(scored):
+                key = _doc_key(doc)
+                docs.setdefault(key, doc)
+                combined[key] = combined.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+    best = sorted(combined.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [docs[key] for key, _ in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense (vector store) + lexical (BM25) retrieval, fused.
+    Identifier-like queries take a lexical-only fast path that never calls
+    the embedding model; it falls back to hybrid when nothing matches.
+    """
+
+    vectorstore: Any
+    lexical: Any
+    k: int = 4
+    fetch_k: int = 20
+    fusion: str = HYBRID_FUSION
+    alpha: float = HYBRID_ALPHA
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        if is_identifier_query(query):
+            exact = self.lexical.search(query, self.k)
+            if exact:
+                return [doc for doc, _ in exact]
+
+        lexical = self.lexical.search(query, self.fetch_k)
+        if self.fusion == "weighted":
+            dense = self.vectorstore.similarity_search_with_relevance_scores(query, k=self.fetch_k)
+        else:
+            dense = [(doc, 0.0) for doc in self.vectorstore.similarity_search(query, k=self.fetch_k)]
+        return fuse(dense, lexical, self.k, self.fusion, self.alpha)
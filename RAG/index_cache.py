@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import weakref
+from collections import OrderedDict
+
+from metrics import logger, metrics
+
+COMPLETE_MARKER = ".complete"
+# What index_key() produces: keys also name folders, so nothing else is accepted
+KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def content_hash(data):
+    """SHA-256 of the uploaded PDF bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def index_key(doc_hash, **settings):
+    """
+    Cache key for one built index: the document hash plus every setting
+    that changes the resulting vectors (chunk size, overlap, model...)
+    """
+    payload = json.dumps({"doc": doc_hash, **settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_index_key(key):
+    """True if `key` has the form of an index_key() (e.g. before trusting one from a client)"""
+    return isinstance(key, str) and KEY_PATTERN.fullmatch(key) is not None
+
+
+def _drop_collection(client, name, key):
+    try:
+        client.delete_collection(name)
+        logger.debug(f"🧹 Released in-memory index {key[:12]}")
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to release cached index {key[:12]}: {e}")
+
+
+class IndexCache:
+    """
+    Process-wide LRU cache of built vector stores.
+
+    Streamlit reruns the whole script on every chat message, so without this
+    the same PDF gets extracted, chunked and embedded again for each question.
+    Entries live in memory (at most `max_entries`) and, when `persist_dir` is
+    set, are also written to disk so they survive evictions and restarts.
+    """
+
+    def __init__(self, max_entries=8, persist_dir=None):
+        self.max_entries = max(1, int(max_entries))
+        self.persist_dir = persist_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def persist_path(self, key):
+        """Directory an index for `key` should be persisted to (None if memory-only)"""
+        if not self.persist_dir:
+            return None
+        if not is_index_key(key):
+            raise ValueError(f"❌ Invalid index key: {key!r}")
+        path = os.path.join(self.persist_dir, key)
+        root = os.path.realpath(self.persist_dir)
+        if os.path.dirname(os.path.realpath(path)) != root:
+            raise ValueError(f"❌ Index key {key[:12]} resolves outside {self.persist_dir}")
+        return path
+
+    def _is_complete(self, path):
+        # Ingestion writes into the directory batch by batch, so only trust
+        # it once put() has marked it finished
+        return os.path.isfile(os.path.join(path, COMPLETE_MARKER))
+
+    def prepare_build(self, key):
+        """
+        Persist directory for a fresh build of `key`, cleared of anything an
+        interrupted earlier build left behind (None if memory-only)
+        """
+        path = self.persist_path(key)
+        if path and os.path.isdir(path) and not self._is_complete(path):
+            shutil.rmtree(path, ignore_errors=True)
+        return path
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def mark_complete(self, key):
+        """Flag the on-disk copy of `key` as finished so load() trusts it"""
+        path = self.persist_path(key)
+        if path and os.path.isdir(path):
+            with open(os.path.join(path, COMPLETE_MARKER), "w") as f:
+                f.write("ok")
+
+    def keys_on_disk(self):
+        """Keys of every finished index in persist_dir"""
+        if not self.persist_dir:
+            return []
+        return sorted(
+            name for name in os.listdir(self.persist_dir)
+            if is_index_key(name) and self._is_complete(os.path.join(self.persist_dir, name))
+        )
+
+    def is_complete(self, key):
+        path = self.persist_path(key)
+        return bool(path) and self._is_complete(path)
+
+    def put(self, key, value):
+        self.mark_complete(key)
+        evicted = []
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False))
+        for old_key, old_value in evicted:
+            self._release(old_key, old_value)
+
+    def _release(self, key, value):
+        # In-memory Chroma collections stay alive in the shared client until
+        # deleted, so dropping our reference alone would not free anything.
+        # Other sessions may still be querying the store through their chains,
+        # though: the collection is deleted once the last of them lets go.
+        # Persisted collections are kept on disk and reloaded on the next hit;
+        # FAISS stores are freed with their last reference anyway.
+        store = getattr(value, "vectorstore", value)
+        if self.persist_path(key) is None and hasattr(store, "_collection"):
+            try:
+                weakref.finalize(store, _drop_collection, store._client, store._collection.name, key)
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to release cached index {key[:12]}: {e}")
+
+    def load(self, key, load):
+        """
+        Return the in-memory index for `key`, or reopen a finished on-disk
+        copy with load(persist_directory). None if neither exists.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            metrics.inc("rag_index_cache_requests_total", result="hit")
+            return value
+        path = self.persist_path(key)
+        if not path or not self._is_complete(path):
+            self.misses += 1
+            metrics.inc("rag_index_cache_requests_total", result="miss")
+            return None
+        logger.info(f"♻️ Loading cached index {key[:12]} from disk")
+        value = load(path)
+        self.hits += 1
+        metrics.inc("rag_index_cache_requests_total", result="hit")
+        self.put(key, value)
+        return value
+
+    def get_or_build(self, key, build, load=None):
+        """
+        Return the index for `key`, building it only on a miss.
+
+        build(persist_directory) creates the index (persist_directory is None
+        when the cache is memory-only). load(persist_directory), if given, is
+        used to reopen an index that an earlier run already wrote to disk.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            metrics.inc("rag_index_cache_requests_total", result="hit")
+            return value
+
+        # One lock per key so two sessions uploading the same file wait for a
+        # single build instead of both embedding it.
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                value = self.get(key)
+                if value is not None:
+                    self.hits += 1
+                    metrics.inc("rag_index_cache_requests_total", result="hit")
+                    return value
+
+                if load is not None:
+                    # load() counts the hit or the miss itself
+                    value = self.load(key, load)
+                    if value is not None:
+                        return value
+                else:
+                    self.misses += 1
+                    metrics.inc("rag_index_cache_requests_total", result="miss")
+                value = build(self.prepare_build(key))
+                self.put(key, value)
+                return value
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,229 @@
+"""
+Background ingestion: PDFs are extracted, embedded and indexed by worker
+processes instead of the Streamlit script thread, so a heavy scanned PDF
+never blocks a session and survives the browser being refreshed.
+
+A job is identified by its index cache key (content hash + settings), so
+the same upload submitted twice - by a second session or after a refresh -
+attaches to the job that is already queued, running or done. Workers write
+the index straight into the index cache's persist directory and mark it
+complete; job state, progress and per-stage timings live in one small JSON
+file per job that any session can poll.
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import log_event, metrics, reset_peak_rss, stage_listeners
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS") or 1)  # 0 = ingest inside the session
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS") or 1.5)
+# Where indexes go when INDEX_CACHE_DIR is not set: workers hand them back through disk
+DEFAULT_INDEX_DIR = "rag_index"
+
+ACTIVE_STATES = ("queued", "running")
+JOBS_SUBDIR = "jobs"
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def job_error(job):
+    """A failed job's error as an exception, ValueError for pipeline errors like in-session ingestion"""
+    return (ValueError if job.get("error_type") == "ValueError" else RuntimeError)(job["error"])
+
+
+# ----- worker process -----
+
+def _init_worker():
+    from metrics import configure_logging
+
+    configure_logging()
+
+
+def _run_job(job, data):
+    """Ingest one PDF inside a worker process, recording progress in the job file"""
+    from index_cache import IndexCache
+    from rag_utils_ocr import iter_ingest
+
+    job = dict(job, state="running", started_at=time.time())
+
+    def save(**fields):
+        job.update(fields, stages=metrics.totals("rag_stage_seconds", "stage"), updated_at=time.time())
+        _write_json(job["status_path"], job)
+
+    def on_stage(name, event):
+        save(stage=name)
+
+    # Workers are reused across jobs: per-stage seconds and peak memory are
+    # for this job only
+    metrics.reset()
+    reset_peak_rss()
+    stage_listeners.append(on_stage)
+    try:
+        save()
+        for progress in iter_ingest(
+            data,
+            persist_directory=job["persist_directory"],
+            collection_name=job["collection_name"],
+            name=job["name"],
+        ):
+            save(
+                pages_done=progress["pages_done"],
+                total_pages=progress["total_pages"],
+                chunks=progress["chunks"],
+                methods=progress["methods"],
+                peak_rss_mb=progress["peak_rss_mb"],
+                ocr_peak_rss_mb=progress["ocr_peak_rss_mb"],
+            )
+        IndexCache(persist_dir=job["index_dir"]).mark_complete(job["key"])
+        save(state="done", stage=None, finished_at=time.time())
+    except Exception as e:
+        # "stage" still names the stage that failed
+        save(state="failed", error=str(e), error_type=type(e).__name__, finished_at=time.time())
+    finally:
+        stage_listeners.remove(on_stage)
+    return job["state"]
+
+
+# ----- queue (UI process) -----
+
+class IngestQueue:
+    """
+    Process pool running ingestion jobs for one IndexCache. The cache must
+    persist to disk: that is how finished indexes get back to the UI, which
+    then picks them up with index_cache.load() like any cached index.
+    """
+
+    def __init__(self, index_cache, workers=None):
+        if not index_cache.persist_dir:
+            raise ValueError("❌ Background ingestion needs an index cache with a persist_dir")
+        self.index_cache = index_cache
+        self.workers = max(1, workers or INGEST_WORKERS)
+        self.jobs_dir = os.path.join(index_cache.persist_dir, JOBS_SUBDIR)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._futures = {}
+        self._pool = None
+
+    def _status_path(self, key):
+        return os.path.join(self.jobs_dir, f"{key}.json")
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: forking the Streamlit server would copy its threads and sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._pool
+
+    def job(self, key):
+        """Current state of job `key`, None if it was never submitted"""
+        # Under the lock: submit() writes the "queued" file before it
+        # registers the future, and that job is not an interrupted one
+        with self._lock:
+            job = _read_json(self._status_path(key))
+            if job is not None and job["state"] in ACTIVE_STATES and key not in self._futures:
+                # Left behind by an earlier server process
+                job.update(state="failed", interrupted=True, error_type="RuntimeError",
+                           error="Ingestion was interrupted by a server restart")
+        return job
+
+    def submit(self, key, source, name=None, collection_name="langchain", retry=False):
+        """
+        Queue ingestion of `source` (path, bytes or file-like) under index
+        cache key `key` and return the job. A job already queued, running or
+        done for the same key is returned as is; a failed one only reruns
+        with retry=True (or if a restart interrupted it).
+        """
+        with self._lock:
+            job = self.job(key)
+            if job is not None and (
+                job["state"] in ACTIVE_STATES
+                or (job["state"] == "done" and self.index_cache.is_complete(key))
+                or (job["state"] == "failed" and not retry and not job.get("interrupted"))
+            ):
+                metrics.inc("rag_ingest_jobs_total", help="Background ingestion jobs by outcome",
+                            result="deduplicated")
+                return job
+
+            from rag_utils_ocr import read_pdf_bytes
+
+            data = read_pdf_bytes(source)
+            job = {
+                "key": key,
+                "name": name,
+                "collection_name": collection_name,
+                "state": "queued",
+                "stage": None,
+                "stages": {},
+                "pages_done": 0,
+                "total_pages": None,
+                "chunks": 0,
+                "methods": {},
+                "error": None,
+                "error_type": None,
+                "submitted_at": time.time(),
+                "persist_directory": self.index_cache.prepare_build(key),
+                "index_dir": self.index_cache.persist_dir,
+                "status_path": self._status_path(key),
+            }
+            _write_json(job["status_path"], job)
+            try:
+                future = self._get_pool().submit(_run_job, job, data)
+            except BrokenProcessPool:
+                self._pool = None
+                future = self._get_pool().submit(_run_job, job, data)
+            self._futures[key] = future
+            future.add_done_callback(lambda f, key=key: self._finished(key, f))
+        metrics.inc("rag_ingest_jobs_total", result="submitted")
+        log_event("🧾 Ingestion job queued", job=key[:12], file=name, bytes=len(data), workers=self.workers)
+        return job
+
+    def _finished(self, key, future):
+        try:
+            state = future.result()
+        except Exception as e:
+            # The worker died (out of memory, segfault in a native library)
+            # before it could record the failure itself
+            state = "failed"
+            job = _read_json(self._status_path(key)) or {"key": key}
+            job.update(state="failed", error=f"Ingestion worker crashed: {e}", error_type="RuntimeError",
+                       finished_at=time.time())
+            _write_json(self._status_path(key), job)
+            if isinstance(e, BrokenProcessPool):
+                with self._lock:
+                    self._pool = None
+        with self._lock:
+            self._futures.pop(key, None)
+        metrics.inc("rag_ingest_jobs_total", result=state)
+        log_event("🏁 Ingestion job finished", job=key[:12], state=state)
+
+    def active(self):
+        """Keys of the jobs queued or running in this process"""
+        with self._lock:
+            return list(self._futures)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
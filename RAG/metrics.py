@@ -0,0 +1,296 @@
+"""
+Instrumentation for the ingestion and query paths.
+
+- `logger` / `log_event`: structured logs (plain text or JSON lines, see
+  configure_logging) instead of bare prints
+- `metrics`: process-wide counters and summaries, dumped in Prometheus
+  text format by `metrics.prometheus_text()` or `start_metrics_server()`
+- `stage()`: times a block, records it as rag_stage_seconds{stage=...} and,
+  when RAG_PROFILE names the stage, runs it under cProfile
+- `peak_rss_mb()`: peak resident memory, for the ingestion reports
+"""
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("rag")
+
+# Comma-separated stage names to profile ("all" for every stage), and where
+# the .prof files go (open them with snakeviz or pstats)
+PROFILE_STAGES = {s.strip() for s in (os.getenv("RAG_PROFILE") or "").split(",") if s.strip()}
+PROFILE_DIR = os.getenv("RAG_PROFILE_DIR") or "profiles"
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        message = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += "  " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return message
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=None, fmt=None):
+    """
+    Route the "rag" logger to stderr. RAG_LOG_LEVEL (default INFO) and
+    RAG_LOG_FORMAT ("text" or "json") override the defaults. Safe to call
+    more than once.
+    """
+    level = level or os.getenv("RAG_LOG_LEVEL") or "INFO"
+    fmt = fmt or os.getenv("RAG_LOG_FORMAT") or "text"
+    handler = next((h for h in logger.handlers if getattr(h, "_rag_handler", False)), None)
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler._rag_handler = True
+        logger.addHandler(handler)
+    handler.setFormatter(_JsonFormatter() if fmt == "json" else _TextFormatter("%(message)s"))
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """One structured log line: a short message plus machine-readable fields"""
+    logger.log(level, event, extra={"fields": fields})
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """
+    Minimal thread-safe registry: counters (monotonic totals) and summaries
+    (count / sum / max of observed values). No external dependency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+        self._help = {}
+
+    def inc(self, name, value=1, help=None, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            self._counters[key] = self._counters.get(key, 0) + value
+            if help:
+                self._help.setdefault(name, help)
+
+    def observe(self, name, value, help=None, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            count, total, peak = self._summaries.get(key, (0, 0.0, value))
+            self._summaries[key] = (count + 1, total + value, max(peak, value))
+            if help:
+                self._help.setdefault(name, help)
+
+    def totals(self, name, by):
+        """Summed observations of summary `name` per value of label `by`"""
+        result = {}
+        with self._lock:
+            for (metric, labels), (_, total, _) in self._summaries.items():
+                value = dict(labels).get(by)
+                if metric == name and value is not None:
+                    result[value] = result.get(value, 0.0) + total
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    def snapshot(self):
+        """Plain-dict copy of every metric, for reports and tests"""
+        with self._lock:
+            return {
+                "counters": {self._series(n, l): v for (n, l), v in self._counters.items()},
+                "summaries": {
+                    self._series(n, l): {"count": c, "sum": s, "max": m, "avg": s / c if c else 0.0}
+                    for (n, l), (c, s, m) in self._summaries.items()
+                },
+            }
+
+    @staticmethod
+    def _series(name, labels, suffix=""):
+        if not labels:
+            return name + suffix
+        inner = ",".join(f'{k}="{v}"' for k, v in labels)
+        return f"{name}{suffix}{{{inner}}}"
+
+    def prometheus_text(self):
+        """Prometheus text exposition format (counters, summaries, and gauges of their maxima)"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            summaries = sorted(self._summaries.items())
+            help_text = dict(self._help)
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                if name in help_text:
+                    lines.append(f"# HELP {name} {help_text[name]}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{self._series(name, labels)} {value}")
+        # Summaries may only have _count / _sum samples: the maximum is
+        # exported as a gauge family of its own, <name>_max
+        maxima = {}
+        for (name, labels), (count, total, peak) in summaries:
+            if name not in seen:
+                seen.add(name)
+                if name in help_text:
+                    lines.append(f"# HELP {name} {help_text[name]}")
+                lines.append(f"# TYPE {name} summary")
+            lines.append(f"{self._series(name, labels, '_count')} {count}")
+            lines.append(f"{self._series(name, labels, '_sum')} {total:.6f}")
+            maxima.setdefault(name, []).append(f"{self._series(name, labels, '_max')} {peak:.6f}")
+        for name, samples in maxima.items():
+            if name in help_text:
+                lines.append(f"# HELP {name}_max {help_text[name]} (maximum)")
+            lines.append(f"# TYPE {name}_max gauge")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+# Callables notified as stage(name) starts and ends: listener(name, "start" | "done" | "failed")
+stage_listeners = []
+
+
+def _wants_profile(name):
+    return "all" in PROFILE_STAGES or name in PROFILE_STAGES
+
+
+@contextmanager
+def stage(name, **labels):
+    """
+    Time a pipeline stage: records rag_stage_seconds{stage=name,...}, logs a
+    structured "stage done" line and profiles it if RAG_PROFILE asks for it.
+    The yielded dict can carry extra fields (pages, chunks...) into the log.
+    """
+    fields = {}
+    outcome = "failed"
+    profiler = None
+    if _wants_profile(name):
+        import cProfile
+
+        profiler = cProfile.Profile()
+    for listener in stage_listeners:
+        listener(name, "start")
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield fields
+        outcome = "done"
+    finally:
+        if profiler:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+        metrics.observe("rag_stage_seconds", elapsed, help="Duration of pipeline stages", stage=name, **labels)
+        log_event(f"stage {name}", level=logging.DEBUG, stage=name, seconds=round(elapsed, 4), **labels, **fields)
+        if profiler:
+            _dump_profile(name, profiler)
+        for listener in stage_listeners:
+            listener(name, outcome)
+
+
+def _dump_profile(name, profiler):
+    import pstats
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{name}-{int(time.time() * 1000)}.prof")
+    profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+    log_event(f"profile {name} written", stage=name, path=path)
+    logger.debug(out.getvalue())
+
+
+def reset_peak_rss():
+    """
+    Start this process's peak_rss_mb() over from its current RSS, where the
+    OS allows it (Linux); returns whether it did. Lets a reused worker
+    report the peak of each document rather than of its whole life.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None if it can't be read"""
+    try:
+        # VmHWM honours reset_peak_rss(); ru_maxrss does not
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """
+    Serve metrics.prometheus_text() on http://host:port/metrics from a
+    daemon thread so Prometheus can scrape it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, int(port)), Handler)
+    threading.Thread(target=server.serve_forever, name="rag-metrics", daemon=True).start()
+    log_event("metrics server started", port=int(port))
+    return server
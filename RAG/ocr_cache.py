@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH") or "ocr_cache.sqlite3"
+OCR_CACHE_MB = float(os.getenv("OCR_CACHE_MB") or 256)
+
+# Evict down to this share of the limit, so a full cache doesn't evict on every put
+EVICT_TO = 0.9
+
+
+def page_key(img, settings):
+    """
+    Cache key of one rendered page image: a hash of its pixels, size and
+    mode plus the OCR settings (language, page segmentation, preprocessing,
+    Tesseract version) that change the text read from them. The same page
+    rendered the same way gets the same key in any document.
+
+    img: a (height, width) uint8 grayscale array, hashed straight from its
+    memory (e.g. pixmap_array() over the rendered pixmap), or a PIL image
+    """
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    if hasattr(img, "shape"):
+        # Same key as the equivalent "L" PIL image
+        digest.update(f"L:{img.shape[1]}x{img.shape[0]}".encode("ascii"))
+        if img.flags.c_contiguous:
+            digest.update(img.data)
+        else:
+            # Rows padded to a wider stride: hash them one by one, still no copy
+            for row in img:
+                digest.update(row.data)
+    else:
+        digest.update(f"{img.mode}:{img.width}x{img.height}".encode("ascii"))
+        digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """
+    Persistent page image → OCR text cache in one SQLite file.
+
+    Shared by every process that OCRs (pool workers, the app, bulk ingest):
+    each process opens its own connection and SQLite serializes writers.
+    Entries beyond `max_bytes` of text are evicted least-recently-used.
+    `hits` / `misses` count this process's lookups.
+    """
+
+    def __init__(self, path=OCR_CACHE_PATH, max_mb=OCR_CACHE_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _db(self):
+        # A connection must not cross fork(): a forked pool worker that
+        # inherited this thread's connection opens its own
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.db = None
+            self._local.pid = os.getpid()
+        db = self._local.db
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS ocr ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL, "
+                "blank INTEGER NOT NULL DEFAULT 0)"
+            )
+            if "blank" not in {row[1] for row in db.execute("PRAGMA table_info(ocr)")}:
+                # A cache file from before blank pages were recorded
+                db.execute("ALTER TABLE ocr ADD COLUMN blank INTEGER NOT NULL DEFAULT 0")
+            db.execute("CREATE INDEX IF NOT EXISTS ocr_used ON ocr (used)")
+            db.commit()
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        """Cached (text, blank) for `key`, or None"""
+        db = self._db()
+        row = db.execute("SELECT text, blank FROM ocr WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with db:
+            db.execute("UPDATE ocr SET used = ? WHERE key = ?", (time.time(), key))
+        return row[0], bool(row[1])
+
+    def put(self, key, text, blank=False):
+        """blank: preprocessing found no ink on the page, so it was not OCRed at all"""
+        db = self._db()
+        size = len(text.encode("utf-8"))
+        with db:
+            db.execute("INSERT OR REPLACE INTO ocr (key, text, size, used, blank) VALUES (?, ?, ?, ?, ?)",
+                       (key, text, size, time.time(), int(blank)))
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM ocr").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(db, total - int(self.max_bytes * EVICT_TO))
+
+    def _evict(self, db, excess):
+        freed = 0
+        for key, size in db.execute("SELECT key, size FROM ocr ORDER BY used").fetchall():
+            if freed >= excess:
+                break
+            db.execute("DELETE FROM ocr WHERE key = ?", (key,))
+            freed += size
+            self.evictions += 1
+
+    def stats(self):
+        """{"entries", "bytes"} of the whole cache file"""
+        entries, size = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr").fetchone()
+        return {"entries": entries, "bytes": size}
+
+    def clear(self):
+        with self._db() as db:
+            db.execute("DELETE FROM ocr")
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None and self._local.pid == os.getpid():
+            db.close()
+            self._local.db = None
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_ocr_cache(path=None):
+    """
+    The process-wide OcrCache for `path` (default OCR_CACHE_PATH), or None
+    when OCR_CACHE_MB is 0 (caching disabled)
+    """
+    if OCR_CACHE_MB <= 0:
+        return None
+    path = path or OCR_CACHE_PATH
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = OcrCache(path)
+        return _caches[path]
@@ -0,0 +1,138 @@
+"""
+OCR engines: what reads the text off a prepared page image.
+
+    tesserocr    libtesseract through the tesserocr binding: the API is
+                 initialized once per process, so the language models
+                 (eng, ara...) are loaded once and reused for every page
+    pytesseract  the tesseract executable, started once per page (temp image
+                 file, model load and stdout parsing every time); needs
+                 nothing but the executable
+
+OCR_ENGINE=auto (the default) uses tesserocr when it is installed and can
+load OCR_LANG, and pytesseract otherwise. get_engine() keeps one engine per
+process, so every OCR pool worker initializes its own once and keeps it
+for all the pages it is given.
+"""
+import os
+import shlex
+import threading
+import time
+
+from metrics import log_event, logger
+
+OCR_ENGINE = os.getenv("OCR_ENGINE") or "auto"
+
+
+def parse_config(config):
+    """(psm, oem, variables) of a Tesseract command-line config such as "--psm 6 -c key=value" """
+    psm = oem = None
+    variables = {}
+    args = shlex.split(config or "")
+    for flag, value in zip(args, args[1:]):
+        if flag == "--psm":
+            psm = int(value)
+        elif flag == "--oem":
+            oem = int(value)
+        elif flag == "-c":
+            key, _, setting = value.partition("=")
+            variables[key] = setting
+    return psm, oem, variables
+
+
+class PytesseractEngine:
+    name = "pytesseract"
+
+    def __init__(self, lang, config):
+        self.lang = lang
+        self.config = config
+        self.init_seconds = 0.0
+
+    def image_to_string(self, img):
+        from rag_utils_ocr import get_tesseract
+
+        return get_tesseract().image_to_string(img, lang=self.lang, config=self.config)
+
+    def version(self):
+        from rag_utils_ocr import get_tesseract
+
+        return str(get_tesseract().get_tesseract_version())
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """
+    One initialized TessBaseAPI. It is not thread-safe, so pages from
+    several threads of the same process take turns.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, lang, config, tessdata=None):
+        import tesserocr
+
+        from rag_utils_ocr import tessdata_dir
+
+        psm, oem, variables = parse_config(config)
+        options = {"lang": lang}
+        tessdata = tessdata or tessdata_dir()
+        if tessdata:
+            # tesserocr wants the trailing separator
+            options["path"] = os.path.join(tessdata, "")
+        if psm is not None:
+            options["psm"] = psm
+        if oem is not None:
+            options["oem"] = oem
+        start = time.perf_counter()
+        self._api = tesserocr.PyTessBaseAPI(**options)
+        for key, value in variables.items():
+            self._api.SetVariable(key, value)
+        self.init_seconds = time.perf_counter() - start
+        # "tesseract 5.3.0\n leptonica-..." → "5.3.0"
+        self._version = tesserocr.tesseract_version().split()[1]
+        self._lock = threading.Lock()
+
+    def image_to_string(self, img):
+        with self._lock:
+            self._api.SetImage(img)
+            return self._api.GetUTF8Text()
+
+    def version(self):
+        return self._version
+
+    def close(self):
+        self._api.End()
+
+
+ENGINES = {"tesserocr": TesserocrEngine, "pytesseract": PytesseractEngine}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def create_engine(name, lang, config):
+    """A new engine; "auto" tries tesserocr, then falls back to pytesseract"""
+    if name not in ("auto", *ENGINES):
+        raise ValueError(f"❌ Unknown OCR_ENGINE: {name!r} (expected 'auto', 'tesserocr' or 'pytesseract')")
+    if name in ("auto", "tesserocr"):
+        try:
+            engine = TesserocrEngine(lang, config)
+            log_event("🔤 OCR engine ready", engine=engine.name, lang=lang, seconds=round(engine.init_seconds, 3))
+            return engine
+        except Exception as e:
+            if name == "tesserocr":
+                raise ValueError(f"❌ tesserocr engine failed: {e}")
+            logger.debug(f"   tesserocr not usable ({e}), using pytesseract")
+    return PytesseractEngine(lang, config)
+
+
+def get_engine(lang, config, name=None):
+    """This process's engine for (name, lang, config), created on first use"""
+    # The pid keeps forked pool workers from using the parent's instance
+    key = (os.getpid(), name or OCR_ENGINE, lang, config)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = create_engine(key[1], lang, config)
+        return engine
@@ -0,0 +1,181 @@
+"""
+NumPy page preprocessing for OCR.
+
+    grayscale → downscale to OCR_TARGET_DPI → adaptive binarization
+    → blank check → crop to text regions (photos whited out) → deskew
+
+Blank pages (separator sheets, empty backs of scans) come back as None so
+Tesseract is not run on them at all, and large pictures are removed
+before Tesseract spends time looking for words in them. Tesseract gets a
+clean black-on-white image, so it can skip its own thresholding.
+
+Every step is whole-array NumPy work on the page (or on a grid of small
+tiles of it); only the final resize and rotation go through PIL.
+"""
+import os
+
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI") or 300)
+# Pages with less ink than this share of their pixels are blank
+OCR_BLANK_INK = float(os.getenv("OCR_BLANK_INK") or 0.0005)
+
+# A pixel is ink when darker than this share of its neighbourhood's mean
+INK_RATIO = 0.85
+# Tiles (about 1/6 inch) with more mid-gray than this are pictures, not text
+PHOTO_MIDTONES = 0.35
+# ...and with more ink than this contain text
+TEXT_INK = 0.01
+MAX_SKEW_DEGREES = 5.0
+SKEW_STEP_DEGREES = 0.25
+# Below this the page is left as it is: rotating costs more than it helps
+MIN_SKEW_DEGREES = 0.5
+SKEW_SAMPLE_POINTS = 60000
+
+
+def preprocess_settings():
+    """The settings that change the image handed to Tesseract (part of the OCR cache key)"""
+    return {
+        "target_dpi": OCR_TARGET_DPI,
+        "blank_ink": OCR_BLANK_INK,
+        "ink_ratio": INK_RATIO,
+        "photo_midtones": PHOTO_MIDTONES,
+        "text_ink": TEXT_INK,
+        "max_skew": MAX_SKEW_DEGREES,
+    }
+
+
+def to_gray(img):
+    """
+    (height, width) uint8 array of a page: a grayscale array (e.g.
+    pixmap_array() over a rendered pixmap) is used as it is, a PIL image is
+    copied out once
+    """
+    import numpy as np
+
+    if isinstance(img, np.ndarray):
+        return img
+    return np.asarray(img if img.mode == "L" else img.convert("L"))
+
+
+def downscale(gray, dpi, target_dpi=None):
+    """
+    Resample to target_dpi when the page was rendered noticeably finer;
+    Tesseract's time grows with the pixel count, its accuracy does not.
+    Returns (gray, dpi).
+    """
+    import numpy as np
+    from PIL import Image
+
+    target_dpi = target_dpi or OCR_TARGET_DPI
+    if not dpi or dpi <= target_dpi * 1.15:
+        return gray, dpi
+    scale = target_dpi / dpi
+    size = (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale)))
+    return np.asarray(Image.fromarray(gray).resize(size, Image.Resampling.BOX)), target_dpi
+
+
+def _block_means(values, block):
+    """Mean of each block x block tile (edge tiles padded by repetition)"""
+    import numpy as np
+
+    h, w = values.shape
+    bh, bw = -(-h // block), -(-w // block)
+    padded = np.pad(values, ((0, bh * block - h), (0, bw * block - w)), mode="edge")
+    return padded.reshape(bh, block, bw, block).mean(axis=(1, 3), dtype=np.float32)
+
+
+def _expand(tiles, block, shape):
+    import numpy as np
+
+    return np.repeat(np.repeat(tiles, block, axis=0), block, axis=1)[:shape[0], :shape[1]]
+
+
+def binarize(gray, dpi):
+    """
+    Adaptive threshold: True where a pixel is darker than INK_RATIO of the
+    mean around it (a 3 x 3 neighbourhood of ~1/12 inch blocks), so uneven
+    lighting, shadows and gray paper don't turn into ink.
+    """
+    import numpy as np
+
+    block = max(4, (dpi or 200) // 12)
+    means = _block_means(gray, block)
+    bh, bw = means.shape
+    padded = np.pad(means, 1, mode="edge")
+    means = sum(padded[dy:dy + bh, dx:dx + bw] for dy in range(3) for dx in range(3)) / 9
+    return gray < _expand(means * INK_RATIO, block, gray.shape)
+
+
+def text_tiles(gray, ink, dpi):
+    """
+    (tile size, text mask, photo mask) over a grid of ~1/6 inch tiles:
+    photo tiles are mostly mid-gray, text tiles have some ink and are not photos
+    """
+    import numpy as np
+
+    tile = max(8, (dpi or 200) // 6)
+    photo = _block_means((gray > 64) & (gray < 192), tile) > PHOTO_MIDTONES
+    # Grow by a tile: a picture's edge tiles are only partly mid-gray
+    padded = np.pad(photo, 1)
+    h, w = photo.shape
+    photo = np.logical_or.reduce([padded[dy:dy + h, dx:dx + w] for dy in range(3) for dx in range(3)])
+    text = (_block_means(ink, tile) > TEXT_INK) & ~photo
+    return tile, text, photo
+
+
+def skew_angle(ink):
+    """
+    Text line angle in degrees (counter-clockwise), from the rotation whose
+    horizontal projection of the ink is sharpest (lines fall into few rows)
+    """
+    import numpy as np
+
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+    step = max(1, len(ys) // SKEW_SAMPLE_POINTS)
+    ys, xs = ys[::step].astype(np.float32), xs[::step].astype(np.float32)
+    best, best_score = 0.0, -1.0
+    for angle in np.arange(-MAX_SKEW_DEGREES, MAX_SKEW_DEGREES + 1e-6, SKEW_STEP_DEGREES):
+        theta = np.deg2rad(angle)
+        rows = ys * np.cos(theta) + xs * np.sin(theta)
+        counts = np.bincount((rows - rows.min()).astype(np.int64))
+        score = float(np.dot(counts, counts))
+        if score > best_score:
+            best, best_score = float(angle), score
+    return best
+
+
+def preprocess(img, dpi=None):
+    """
+    Prepare a rendered page (grayscale array or PIL image, see to_gray) for
+    Tesseract. Returns (image, info): image is a binarized, cropped,
+    deskewed PIL "L" image, or None for a blank page; info has "blank",
+    "skew", "photo_tiles" and "kept" (share of the pixels left after
+    cropping).
+    """
+    import numpy as np
+    from PIL import Image
+
+    gray, dpi = downscale(to_gray(img), dpi)
+    ink = binarize(gray, dpi)
+    info = {"blank": False, "skew": 0.0, "photo_tiles": 0, "kept": 1.0}
+
+    tile, text, photo = text_tiles(gray, ink, dpi)
+    info["photo_tiles"] = int(photo.sum())
+    if photo.any():
+        ink &= ~_expand(photo, tile, ink.shape)
+    if ink.mean() < OCR_BLANK_INK or not text.any():
+        info["blank"] = True
+        return None, info
+
+    rows, cols = np.nonzero(text)
+    top, bottom = max(0, (rows.min() - 1) * tile), min(ink.shape[0], (rows.max() + 2) * tile)
+    left, right = max(0, (cols.min() - 1) * tile), min(ink.shape[1], (cols.max() + 2) * tile)
+    ink = ink[top:bottom, left:right]
+    info["kept"] = round(ink.size / gray.size, 3)
+
+    info["skew"] = skew_angle(ink)
+    page = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+    if abs(info["skew"]) >= MIN_SKEW_DEGREES:
+        page = page.rotate(-info["skew"], resample=Image.Resampling.NEAREST, expand=True, fillcolor=255)
+    return page, info
@@ -0,0 +1,150 @@
+"""
+Compact vector storage with exact re-ranking, for large FAISS indexes.
+
+    float16  half-precision vectors (2 bytes/dim)
+    int8     per-dimension scalar quantization (1 byte/dim, trained)
+    binary   one sign bit per dimension around the mean vector (1/32 of float32)
+
+The compact codes stay in RAM and are scanned for `rerank` x k candidates
+(binary codes are coarse, so they oversample the most by default).
+Those candidates are re-scored with exact float32 L2 distances read from
+a memory-mapped .npy file, so only the rows being re-ranked are paged in.
+An index that is never saved spills its vectors to a temp file instead
+(see spill_vectors), so it re-ranks the same way.
+"""
+import json
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+
+QUANTIZATION_MODES = ("float16", "int8", "binary")
+DEFAULT_RERANK = {"float16": 2, "int8": 4, "binary": 40}
+
+CODES_FILE = "index.codes"
+VECTORS_FILE = "index.vectors.npy"
+META_FILE = "index.quant.json"
+
+
+class QuantizedIndex:
+    """
+    Drop-in for the faiss index inside LangChain's FAISS store: it offers
+    the d / ntotal / search / reconstruct calls the store makes. Built once
+    from every vector (int8 needs them to train), so it does not support add.
+    """
+
+    def __init__(self, mode, codes, vectors, center=None, rerank=None):
+        self.mode = mode
+        self.codes = codes
+        self.vectors = vectors
+        self.center = center
+        self.rerank = DEFAULT_RERANK[mode] if rerank is None else rerank
+        if mode == "binary" and not self.rerank:
+            # Hamming counts are no L2 distances: scores and weighted fusion would be wrong
+            raise ValueError("❌ Binary quantization needs re-ranking (FAISS_RERANK > 0)")
+        self.d = vectors.shape[1]
+
+    @property
+    def ntotal(self):
+        return self.codes.ntotal
+
+    @classmethod
+    def build(cls, vectors, mode, rerank=None):
+        import faiss
+
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"❌ Unknown quantization: {mode}")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        d = vectors.shape[1]
+        center = None
+        if mode == "binary":
+            center = vectors.mean(axis=0)
+            codes = faiss.IndexBinaryFlat(d)
+            codes.add(np.packbits(vectors > center, axis=1))
+        else:
+            qtype = faiss.ScalarQuantizer.QT_fp16 if mode == "float16" else faiss.ScalarQuantizer.QT_8bit
+            codes = faiss.IndexScalarQuantizer(d, qtype, faiss.METRIC_L2)
+            codes.train(vectors)
+            codes.add(vectors)
+        return cls(mode, codes, vectors, center, rerank)
+
+    def add(self, vectors):
+        raise RuntimeError("❌ A quantized index is built once; rebuild it to add chunks")
+
+    def spill_vectors(self):
+        """
+        Move the float32 vectors from the heap to a memory-mapped temp file,
+        removed with the index. For indexes that are never saved: in RAM next
+        to the codes they would take more memory than no quantization.
+        """
+        if isinstance(self.vectors, np.memmap):
+            return
+        folder = tempfile.mkdtemp(prefix="rag-quant-")
+        path = os.path.join(folder, VECTORS_FILE)
+        np.save(path, self.vectors)
+        self.vectors = np.load(path, mmap_mode="r")
+        weakref.finalize(self, shutil.rmtree, folder, True)
+
+    def reconstruct(self, i):
+        return np.array(self.vectors[i], dtype=np.float32)
+
+    def _candidates(self, queries, count):
+        if self.mode == "binary":
+            return self.codes.search(np.packbits(queries > self.center, axis=1), count)
+        return self.codes.search(queries, count)
+
+    def search(self, queries, k):
+        """(distances, ids) like faiss: squared L2, -1 for missing results"""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if not self.rerank:
+            distances, ids = self._candidates(queries, k)
+            return distances.astype(np.float32), ids
+        _, candidates = self._candidates(queries, k * self.rerank)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, (query, found) in enumerate(zip(queries, candidates)):
+            # Sorted ids read the memmap front to back
+            found = np.sort(found[found >= 0])
+            exact = ((self.vectors[found] - query) ** 2).sum(axis=1)
+            best = np.argsort(exact)[:k]
+            distances[row, :len(best)] = exact[best]
+            ids[row, :len(best)] = found[best]
+        return distances, ids
+
+    def memory_bytes(self):
+        """Resident size of the codes and of the full vectors (0 when memory-mapped)"""
+        codes = self.ntotal * self.codes.code_size
+        full = 0 if isinstance(self.vectors, np.memmap) else self.vectors.nbytes
+        return {"codes": codes, "full": full}
+
+    def save(self, directory):
+        import faiss
+
+        if self.mode == "binary":
+            faiss.write_index_binary(self.codes, os.path.join(directory, CODES_FILE))
+        else:
+            faiss.write_index(self.codes, os.path.join(directory, CODES_FILE))
+        np.save(os.path.join(directory, VECTORS_FILE), self.vectors)
+        meta = {"mode": self.mode, "center": self.center.tolist() if self.center is not None else None}
+        with open(os.path.join(directory, META_FILE), "w") as f:
+            json.dump(meta, f)
+        # From now on re-rank straight from the file instead of the heap copy
+        self.vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+
+    @classmethod
+    def load(cls, directory, rerank=None):
+        import faiss
+
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+        path = os.path.join(directory, CODES_FILE)
+        codes = faiss.read_index_binary(path) if meta["mode"] == "binary" else faiss.read_index(path)
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        center = np.asarray(meta["center"], dtype=np.float32) if meta["center"] is not None else None
+        return cls(meta["mode"], codes, vectors, center, rerank)
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, META_FILE))
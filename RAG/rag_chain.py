@@ -0,0 +1,200 @@
+import asyncio
+import os
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableGenerator, RunnableParallel, RunnablePassthrough
+
+from context_assembly import assemble_context
+from metrics import log_event, metrics
+
+LLM_MODEL = "llama-3.3-70b-versatile"
+LLM_TEMPERATURE = 0.2
+
+# تصميم الـ Prompt يدوياً (أسرع وأضمن من تحميله من الإنترنت كل مرة)
+PROMPT_TEMPLATE = """Answer the question based only on the following context:
+{context}
+
+Question: {question}
+"""
+prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatGroq. Answers with the start of the retrieved
+    context, streamed word by word with a configurable delay, so the
+    streaming UI and latency numbers can be exercised without network.
+    The async path sleeps with asyncio, so load tests of the API can keep
+    hundreds of fake calls in flight without a thread each.
+    """
+
+    first_token_delay: float = 0.3
+    token_delay: float = 0.02
+    max_words: int = 60
+
+    @property
+    def _llm_type(self):
+        return "fake-rag"
+
+    def _answer(self, messages):
+        text = messages[-1].content if messages else ""
+        context = text.split("Question:")[0].split("context:", 1)[-1]
+        words = context.split()[:self.max_words]
+        return "Based on the document: " + " ".join(words) if words else "I don't know."
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_delay)
+        message = AIMessage(content=self._answer(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_delay)
+        for i, word in enumerate(self._answer(messages).split(" ")):
+            if i:
+                time.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_delay)
+        message = AIMessage(content=self._answer(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_delay)
+        for i, word in enumerate(self._answer(messages).split(" ")):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def use_fake_llm():
+    return os.getenv("RAG_FAKE_LLM", "").lower() in ("1", "true", "yes")
+
+
+def get_llm(api_key=None):
+    """ChatGroq, or the offline FakeChatModel when RAG_FAKE_LLM=1"""
+    if use_fake_llm():
+        # First-token delay override, e.g. for API load tests in another process
+        delay = os.getenv("RAG_FAKE_LLM_DELAY")
+        return FakeChatModel(first_token_delay=float(delay)) if delay else FakeChatModel()
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        groq_api_key=api_key or os.getenv("GROQ_API_KEY"),
+        model_name=LLM_MODEL,
+        temperature=LLM_TEMPERATURE,
+    )
+
+
+def limit_in_flight(llm, semaphore):
+    """
+    `llm` as a runnable that holds `semaphore` (an asyncio.Semaphore) for
+    the whole async call or stream, capping concurrent LLM requests. The
+    sync path is not limited: the Streamlit app makes one call per session.
+    """
+
+    def transform(inputs):
+        yield from llm.transform(inputs)
+
+    async def atransform(inputs):
+        async with semaphore:
+            async for chunk in llm.atransform(inputs):
+                yield chunk
+
+    return RunnableGenerator(transform, atransform)
+
+
+def doc_sources(docs, snippet_chars=200):
+    """Citable, cacheable summary of retrieved chunks"""
+    return [
+        {
+            "source": doc.metadata.get("source"),
+            "page": doc.metadata.get("page"),
+            "snippet": doc.page_content[:snippet_chars],
+        }
+        for doc in docs
+    ]
+
+
+def build_qa_chain(retriever, llm, llm_limit=None):
+    """
+    LCEL chain: question → {"docs", "question", "answer"}.
+    Retrieved docs come out first, then the answer streams token by token
+    under the "answer" key, so callers get sources without a second lookup.
+    llm_limit: asyncio.Semaphore bounding in-flight LLM calls on the async path
+    """
+    if llm_limit is not None:
+        llm = limit_in_flight(llm, llm_limit)
+    answer = (
+        RunnablePassthrough.assign(context=lambda x: assemble_context(x["docs"], x["question"]))
+        | prompt
+        | llm
+        | StrOutputParser()
+    )
+    return RunnableParallel(docs=retriever, question=RunnablePassthrough()).assign(answer=answer)
+
+
+def stream_answer(chain, question, stats=None):
+    """
+    Yield answer tokens from `chain` as they arrive.
+
+    `stats` (a dict) is filled with retrieval_s, ttft_s (time to first
+    token), total_s, tokens and the retrieved docs once the stream ends.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(retrieval_s=None, ttft_s=None, total_s=None, tokens=0, docs=[])
+    start = time.perf_counter()
+    for chunk in chain.stream(question):
+        if "docs" in chunk:
+            stats["docs"] = chunk["docs"]
+            stats["retrieval_s"] = time.perf_counter() - start
+        token = chunk.get("answer")
+        if token:
+            if stats["ttft_s"] is None:
+                stats["ttft_s"] = time.perf_counter() - start
+            stats["tokens"] += 1
+            yield token
+    stats["total_s"] = time.perf_counter() - start
+    record_answer_metrics(stats)
+    log_event("⏱️ Answer streamed", ttft_s=round(stats["ttft_s"] or 0, 3),
+              total_s=round(stats["total_s"], 3), tokens=stats["tokens"])
+
+
+async def astream_answer(chain, question, stats=None):
+    """Async stream_answer: same tokens and `stats`, for the API's event loop"""
+    stats = stats if stats is not None else {}
+    stats.update(retrieval_s=None, ttft_s=None, total_s=None, tokens=0, docs=[])
+    start = time.perf_counter()
+    async for chunk in chain.astream(question):
+        if "docs" in chunk:
+            stats["docs"] = chunk["docs"]
+            stats["retrieval_s"] = time.perf_counter() - start
+        token = chunk.get("answer")
+        if token:
+            if stats["ttft_s"] is None:
+                stats["ttft_s"] = time.perf_counter() - start
+            stats["tokens"] += 1
+            yield token
+    stats["total_s"] = time.perf_counter() - start
+    record_answer_metrics(stats)
+
+
+def record_answer_metrics(stats):
+    """Query-path latencies from a filled `stats` dict (see stream_answer)"""
+    if stats.get("retrieval_s") is not None:
+        metrics.observe("rag_retrieval_seconds", stats["retrieval_s"], help="Retriever latency per question")
+    if stats.get("ttft_s") is not None:
+        metrics.observe("rag_llm_ttft_seconds", stats["ttft_s"], help="Time to first answer token")
+    metrics.observe("rag_answer_seconds", stats["total_s"], help="End-to-end answer latency")
+    metrics.inc("rag_answer_tokens_total", stats["tokens"], help="Streamed answer tokens")
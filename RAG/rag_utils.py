@@ -1,9 +1,9 @@
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 import pdfplumber
+from embedding_service import get_embedding_service
 import os
 import subprocess
 import io
@@ -202,7 +202,7 @@ def process_pdf_to_vectorstore(file_path):
     
     # 3. اختيار موديل Embeddings مجاني (HuggingFace)
     try:
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        embeddings = get_embedding_service("all-MiniLM-L6-v2")
     except Exception as e:
         raise ValueError(f"❌ Failed to load embeddings model: {str(e)}")
     
@@ -1,275 +1,1101 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
-import pdfplumber
+import functools
+import importlib.util
+import io
 import os
+import re
+import shutil
 import subprocess
+import time
 
-# Set up OCR - CRITICAL: Add Tesseract to PATH FIRST before importing pytesseract
-print("\n" + "="*60)
-print("🔧 INITIALIZING OCR SUPPORT")
-print("="*60)
+from metrics import logger, log_event, metrics, peak_rss_mb, stage
 
-TESSERACT_DIR = r'C:\Program Files\Tesseract-OCR'
-TESSERACT_EXE = os.path.join(TESSERACT_DIR, 'tesseract.exe')
-POPPLER_PATH = r"D:\One Drive\OneDrive\سطح المكتب\Release-25.12.0-0\poppler-25.12.0\Library\bin"
+# Heavy libraries (LangChain loaders, Chroma, pdfplumber, PyMuPDF, PIL,
+# pdf2image, pytesseract, the embedding model) are imported inside the
+# functions that need them, and OCR support is probed on first use by
+# capabilities(), so importing this module is cheap and side-effect free.
 
-# Add Tesseract to PATH BEFORE importing pytesseract
-os.environ['PATH'] = TESSERACT_DIR + os.pathsep + os.environ.get('PATH', '')
-print(f"✅ Added Tesseract to PATH")
+# Fallback locations when Tesseract / Poppler are not on PATH (typical on
+# Windows). TESSERACT_DIR / POPPLER_PATH in the environment override them.
+TESSERACT_DIR = os.getenv("TESSERACT_DIR") or r'C:\Program Files\Tesseract-OCR'
+POPPLER_PATH = os.getenv("POPPLER_PATH") or r"D:\One Drive\OneDrive\سطح المكتب\Release-25.12.0-0\poppler-25.12.0\Library\bin"
 
-# NOW import pytesseract
-try:
+
+def _has_module(name):
+    return importlib.util.find_spec(name) is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _tesseract_cmd():
+    """Tesseract executable on PATH, else in TESSERACT_DIR (None = not found)"""
+    found = shutil.which("tesseract")
+    if found:
+        return found
+    for name in ("tesseract.exe", "tesseract"):
+        candidate = os.path.join(TESSERACT_DIR, name)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _poppler_path():
+    """
+    poppler_path for pdf2image: None when pdftoppm is already on PATH,
+    POPPLER_PATH when that folder exists. PATH itself is never modified.
+    """
+    if shutil.which("pdftoppm"):
+        return None
+    if os.path.isdir(POPPLER_PATH):
+        return POPPLER_PATH
+    return None
+
+
+def get_tesseract():
+    """pytesseract, imported on first use and pointed at the detected executable"""
     import pytesseract
-    pytesseract.pytesseract.pytesseract_cmd = TESSERACT_EXE
-    
-    # Verify Tesseract works
-    result = subprocess.run([TESSERACT_EXE, '--version'], capture_output=True, timeout=5, text=True)
-    if result.returncode == 0:
-        print(f"✅ Tesseract verified and working")
-        TESSERACT_OK = True
-    else:
-        print(f"❌ Tesseract verification failed")
-        TESSERACT_OK = False
-except Exception as e:
-    print(f"❌ Tesseract error: {e}")
-    TESSERACT_OK = False
-
-# Configure Poppler
-if os.path.exists(POPPLER_PATH):
-    os.environ['PATH'] = POPPLER_PATH + os.pathsep + os.environ['PATH']
-    print(f"✅ Poppler available")
-    POPPLER_OK = True
-else:
-    print(f"⚠️ Poppler not found")
-    POPPLER_OK = False
-
-# Try importing pdf2image
-try:
-    from pdf2image import convert_from_path
-    PDF2IMAGE_OK = True
-    print("✅ pdf2image available")
-except ImportError:
-    PDF2IMAGE_OK = False
-    print("❌ pdf2image not available")
-
-# Try importing PyMuPDF
-try:
+
+    cmd = _tesseract_cmd()
+    if cmd:
+        pytesseract.pytesseract.tesseract_cmd = cmd
+    return pytesseract
+
+
+@functools.lru_cache(maxsize=None)
+def _tesseract_list_langs(cmd):
+    """(tessdata folder or None, installed languages); also proves the executable runs"""
+    result = subprocess.run([cmd, "--list-langs"], capture_output=True, timeout=10, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"exit code {result.returncode}")
+    # First line is 'List of available languages in "...":'
+    lines = result.stdout.splitlines()
+    folder = re.search(r'"(.+)"', lines[0]) if lines else None
+    return (folder.group(1) if folder else None,
+            sorted(line.strip() for line in lines[1:] if line.strip()))
+
+
+def _tesseract_languages(cmd):
+    return _tesseract_list_langs(cmd)[1]
+
+
+@functools.lru_cache(maxsize=None)
+def tessdata_dir():
+    """
+    Tesseract's language data folder, for engines that load it in-process
+    (None = the library's own default, or TESSDATA_PREFIX when set)
+    """
+    if os.getenv("TESSDATA_PREFIX"):
+        return None
+    cmd = _tesseract_cmd()
+    if cmd:
+        try:
+            folder = _tesseract_list_langs(cmd)[0]
+            if folder:
+                return folder
+        except Exception:
+            pass
+    candidate = os.path.join(TESSERACT_DIR, "tessdata")
+    return candidate if os.path.isdir(candidate) else None
+
+
+def get_ocr_engine():
+    """This process's OCR engine for OCR_LANG / OCR_CONFIG (see ocr_engines)"""
+    from ocr_engines import get_engine
+
+    return get_engine(OCR_LANG, OCR_CONFIG)
+
+
+@functools.lru_cache(maxsize=None)
+def capabilities():
+    """
+    OCR support available on this machine, probed once per process on first
+    use: {"tesseract", "tesseract_cmd", "languages", "poppler",
+    "poppler_path", "pdf2image", "pymupdf"}.
+    """
+    with stage("capabilities"):
+        caps = {
+            "tesseract": False,
+            "tesseract_cmd": _tesseract_cmd(),
+            "languages": [],
+            "poppler": bool(shutil.which("pdftoppm") or _poppler_path()),
+            "poppler_path": _poppler_path(),
+            "pdf2image": _has_module("pdf2image"),
+            "pymupdf": _has_module("fitz") and _has_module("PIL"),
+            "tesserocr": _has_module("tesserocr"),
+        }
+        if caps["tesseract_cmd"] and _has_module("pytesseract"):
+            try:
+                caps["languages"] = _tesseract_languages(caps["tesseract_cmd"])
+                caps["tesseract"] = True
+            except Exception as e:
+                logger.warning(f"❌ Tesseract error: {e}")
+        if not caps["tesseract"] and caps["tesserocr"]:
+            # No executable needed when libtesseract is used in-process
+            try:
+                import tesserocr
+
+                caps["languages"] = sorted(tesserocr.get_languages(*filter(None, [tessdata_dir()]))[1])
+                caps["tesseract"] = bool(caps["languages"])
+            except Exception as e:
+                logger.warning(f"❌ tesserocr error: {e}")
+
+    logger.info("🔧 OCR support: " + ", ".join(
+        f"{'✅' if caps[name] else '❌'} {name}" for name in ("tesseract", "tesserocr", "poppler", "pdf2image", "pymupdf")))
+    missing = [lang for lang in OCR_LANG.split("+") if caps["tesseract"] and lang not in caps["languages"]]
+    if missing:
+        logger.warning(f"⚠️ Tesseract language data missing: {'+'.join(missing)}")
+    return caps
+
+
+# The old import-time flags, kept as lazy module attributes
+_CAPABILITY_FLAGS = {
+    "TESSERACT_OK": "tesseract",
+    "POPPLER_OK": "poppler",
+    "PDF2IMAGE_OK": "pdf2image",
+    "PYMUPDF_OK": "pymupdf",
+}
+
+
+def __getattr__(name):
+    if name in _CAPABILITY_FLAGS:
+        return capabilities()[_CAPABILITY_FLAGS[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Settings that change the resulting vectors; also part of the index cache key
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# "span": page-aware offset chunker (chunking.py); "recursive": LangChain's
+# RecursiveCharacterTextSplitter
+CHUNKER = os.getenv("CHUNKER") or "span"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Pages per extract → chunk → embed → index batch in iter_ingest
+INGEST_BATCH_PAGES = int(os.getenv("INGEST_BATCH_PAGES") or 16)
+
+
+# OCR tuning. OCR_WORKERS=1 keeps the old one-page-at-a-time loop.
+OCR_LANG = "eng"  # English-only OCR (Arabic data not installed)
+OCR_CONFIG = "--psm 6"
+OCR_ZOOM = 3
+OCR_DPI = 200
+OCR_CONTRAST = 1.8
+# "numpy": ocr_preprocess (binarize, skip blank pages, crop to text, deskew);
+# "contrast": the contrast boost alone, on the whole page
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS") or "numpy"
+OCR_WORKERS = int(os.getenv("OCR_WORKERS") or os.cpu_count() or 1)
+# Pages pdf2image rasterizes per poppler call (its output goes to temp files)
+OCR_WINDOW_PAGES = int(os.getenv("OCR_WINDOW_PAGES") or 4)
+
+
+def read_pdf_bytes(source):
+    """PDF content from a path, bytes, or a binary file-like object (e.g. an upload)"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "read"):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return source.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+class PdfDocument:
+    """
+    One PDF held in memory. Each library (pdfplumber, pypdf, PyMuPDF) opens
+    it at most once, on first use, and every batch and fallback stage
+    reuses that handle, so nothing is written to or re-read from disk.
+
+    name: what chunks cite as their "source" (defaults to the file name)
+    """
+
+    def __init__(self, source, name=None):
+        if isinstance(source, (str, os.PathLike)):
+            name = name or os.path.basename(source)
+        self.data = read_pdf_bytes(source)
+        self.name = name or getattr(source, "name", None) or "document.pdf"
+
+    @functools.cached_property
+    def plumber(self):
+        import pdfplumber
+
+        return pdfplumber.open(io.BytesIO(self.data))
+
+    @functools.cached_property
+    def pypdf(self):
+        from pypdf import PdfReader
+
+        return PdfReader(io.BytesIO(self.data))
+
+    @functools.cached_property
+    def fitz(self):
+        import fitz
+
+        return fitz.open(stream=self.data, filetype="pdf")
+
+    @functools.cached_property
+    def path(self):
+        """
+        The document as a file, for tools that only read files (Poppler):
+        written to a temp folder on first use, reused until close()
+        """
+        import tempfile
+
+        path = os.path.join(tempfile.mkdtemp(prefix="rag-ocr-"), "document.pdf")
+        with open(path, "wb") as f:
+            f.write(self.data)
+        return path
+
+    def page_count(self):
+        """Number of pages, or None if no available library can open the file"""
+        try:
+            return len(self.plumber.pages)
+        except Exception:
+            pass
+        if capabilities()["pymupdf"]:
+            try:
+                return len(self.fitz)
+            except Exception:
+                pass
+        return None
+
+    def close(self):
+        for attr in ("plumber", "fitz"):
+            handle = self.__dict__.pop(attr, None)
+            if handle is not None:
+                handle.close()
+        self.__dict__.pop("pypdf", None)
+        path = self.__dict__.pop("path", None)
+        if path is not None:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def as_pdf_document(source, name=None):
+    """`source` itself if it already is a PdfDocument, else a new one over it"""
+    return source if isinstance(source, PdfDocument) else PdfDocument(source, name)
+
+
+def render_pixmap(page, zoom=OCR_ZOOM):
+    """
+    Render a PDF page straight to an 8-bit grayscale pixmap: no PPM
+    encode/decode round-trip, and a third of the RGB buffer (Tesseract
+    works in grayscale anyway).
+    """
     import fitz
+
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+
+
+def render_page(page, zoom=OCR_ZOOM):
+    """
+    render_pixmap() plus a PIL view over it: returns (pix, img) where img
+    shares pix.samples, no copy. The view borrows the pixmap's memory, so
+    keep `pix` alive for as long as `img` is used.
+    """
     from PIL import Image
-    import io
-    PYMUPDF_OK = True
-    print("✅ PyMuPDF available")
-except ImportError:
-    PYMUPDF_OK = False
-    print("❌ PyMuPDF not available")
 
-print("="*60 + "\n")
+    pix = render_pixmap(page, zoom)
+    img = Image.frombuffer("L", (pix.width, pix.height), pix.samples_mv, "raw", "L", pix.stride, 1)
+    return pix, img
 
 
-def ocr_with_pymupdf(file_path):
-    """OCR using PyMuPDF + Tesseract"""
-    if not (PYMUPDF_OK and TESSERACT_OK):
-        return ""
-    
+def pixmap_array(pix):
+    """
+    The same grayscale pixmap as a (height, width) NumPy view, no copy;
+    what the OCR workers hand to the cache key and the preprocessing
+    """
+    import numpy as np
+
+    return np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+
+def enhance_contrast(img, factor=OCR_CONTRAST):
+    """
+    Same result as ImageEnhance.Contrast(img).enhance(factor), but as a
+    single lookup-table pass instead of building a gray image and blending.
+    """
+    from PIL import ImageStat
+
+    mean = int(ImageStat.Stat(img.convert("L") if img.mode != "L" else img).mean[0] + 0.5)
+    lut = [min(255, max(0, int(mean + factor * (i - mean) + 0.5))) for i in range(256)]
+    return img.point(lut * len(img.getbands()))
+
+
+@functools.lru_cache(maxsize=None)
+def _tesseract_version():
     try:
-        print("🔄 Running OCR with PyMuPDF...")
-        import fitz
+        return get_ocr_engine().version()
+    except Exception:
+        return "unknown"
+
+
+def ocr_settings():
+    """
+    Everything besides the page image that changes the OCR text; part of
+    the OCR cache key. Zoom / DPI are not listed: they show in the pixels.
+    """
+    settings = {"lang": OCR_LANG, "config": OCR_CONFIG, "preprocess": OCR_PREPROCESS,
+                "engine": get_ocr_engine().name, "tesseract": _tesseract_version()}
+    if OCR_PREPROCESS == "numpy":
+        from ocr_preprocess import preprocess_settings
+
+        settings.update(preprocess_settings())
+    else:
+        settings["contrast"] = OCR_CONTRAST
+    return settings
+
+
+def prepare_page_image(img, dpi=None):
+    """
+    The image Tesseract should read for a rendered page (a grayscale
+    NumPy array or a PIL image; dpi: its resolution), or None when the page
+    is blank and needs no OCR
+    """
+    if OCR_PREPROCESS == "numpy":
+        try:
+            from ocr_preprocess import preprocess
+
+            prepared, info = preprocess(img, dpi)
+            if info["blank"]:
+                logger.debug("   ⏭️ Blank page, OCR skipped")
+            return prepared
+        except Exception as e:
+            logger.debug(f"   ⚠️ Preprocessing failed, using the contrast boost: {e}")
+    if hasattr(img, "shape"):
         from PIL import Image
-        import io
-        
-        pdf_doc = fitz.open(file_path)
-        total_pages = len(pdf_doc)
-        print(f"   📄 {total_pages} pages to process")
-        
-        extracted_text = ""
-        for page_num in range(total_pages):
-            page = pdf_doc[page_num]
-            pix = page.get_pixmap(matrix=fitz.Matrix(3, 3), alpha=False)
-            img_data = pix.tobytes("ppm")
-            img = Image.open(io.BytesIO(img_data))
-            
-            # Enhance image contrast for better OCR
+
+        # A view over the array's memory, not a copy
+        img = Image.fromarray(img)
+    # Enhance image contrast for better OCR
+    try:
+        return enhance_contrast(img)
+    except Exception:
+        return img
+
+
+def _ocr_image(img, dpi=None):
+    """
+    Preprocessing + the OCR engine on one page image. Pages the OCR cache has
+    already read with the same settings are a lookup instead.
+    Returns (text, blank): blank when preprocessing found nothing to read.
+    """
+    from ocr_cache import get_ocr_cache, page_key
+
+    cache = get_ocr_cache()
+    key = None
+    if cache is not None:
+        try:
+            key = page_key(img, ocr_settings())
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.debug(f"   ⚠️ OCR cache lookup failed: {e}")
+    img = prepare_page_image(img, dpi)
+    blank = img is None
+    text = "" if blank else get_ocr_engine().image_to_string(img)
+    if key is not None:
+        try:
+            cache.put(key, text, blank=blank)
+        except Exception as e:
+            logger.debug(f"   ⚠️ OCR cache write failed: {e}")
+    return text, blank
+
+
+def _pymupdf_ocr_pages(pdf, page_numbers):
+    """
+    Worker: render and OCR the given pages of a PdfDocument with PyMuPDF.
+    """
+    results = []
+    for page_num in page_numbers:
+        start = time.perf_counter()
+        pix = render_pixmap(pdf.fitz[page_num])
+        text, blank = _ocr_image(pixmap_array(pix), dpi=72 * OCR_ZOOM)
+        del pix
+        results.append((page_num, text, time.perf_counter() - start, blank))
+    return results
+
+
+def _pdf2image_ocr_pages(pdf, page_numbers):
+    """
+    Worker: rasterize and OCR a contiguous range of pages with pdf2image,
+    OCR_WINDOW_PAGES pages at a time. Poppler writes each window's pages
+    next to the document's temp file (pdf.path, written once per process
+    and reused for every range) as grayscale files, which are opened and
+    deleted one by one, so memory holds a single page image however long
+    the range.
+    """
+    from pdf2image import convert_from_path
+    from PIL import Image
+
+    results = []
+    folder = os.path.dirname(pdf.path)
+    for i in range(0, len(page_numbers), OCR_WINDOW_PAGES):
+        window = page_numbers[i:i + OCR_WINDOW_PAGES]
+        start = time.perf_counter()
+        # pdf2image pages are 1-based
+        paths = convert_from_path(pdf.path, dpi=OCR_DPI, first_page=window[0] + 1, last_page=window[-1] + 1,
+                                  grayscale=True, output_folder=folder, paths_only=True,
+                                  poppler_path=_poppler_path())
+        # Rasterization happens for the whole window at once; spread it evenly
+        render_share = (time.perf_counter() - start) / max(len(paths), 1)
+        for page_num, path in zip(window, paths):
+            page_start = time.perf_counter()
             try:
-                from PIL import ImageEnhance
-                contrast = ImageEnhance.Contrast(img)
-                img = contrast.enhance(1.8)
-            except:
-                pass
-            
-            # Use English-only OCR (Arabic data not installed)
-            text = pytesseract.image_to_string(img, lang='eng', config='--psm 6')
-            if text.strip():
-                extracted_text += f"\n--- Page {page_num + 1} ---\n{text}"
-                print(f"   ✅ Page {page_num + 1}: {len(text)} chars")
-            else:
-                print(f"   ⚠️  Page {page_num + 1}: No text")
-        
-        pdf_doc.close()
-        return extracted_text.strip()
-    except Exception as e:
-        print(f"   ❌ PyMuPDF OCR failed: {e}")
-        return ""
+                with Image.open(path) as image:
+                    text, blank = _ocr_image(image, dpi=OCR_DPI)
+            finally:
+                os.remove(path)
+            results.append((page_num, text, render_share + time.perf_counter() - page_start, blank))
+    return results
 
 
-def ocr_with_pdf2image(file_path):
-    """OCR using pdf2image + Tesseract"""
-    if not (PDF2IMAGE_OK and POPPLER_OK and TESSERACT_OK):
-        return ""
-    
+def _page_ranges(page_numbers, task_size):
+    """Split sorted page numbers into contiguous runs of at most task_size pages"""
+    ranges = []
+    for page_num in page_numbers:
+        if ranges and page_num == ranges[-1][-1] + 1 and len(ranges[-1]) < task_size:
+            ranges[-1].append(page_num)
+        else:
+            ranges.append([page_num])
+    return ranges
+
+
+# The document each OCR pool process works on, sent once per process by
+# the pool initializer instead of once per task
+_worker_pdf = None
+
+
+def _init_ocr_worker(data):
+    from multiprocessing.util import Finalize
+
+    global _worker_pdf
+    _worker_pdf = PdfDocument(data)
+    # Pool processes skip atexit; this runs as the process exits, and
+    # removes the temp file pdf2image ranges write once per process
+    Finalize(_worker_pdf, _worker_pdf.close, exitpriority=10)
+
+
+def _cache_counts():
+    from ocr_cache import get_ocr_cache
+
+    cache = get_ocr_cache()
+    return (cache.hits, cache.misses) if cache is not None else (0, 0)
+
+
+def _ocr_task(worker, page_numbers, pdf=None):
+    """
+    worker's results plus this task's OCR cache (hits, misses) and the peak
+    RSS in MB of the process that ran it, so far
+    """
+    hits, misses = _cache_counts()
+    results = worker(pdf or _worker_pdf, page_numbers)
+    after_hits, after_misses = _cache_counts()
+    return results, after_hits - hits, after_misses - misses, peak_rss_mb()
+
+
+class OcrPool:
+    """
+    The OCR process pool of one PdfDocument, kept for a whole ingest: it is
+    started on first use, then every batch and both OCR fallbacks reuse its
+    processes, so each one initializes its OCR engine (ocr_engines) and
+    receives and opens the document once, however many pages it is given.
+    """
+
+    def __init__(self, pdf, workers=None):
+        self.pdf = pdf
+        self.workers = max(1, workers if workers is not None else OCR_WORKERS)
+        # Largest peak RSS (MB) its processes have reported with their
+        # results; None until it has OCRed something
+        self.peak_rss_mb = None
+        self._executor = None
+
+    @property
+    def started(self):
+        return self._executor is not None
+
+    def map(self, fn, *iterables):
+        if self._executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn, as in ingest_jobs: forking the Streamlit server or an API
+            # thread could copy a lock (engine, OCR cache, SQLite) another
+            # thread holds into the child. The initializer ships the document.
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_ocr_worker, initargs=(self.pdf.data,))
+        return self._executor.map(fn, *iterables)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+def _run_page_ocr(worker, pdf, page_numbers, workers, pool=None):
+    """
+    Spread pages over a process pool and return [(page_num, text, seconds,
+    blank)] in page order. Pages are handed out as contiguous ranges.
+
+    pool: the caller's OcrPool for this document, reused across calls;
+        without one a pool is started for this call only
+    """
+    from concurrent.futures.process import BrokenProcessPool
+
+    page_numbers = sorted(page_numbers)
+    if not page_numbers:
+        return []
+    workers = max(1, min(pool.workers if pool is not None else workers or 1, len(page_numbers)))
+    start = time.perf_counter()
+    results, cache_hits, cache_misses = [], 0, 0
+    if workers == 1 and not (pool is not None and pool.started):
+        for page_range in _page_ranges(page_numbers, len(page_numbers)):
+            page_results, hits, misses, _ = _ocr_task(worker, page_range, pdf)
+            results.extend(page_results)
+            cache_hits, cache_misses = cache_hits + hits, cache_misses + misses
+    else:
+        own_pool = pool is None
+        if own_pool:
+            pool = OcrPool(pdf, workers)
+        # A few ranges per worker so a slow page doesn't leave others idle
+        task_size = max(1, -(-len(page_numbers) // (workers * 4)))
+        ranges = _page_ranges(page_numbers, task_size)
+        try:
+            for page_results, hits, misses, peak in pool.map(_ocr_task, [worker] * len(ranges), ranges):
+                results.extend(page_results)
+                cache_hits, cache_misses = cache_hits + hits, cache_misses + misses
+                if peak is not None:
+                    pool.peak_rss_mb = max(pool.peak_rss_mb or 0.0, peak)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory): the next call starts fresh processes
+            pool.shutdown()
+            raise
+        finally:
+            if own_pool:
+                pool.shutdown()
+    results.sort(key=lambda r: r[0])
+    elapsed = time.perf_counter() - start
+
+    # Recorded here rather than in the workers: pool processes have their
+    # own copy of the metrics registry, which is lost when they exit
+    engine = worker.__name__.strip("_").split("_")[0]
+    for page_num, text, seconds, blank in results:
+        metrics.observe("rag_ocr_page_seconds", seconds, help="OCR time per page", engine=engine)
+        metrics.inc("rag_ocr_chars_total", len(text), help="Characters recovered by OCR", engine=engine)
+        if text.strip():
+            logger.debug(f"   ✅ Page {page_num + 1}: {len(text)} chars ({seconds:.2f}s)")
+        elif blank:
+            metrics.inc("rag_ocr_blank_pages_total", help="Pages found blank and not OCRed", engine=engine)
+            logger.debug(f"   ⏭️ Page {page_num + 1}: blank ({seconds:.2f}s)")
+        else:
+            metrics.inc("rag_ocr_empty_pages_total", engine=engine)
+            logger.debug(f"   ⚠️  Page {page_num + 1}: No text ({seconds:.2f}s)")
+    metrics.inc("rag_ocr_cache_hits_total", cache_hits, help="Pages answered from the OCR cache", engine=engine)
+    metrics.inc("rag_ocr_cache_misses_total", cache_misses, help="Pages OCRed and added to the OCR cache",
+                engine=engine)
+    if results:
+        page_seconds = sum(r[2] for r in results)
+        log_event("⏱️ OCR done", engine=engine, pages=len(results), seconds=round(elapsed, 2),
+                  workers=workers, avg_page_s=round(page_seconds / len(results), 3), cache_hits=cache_hits)
+    return results
+
+
+def _join_pages(results):
+    extracted_text = ""
+    for page_num, text, _, _ in results:
+        if text.strip():
+            extracted_text += f"\n--- Page {page_num + 1} ---\n{text}"
+    return extracted_text.strip()
+
+
+def ocr_pages_with_pymupdf(source, pages=None, workers=None, pool=None):
+    """
+    Per-page OCR using PyMuPDF + Tesseract.
+    source: path, bytes, file-like object or PdfDocument
+    pages: 0-based page numbers to OCR (None = all pages)
+    pool: OcrPool over the same PdfDocument to reuse (see _run_page_ocr)
+    Returns [(page_num, text, seconds, blank)] in page order.
+    """
+    caps = capabilities()
+    if not (caps["pymupdf"] and caps["tesseract"]):
+        return []
+
     try:
-        print("🔄 Running OCR with pdf2image + poppler...")
-        from pdf2image import convert_from_path
-        
-        images = convert_from_path(file_path, dpi=200)
-        print(f"   📄 Converted to {len(images)} images")
-        
-        extracted_text = ""
-        for idx, image in enumerate(images):
-            # Enhance contrast
-            try:
-                from PIL import ImageEnhance
-                contrast = ImageEnhance.Contrast(image)
-                image = contrast.enhance(1.8)
-            except:
-                pass
-            
-            # Use English-only OCR with better PSM
-            text = pytesseract.image_to_string(image, lang='eng', config='--psm 6')
-            if text.strip():
-                extracted_text += f"\n--- Page {idx + 1} ---\n{text}"
-                print(f"   ✅ Page {idx + 1}: {len(text)} chars")
-            else:
-                print(f"   ⚠️  Page {idx + 1}: No text")
-        
-        return extracted_text.strip()
+        logger.info("🔄 Running OCR with PyMuPDF...")
+        pdf = as_pdf_document(source)
+        if pages is None:
+            pages = range(len(pdf.fitz))
+        logger.info(f"   📄 {len(pages)} pages to process")
+        return _run_page_ocr(_pymupdf_ocr_pages, pdf, pages,
+                             workers if workers is not None else OCR_WORKERS, pool)
     except Exception as e:
-        print(f"   ❌ pdf2image OCR failed: {e}")
-        return ""
+        logger.warning(f"   ❌ PyMuPDF OCR failed: {e}")
+        return []
 
 
-def process_pdf_to_vectorstore(file_path):
+def ocr_pages_with_pdf2image(source, pages=None, workers=None, pool=None):
     """
-    Complete PDF processing with fallback chain
+    Per-page OCR using pdf2image + Tesseract.
+    source: path, bytes, file-like object or PdfDocument
+    pages: 0-based page numbers to OCR (None = all pages)
+    pool: OcrPool over the same PdfDocument to reuse (see _run_page_ocr)
+    Returns [(page_num, text, seconds, blank)] in page order.
     """
-    print(f"\n📥 Processing: {file_path}\n")
-    documents = []
-    total_text = ""
-    extraction_method = None
-    
-    # ===== STAGE 1: Text Extraction (for native PDFs) =====
-    print("STAGE 1: Text-based extraction")
-    print("-" * 40)
-    
-    # Try pdfplumber
+    caps = capabilities()
+    if not (caps["pdf2image"] and caps["poppler"] and caps["tesseract"]):
+        return []
+
     try:
-        print("🔄 Trying pdfplumber...")
-        with pdfplumber.open(file_path) as pdf:
-            num_pages = len(pdf.pages)
-            print(f"   📄 {num_pages} pages detected")
-            
-            for idx, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if text and text.strip():
-                    print(f"   ✅ Page {idx + 1}: {len(text)} chars extracted")
-                    documents.append(Document(
-                        page_content=text,
-                        metadata={"source": file_path, "page": idx}
-                    ))
-                    total_text += text
-            
-            if total_text.strip():
-                extraction_method = "pdfplumber"
-                print(f"✅ SUCCESS: pdfplumber extracted {len(total_text)} chars\n")
+        logger.info("🔄 Running OCR with pdf2image + poppler...")
+        from pdf2image import pdfinfo_from_bytes
+
+        pdf = as_pdf_document(source)
+        if pages is None:
+            pages = range(int(pdfinfo_from_bytes(pdf.data, poppler_path=_poppler_path())["Pages"]))
+        logger.info(f"   📄 {len(pages)} pages to process")
+        return _run_page_ocr(_pdf2image_ocr_pages, pdf, pages,
+                             workers if workers is not None else OCR_WORKERS, pool)
     except Exception as e:
-        print(f"   ⚠️  pdfplumber failed: {e}")
-    
-    # Try PyPDFLoader fallback
-    if not total_text.strip():
-        try:
-            print("🔄 Trying PyPDFLoader...")
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
-            total_text = "".join([doc.page_content for doc in documents])
-            
-            if total_text.strip():
-                extraction_method = "PyPDFLoader"
-                print(f"✅ SUCCESS: PyPDFLoader extracted {len(total_text)} chars\n")
-            else:
-                print("   ⚠️  PyPDFLoader returned empty text")
-        except Exception as e:
-            print(f"   ⚠️  PyPDFLoader failed: {e}")
-    
-    # ===== STAGE 2: OCR (for scanned/image PDFs) =====
-    if not total_text.strip():
-        print("\nSTAGE 2: OCR extraction (image-based)")
-        print("-" * 40)
-        
-        # Try PyMuPDF OCR first
-        if PYMUPDF_OK and TESSERACT_OK:
-            ocr_text = ocr_with_pymupdf(file_path)
-            if ocr_text:
-                documents = [Document(
-                    page_content=ocr_text,
-                    metadata={"source": file_path, "method": "PyMuPDF-OCR"}
-                )]
-                total_text = ocr_text
-                extraction_method = "PyMuPDF-OCR"
-                print(f"✅ SUCCESS: PyMuPDF OCR extracted {len(total_text)} chars\n")
-        
-        # Try pdf2image OCR as fallback
-        if not total_text.strip() and PDF2IMAGE_OK and POPPLER_OK and TESSERACT_OK:
-            ocr_text = ocr_with_pdf2image(file_path)
-            if ocr_text:
-                documents = [Document(
-                    page_content=ocr_text,
-                    metadata={"source": file_path, "method": "pdf2image-OCR"}
-                )]
-                total_text = ocr_text
-                extraction_method = "pdf2image-OCR"
-                print(f"✅ SUCCESS: pdf2image OCR extracted {len(total_text)} chars\n")
-    
-    # ===== FINAL VALIDATION =====
-    print("STAGE 3: Validation & Vectorization")
-    print("-" * 40)
-    
-    if not documents or not total_text.strip():
-        error_details = f"\nMethod: {extraction_method or 'None'}"
-        if not TESSERACT_OK:
-            error_details += "\n❌ Tesseract not working"
-        if not POPPLER_OK:
-            error_details += "\n❌ Poppler not found"
-        if not PDF2IMAGE_OK:
-            error_details += "\n❌ pdf2image not available"
-        if not PYMUPDF_OK:
-            error_details += "\n❌ PyMuPDF not available"
-        
-        raise ValueError(f"❌ EXTRACTION FAILED: Could not extract any text from PDF.{error_details}\n\nPlease try: Google Docs → download as PDF, or use ILovePDF.com for OCR conversion")
-    
-    # Split into chunks
-    print(f"🔄 Chunk splitting ({len(total_text)} chars)...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000, 
-        chunk_overlap=200
+        logger.warning(f"   ❌ pdf2image OCR failed: {e}")
+        return []
+
+
+def ocr_with_pymupdf(source, workers=None):
+    """OCR using PyMuPDF + Tesseract"""
+    return _join_pages(ocr_pages_with_pymupdf(source, workers=workers))
+
+
+def ocr_with_pdf2image(source, workers=None):
+    """OCR using pdf2image + Tesseract"""
+    return _join_pages(ocr_pages_with_pdf2image(source, workers=workers))
+
+
+LEXICAL_INDEX_FILE = "bm25.pkl"
+
+
+class PdfIndex:
+    """
+    One ingested PDF: the dense vector store plus the BM25 index built over
+    the same chunks. as_retriever() fuses both when the lexical side exists.
+    """
+
+    def __init__(self, vectorstore, lexical=None):
+        self.vectorstore = vectorstore
+        self.lexical = lexical
+
+    def as_retriever(self, **kwargs):
+        from hybrid_retrieval import HybridRetriever
+
+        if self.lexical is None or not len(self.lexical):
+            return self.vectorstore.as_retriever(**kwargs)
+        return HybridRetriever(vectorstore=self.vectorstore, lexical=self.lexical, **kwargs)
+
+    def delete_collection(self):
+        # Only Chroma keeps in-memory collections alive in a shared client;
+        # a FAISS store is freed with its last reference
+        if hasattr(self.vectorstore, "delete_collection"):
+            self.vectorstore.delete_collection()
+
+
+def pdf_index_key(doc_hash, backend=None):
+    """
+    index_cache key of one PDF's index: its content hash plus the chunking,
+    model and backend settings the index was built with
+    """
+    from index_cache import index_key
+    from vector_backends import get_backend
+
+    return index_key(
+        doc_hash,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        chunker=CHUNKER,
+        model=EMBEDDING_MODEL,
+        **(backend or get_backend()).settings(),
     )
-    docs = text_splitter.split_documents(documents)
-    print(f"✅ Created {len(docs)} chunks")
-    
-    # Create embeddings
-    print("🔄 Creating embeddings...")
+
+
+def pdf_collection_name(key):
+    # Chroma collection names are limited to 63 characters
+    return f"pdf-{key[:32]}"
+
+
+def load_vectorstore(persist_directory, collection_name="langchain", backend=None):
+    """
+    Reopen a vector store previously built with persist_directory set
+    backend: the vector_backends backend it was built with (None = VECTOR_BACKEND)
+    """
+    from embedding_service import get_embedding_service
+    from vector_backends import get_backend
+
     try:
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        print("✅ Embeddings ready")
+        embeddings = get_embedding_service(EMBEDDING_MODEL)
     except Exception as e:
         raise ValueError(f"❌ Embeddings failed: {str(e)}")
-    
-    # Create vectorstore
-    print("🔄 Building vector store...")
+    return (backend or get_backend()).load(persist_directory, embeddings, collection_name)
+
+
+def load_pdf_index(persist_directory, collection_name="langchain", backend=None):
+    """
+    Reopen a persisted PdfIndex (vector store + BM25 index if it was saved)
+    """
+    from hybrid_retrieval import BM25Index
+
+    lexical_path = os.path.join(persist_directory, LEXICAL_INDEX_FILE)
+    lexical = BM25Index.load(lexical_path) if os.path.exists(lexical_path) else None
+    return PdfIndex(load_vectorstore(persist_directory, collection_name, backend), lexical)
+
+
+# Text-layer quality thresholds for the per-page OCR triage
+MIN_PAGE_CHARS = 20
+MIN_CLEAN_CHAR_RATIO = 0.7
+MAX_AVG_WORD_LENGTH = 25
+
+
+def page_needs_ocr(text):
+    """
+    Decide whether a page's text layer is usable or should be OCR'd instead.
+    Catches empty/near-empty pages and the usual garbage from broken font
+    encodings: (cid:NN) placeholders, replacement characters, symbol soup,
+    and words glued together without spaces.
+    """
+    stripped = (text or "").strip()
+    if len(stripped) < MIN_PAGE_CHARS:
+        return True
+    if stripped.count("(cid:") * 8 > len(stripped) * 0.1:
+        return True
+    non_space = [c for c in stripped if not c.isspace()]
+    clean = sum(1 for c in non_space if c.isalnum() or c in ".,;:!?'\"()[]-–—/%$&@#*+=<>«»،؛؟")
+    if clean / len(non_space) < MIN_CLEAN_CHAR_RATIO:
+        return True
+    words = stripped.split()
+    if len(non_space) / len(words) > MAX_AVG_WORD_LENGTH:
+        return True
+    return False
+
+
+def _plumber_page_text(page):
+    text = page.extract_text() or ""
+    # Drop the parsed layout objects; the document handle stays open for
+    # the next batch and would otherwise keep every page's objects alive
+    page.close()
+    return text
+
+
+def _text_layer_pages(pdf, pages=None):
+    """
+    Text layer of the requested pages (None = all) as {page_num: text}, plus
+    the list of pages covered and the extractor that worked. pdfplumber
+    first, pypdf if it can't open the file.
+    """
     try:
-        vectorstore = Chroma.from_documents(docs, embeddings)
-        print(f"✅ Vector store created ({len(docs)} documents)\n")
-        return vectorstore
+        logger.debug("🔄 Trying pdfplumber...")
+        num_pages = len(pdf.plumber.pages)
+        logger.debug(f"   📄 {num_pages} pages detected")
+        wanted = [idx for idx in (pages if pages is not None else range(num_pages)) if idx < num_pages]
+        page_texts = {idx: _plumber_page_text(pdf.plumber.pages[idx]) for idx in wanted}
+        return page_texts, wanted, "pdfplumber"
     except Exception as e:
-        raise ValueError(f"❌ Vector store failed: {str(e)}")
+        logger.warning(f"   ⚠️  pdfplumber failed: {e}")
+
+    try:
+        logger.info("🔄 Trying pypdf...")
+        num_pages = len(pdf.pypdf.pages)
+        wanted = [idx for idx in (pages if pages is not None else range(num_pages)) if idx < num_pages]
+        page_texts = {idx: pdf.pypdf.pages[idx].extract_text() or "" for idx in wanted}
+        return page_texts, wanted, "pypdf"
+    except Exception as e:
+        logger.warning(f"   ⚠️  pypdf failed: {e}")
+
+    return {}, None, None
+
+
+def extract_page_documents(source, pages=None, pool=None):
+    """
+    Per-page hybrid extraction: keep the text layer where it looks good and
+    OCR only the pages that are empty or garbled. Returns one Document per
+    page with the extraction method recorded in its metadata.
+
+    source: path, bytes, file-like object or PdfDocument
+    pages: 0-based page numbers to extract (None = the whole document)
+    pool: OcrPool over the same PdfDocument, for the OCR stage
+    """
+    pdf = as_pdf_document(source)
+    # ===== STAGE 1: Text Extraction (for native PDFs) =====
+    with stage("extract"):
+        page_texts, text_pages, text_method = _text_layer_pages(pdf, pages)
+    extracted = {}  # page_num -> (text, method)
+    ocr_needed = []
+    for idx in text_pages or []:
+        text = page_texts.get(idx, "")
+        if page_needs_ocr(text):
+            ocr_needed.append(idx)
+            if text.strip():
+                logger.debug(f"   ⚠️  Page {idx + 1}: text layer looks garbled, queued for OCR")
+        else:
+            extracted[idx] = (text, text_method)
+            logger.debug(f"   ✅ Page {idx + 1}: {len(text)} chars extracted")
+    if extracted:
+        log_event(f"✅ {text_method} extracted {len(extracted)}/{len(text_pages)} pages",
+                  method=text_method, pages=len(extracted), ocr_queued=len(ocr_needed))
+
+    # ===== STAGE 2: OCR (only the pages that need it) =====
+    # text_pages is None when no text extractor could open the file: OCR
+    # the requested pages (or all of them) blind
+    if ocr_needed or text_pages is None:
+        remaining = ocr_needed if text_pages is not None else pages
+        logger.info(f"STAGE 2: OCR extraction ({len(remaining) if remaining is not None else 'all'} pages)")
+
+        for method, ocr_pages in (
+            ("PyMuPDF-OCR", ocr_pages_with_pymupdf),
+            ("pdf2image-OCR", ocr_pages_with_pdf2image),
+        ):
+            if remaining is not None and not remaining:
+                break
+            with stage("ocr", engine=method):
+                results = ocr_pages(pdf, pages=remaining, pool=pool)
+            for page_num, text, _, _ in results:
+                if text.strip():
+                    extracted[page_num] = (text, method)
+            done = {page_num for page_num, text, _, _ in results if text.strip()}
+            # Blank pages are as blank to the next engine: don't rasterize them again
+            blank = {page_num for page_num, _, _, is_blank in results if is_blank}
+            if remaining is None:
+                if not results:
+                    continue
+                remaining = [page_num for page_num, _, _, _ in results]
+            remaining = [page_num for page_num in remaining if page_num not in done and page_num not in blank]
+            if done or blank:
+                logger.info(f"✅ {method} recovered {len(done)} pages ({len(blank)} blank)")
+
+        # A garbled text layer is still better than nothing
+        for idx in remaining or []:
+            if page_texts.get(idx, "").strip():
+                extracted[idx] = (page_texts[idx], text_method)
+
+    from langchain_core.documents import Document
+
+    for text, method in extracted.values():
+        metrics.inc("rag_pages_extracted_total", help="Pages extracted, by method", method=method)
+    return [
+        Document(
+            page_content=text,
+            metadata={"source": pdf.name, "page": idx, "method": method},
+        )
+        for idx, (text, method) in sorted(extracted.items())
+    ]
+
+
+def extraction_failed(extraction_method=None):
+    caps = capabilities()
+    error_details = f"\nMethod: {extraction_method or 'None'}"
+    if not caps["tesseract"]:
+        error_details += "\n❌ Tesseract not working"
+    if not caps["poppler"]:
+        error_details += "\n❌ Poppler not found"
+    if not caps["pdf2image"]:
+        error_details += "\n❌ pdf2image not available"
+    if not caps["pymupdf"]:
+        error_details += "\n❌ PyMuPDF not available"
+    return ValueError(f"❌ EXTRACTION FAILED: Could not extract any text from PDF.{error_details}\n\nPlease try: Google Docs → download as PDF, or use ILovePDF.com for OCR conversion")
+
+
+def split_documents(documents):
+    """
+    Chunk per-page Documents with the CHUNKER setting. Every chunk keeps its
+    page's metadata plus start_index, its offset in the page, so context
+    assembly can merge overlapping hits.
+    """
+    if CHUNKER == "recursive":
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            add_start_index=True,
+        )
+        return text_splitter.split_documents(documents)
+    if CHUNKER != "span":
+        raise ValueError(f"❌ Unknown CHUNKER: {CHUNKER!r} (expected 'span' or 'recursive')")
+    from chunking import split_pages
+
+    return split_pages(documents, CHUNK_SIZE, CHUNK_OVERLAP).documents()
+
+
+def iter_chunk_batches(source, batch_pages=None, name=None, pool=None):
+    """
+    Extract → chunk a PDF `batch_pages` pages at a time. Yields one dict per
+    batch: {"pages", "total_pages", "documents", "chunks"}; what happens to
+    the chunks (embedding, which store) is up to the caller.
+
+    source: path, bytes, file-like object or PdfDocument; the document is
+        read into memory once and opened once for all batches
+    name: what chunks cite as their source (defaults to the file name)
+    pool: OcrPool over `source` (a PdfDocument) to OCR with; by default one
+        is kept for all batches and shut down at the end
+    """
+    batch_pages = batch_pages or INGEST_BATCH_PAGES
+    pdf = as_pdf_document(source, name)
+    own_pool = pool is None
+    if own_pool:
+        pool = OcrPool(pdf)
+    try:
+        total_pages = pdf.page_count()
+        if total_pages:
+            batches = [
+                list(range(first, min(first + batch_pages, total_pages)))
+                for first in range(0, total_pages, batch_pages)
+            ]
+        else:
+            # Page count unknown: a single pass lets the OCR fallbacks find it
+            batches = [None]
+
+        for batch in batches:
+            documents = extract_page_documents(pdf, pages=batch, pool=pool)
+            with stage("split", chunker=CHUNKER):
+                chunks = split_documents(documents)
+            metrics.inc("rag_chunks_total", len(chunks), help="Chunks produced by the splitter")
+            yield {
+                "pages": len(batch) if batch is not None else len(documents),
+                "total_pages": total_pages,
+                "documents": documents,
+                "chunks": chunks,
+            }
+    finally:
+        if own_pool:
+            pool.shutdown()
+        if pdf is not source:
+            pdf.close()
+
+
+def _round_mb(value):
+    return round(value, 1) if value is not None else None
+
+
+def iter_ingest(source, persist_directory=None, collection_name="langchain", batch_pages=None,
+                backend=None, name=None):
+    """
+    Streaming ingestion: pages flow through extract → chunk → embed → index
+    in batches of `batch_pages`, so memory is bounded by the batch rather
+    than the document. Yields a progress dict after every batch; its
+    "vectorstore" can be queried from the first batch on.
+
+    source: path, bytes or file-like object (e.g. a Streamlit upload); it is
+        read into memory once, nothing is written to a temp file
+    persist_directory: write the index to disk (None = in-memory only)
+    collection_name: give each cached document its own collection, otherwise
+        in-memory Chroma stores in the same process share the default one
+    backend: vector_backends backend (None = VECTOR_BACKEND, Chroma by default)
+    name: what chunks cite as their source (defaults to the file name)
+    """
+    from embedding_service import get_embedding_service
+    from hybrid_retrieval import BM25Index
+    from vector_backends import get_backend
+
+    backend = backend or get_backend()
+
+    pdf = as_pdf_document(source, name)
+    log_event("📥 Processing", file=pdf.name, bytes=len(pdf.data))
+    try:
+        # Shared, already-loaded model instead of a fresh copy per upload
+        embeddings = get_embedding_service(EMBEDDING_MODEL)
+    except Exception as e:
+        raise ValueError(f"❌ Embeddings failed: {str(e)}")
+
+    progress = {
+        "vectorstore": None,
+        "lexical": BM25Index(),
+        "pages_done": 0,
+        "total_pages": None,
+        "chunks": 0,
+        "chars": 0,
+        "methods": {},
+        # MB, for the ingestion reports: this process, and the largest of
+        # this document's OCR pool processes (None when OCR ran in-process)
+        "peak_rss_mb": None,
+        "ocr_peak_rss_mb": None,
+    }
+    # One set of OCR processes (and engines) for every batch of the document
+    pool = OcrPool(pdf)
+    try:
+        for batch in iter_chunk_batches(pdf, batch_pages, pool=pool):
+            documents, chunks = batch["documents"], batch["chunks"]
+            if chunks:
+                try:
+                    with stage("embed_index"):
+                        if progress["vectorstore"] is None:
+                            progress["vectorstore"] = backend.create(
+                                chunks,
+                                embeddings,
+                                collection_name=collection_name,
+                                persist_directory=persist_directory,
+                            )
+                        else:
+                            progress["vectorstore"].add_documents(chunks)
+                except Exception as e:
+                    raise ValueError(f"❌ Vector store failed: {str(e)}")
+                # BM25 postings are built alongside, from the same chunks
+                with stage("lexical_index"):
+                    progress["lexical"].add_documents(chunks)
+
+            for doc in documents:
+                method = doc.metadata["method"]
+                progress["methods"][method] = progress["methods"].get(method, 0) + 1
+            progress["total_pages"] = batch["total_pages"]
+            progress["pages_done"] += batch["pages"]
+            progress["chunks"] += len(chunks)
+            progress["chars"] += sum(len(doc.page_content) for doc in documents)
+            progress["peak_rss_mb"] = _round_mb(peak_rss_mb())
+            progress["ocr_peak_rss_mb"] = _round_mb(pool.peak_rss_mb)
+            log_event(f"📦 Indexed pages {progress['pages_done']}/{progress['total_pages'] or '?'}",
+                      chunks=progress["chunks"])
+            yield dict(progress)
+    finally:
+        pool.shutdown()
+        if pdf is not source:
+            pdf.close()
+
+    # ===== FINAL VALIDATION =====
+    if progress["vectorstore"] is None:
+        raise extraction_failed("+".join(sorted(progress["methods"])))
+    with stage("finish_index", backend=backend.name):
+        backend.finish(progress["vectorstore"], persist_directory)
+    if persist_directory:
+        progress["lexical"].save(os.path.join(persist_directory, LEXICAL_INDEX_FILE))
+    log_event("✅ Vector store created", backend=backend.name, chunks=progress["chunks"],
+              chars=progress["chars"], methods="+".join(sorted(progress["methods"])),
+              peak_rss_mb=progress["peak_rss_mb"],
+              chunks_per_sec=round(embeddings.chunks_per_second, 1))
+
+
+def process_pdf_to_index(source, persist_directory=None, collection_name="langchain", backend=None, name=None):
+    """
+    Runs iter_ingest to completion and returns a PdfIndex (vector store +
+    BM25 index) whose as_retriever() does hybrid search.
+    """
+    progress = None
+    for progress in iter_ingest(source, persist_directory, collection_name, backend=backend, name=name):
+        pass
+    return PdfIndex(progress["vectorstore"], progress["lexical"])
+
+
+def process_pdf_to_vectorstore(source, persist_directory=None, collection_name="langchain", backend=None,
+                               name=None):
+    """
+    Complete PDF processing with per-page text/OCR triage.
+    Runs iter_ingest to completion and returns the finished vector store
+    (Chroma, or FAISS flat/IVF/HNSW, see vector_backends).
+    """
+    return process_pdf_to_index(source, persist_directory, collection_name, backend, name).vectorstore
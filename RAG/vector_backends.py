@@ -0,0 +1,228 @@
+"""
+Vector store backends for one ingested PDF.
+
+    chroma  Chroma collection (default, what the app always used)
+    faiss   FAISS index: "flat" (exact), "ivf" (inverted lists, FAISS_NPROBE
+            trades recall for speed) or "hnsw" (graph, FAISS_EF_SEARCH)
+
+A backend creates the store from the first batch of chunks, lets
+iter_ingest add later batches with add_documents(), finishes it once every
+batch is in (IVF is trained there, FAISS indexes are saved) and reopens a
+saved copy. Saved FAISS indexes are memory-mapped on load rather than read
+into RAM; faiss-cpu is only needed when the faiss backend is selected.
+A flat FAISS index can also be stored quantized (see quantization.py).
+"""
+import math
+import os
+import pickle
+import time
+
+from metrics import log_event, logger
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND") or "chroma"
+FAISS_INDEX = os.getenv("FAISS_INDEX") or "flat"
+FAISS_NLIST = int(os.getenv("FAISS_NLIST") or 0)  # 0 = about 4*sqrt(chunks)
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE") or 8)
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M") or 32)
+FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION") or 200)
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH") or 64)
+FAISS_MMAP = (os.getenv("FAISS_MMAP") or "1").lower() not in ("0", "false", "no")
+# Compact storage for flat indexes: "none", "float16", "int8" or "binary",
+# re-ranked exactly over FAISS_RERANK x k candidates (0 = no re-ranking,
+# empty = a per-mode default, see quantization.DEFAULT_RERANK)
+FAISS_QUANTIZATION = os.getenv("FAISS_QUANTIZATION") or "none"
+FAISS_RERANK = int(os.getenv("FAISS_RERANK")) if os.getenv("FAISS_RERANK") else None
+
+# Same names as FAISS.save_local / load_local, so saved folders stay
+# readable with plain LangChain too
+FAISS_INDEX_FILE = "index.faiss"
+FAISS_DOCSTORE_FILE = "index.pkl"
+
+
+class ChromaBackend:
+    name = "chroma"
+
+    def settings(self):
+        return {"backend": self.name}
+
+    def create(self, chunks, embeddings, collection_name="langchain", persist_directory=None):
+        from langchain_community.vectorstores import Chroma
+
+        return Chroma.from_documents(
+            chunks,
+            embeddings,
+            collection_name=collection_name,
+            persist_directory=persist_directory,
+        )
+
+    def finish(self, store, persist_directory=None):
+        # Chroma writes through to persist_directory as it goes
+        pass
+
+    def load(self, persist_directory, embeddings, collection_name="langchain"):
+        from langchain_community.vectorstores import Chroma
+
+        return Chroma(
+            collection_name=collection_name,
+            persist_directory=persist_directory,
+            embedding_function=embeddings,
+        )
+
+
+class FaissBackend:
+    """
+    LangChain's FAISS store over a flat, IVF or HNSW index (L2 distance,
+    like Chroma's default).
+
+    IVF needs training data, which a streaming ingest only has at the end:
+    batches go into an exact flat index (queryable right away) and finish()
+    trains the IVF index on every vector and swaps it in.
+    """
+
+    name = "faiss"
+
+    def __init__(self, index_type=None, nlist=None, nprobe=None, hnsw_m=None,
+                 ef_construction=None, ef_search=None, mmap=None, quantization=None, rerank=None):
+        self.index_type = index_type or FAISS_INDEX
+        if self.index_type not in ("flat", "ivf", "hnsw"):
+            raise ValueError(f"❌ Unknown FAISS index type: {self.index_type}")
+        self.quantization = quantization or FAISS_QUANTIZATION
+        if self.quantization != "none" and self.index_type != "flat":
+            raise ValueError("❌ FAISS_QUANTIZATION needs FAISS_INDEX=flat")
+        self.rerank = FAISS_RERANK if rerank is None else rerank
+        if self.quantization == "binary" and self.rerank == 0:
+            raise ValueError("❌ Binary quantization needs re-ranking (FAISS_RERANK > 0)")
+        self.nlist = FAISS_NLIST if nlist is None else nlist
+        self.nprobe = nprobe or FAISS_NPROBE
+        self.hnsw_m = hnsw_m or FAISS_HNSW_M
+        self.ef_construction = ef_construction or FAISS_EF_CONSTRUCTION
+        self.ef_search = ef_search or FAISS_EF_SEARCH
+        self.mmap = FAISS_MMAP if mmap is None else mmap
+
+    def settings(self):
+        # Search-time knobs (nprobe, efSearch, mmap, rerank) don't change
+        # what is stored, so they stay out of the index cache key
+        settings = {"backend": self.name, "faiss_index": self.index_type}
+        if self.quantization != "none":
+            settings["quantization"] = self.quantization
+        if self.index_type == "ivf":
+            settings["nlist"] = self.nlist
+        elif self.index_type == "hnsw":
+            settings.update(hnsw_m=self.hnsw_m, ef_construction=self.ef_construction)
+        return settings
+
+    def _new_index(self, dim):
+        import faiss
+
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m)
+            index.hnsw.efConstruction = self.ef_construction
+            return self.tune(index)
+        return faiss.IndexFlatL2(dim)
+
+    def tune(self, index):
+        """Apply the search-time recall/latency settings to an index"""
+        if hasattr(index, "nprobe"):
+            index.nprobe = self.nprobe
+        hnsw = getattr(index, "hnsw", None)
+        if hnsw is not None:
+            hnsw.efSearch = self.ef_search
+        return index
+
+    def create(self, chunks, embeddings, collection_name=None, persist_directory=None):
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+
+        texts = [doc.page_content for doc in chunks]
+        vectors = embeddings.embed_documents(texts)
+        store = FAISS(
+            embedding_function=embeddings,
+            index=self._new_index(len(vectors[0])),
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+        )
+        store.add_embeddings(zip(texts, vectors), metadatas=[doc.metadata for doc in chunks])
+        return store
+
+    def _train_ivf(self, flat):
+        import faiss
+
+        count = flat.ntotal
+        # FAISS wants ~39 training points per list; small PDFs get few lists
+        nlist = self.nlist or int(4 * math.sqrt(count))
+        nlist = max(1, min(nlist, count // 39 or 1))
+        start = time.perf_counter()
+        vectors = flat.reconstruct_n(0, count)
+        ivf = faiss.IndexIVFFlat(faiss.IndexFlatL2(flat.d), flat.d, nlist)
+        ivf.train(vectors)
+        ivf.add(vectors)
+        log_event("🧭 Trained IVF index", vectors=count, nlist=nlist,
+                  seconds=round(time.perf_counter() - start, 2))
+        return self.tune(ivf)
+
+    def _quantize(self, flat, persist_directory=None):
+        from quantization import QuantizedIndex
+
+        start = time.perf_counter()
+        index = QuantizedIndex.build(flat.reconstruct_n(0, flat.ntotal), self.quantization, self.rerank)
+        if not persist_directory:
+            # save() memory-maps the vectors it writes; an in-memory index
+            # needs the same, or re-ranking keeps them all on the heap
+            index.spill_vectors()
+        log_event("🗜️ Quantized index", mode=self.quantization, vectors=index.ntotal,
+                  codes_mb=round(index.memory_bytes()["codes"] / 2**20, 1),
+                  seconds=round(time.perf_counter() - start, 2))
+        return index
+
+    def finish(self, store, persist_directory=None):
+        # Same vectors in the same order, so index_to_docstore_id holds
+        if self.index_type == "ivf" and store.index.ntotal:
+            store.index = self._train_ivf(store.index)
+        if self.quantization != "none" and store.index.ntotal:
+            store.index = self._quantize(store.index, persist_directory)
+            if persist_directory:
+                store.index.save(persist_directory)
+                with open(os.path.join(persist_directory, FAISS_DOCSTORE_FILE), "wb") as f:
+                    pickle.dump((store.docstore, store.index_to_docstore_id), f)
+            return
+        if persist_directory:
+            store.save_local(persist_directory)
+
+    def load(self, persist_directory, embeddings, collection_name=None):
+        import faiss
+        from langchain_community.vectorstores import FAISS
+        from quantization import QuantizedIndex
+
+        path = os.path.join(persist_directory, FAISS_INDEX_FILE)
+        index = None
+        if QuantizedIndex.exists(persist_directory):
+            index = QuantizedIndex.load(persist_directory, self.rerank)
+        elif self.mmap:
+            # IO_FLAG_MMAP alone only maps IVF lists; IO_FLAG_MMAP_IFC (newer
+            # faiss) also maps flat/HNSW storage. Pages stay in the shared page
+            # cache instead of the heap, and the index is read-only.
+            flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+            try:
+                index = faiss.read_index(path, flags)
+            except RuntimeError as e:
+                logger.warning(f"⚠️ FAISS mmap load failed, reading into memory: {e}")
+        if index is None:
+            index = faiss.read_index(path)
+        with open(os.path.join(persist_directory, FAISS_DOCSTORE_FILE), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(
+            embedding_function=embeddings,
+            index=self.tune(index),
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+
+
+def get_backend(name=None, **options):
+    """Backend by name (default: VECTOR_BACKEND); options go to FaissBackend"""
+    name = name or VECTOR_BACKEND
+    if name == "chroma":
+        return ChromaBackend()
+    if name == "faiss":
+        return FaissBackend(**options)
+    raise ValueError(f"❌ Unknown vector backend: {name}")
@@ -0,0 +1,201 @@
+"""
+Headless query API over the same retriever + prompt + LLM chain as the
+Streamlit app, for putting the RAG behind other services.
+
+    uvicorn api:app --port 8000
+
+    GET  /indexes         finished indexes in the index cache folder (+ "library" with CORPUS_DIR)
+    POST /query           {"question", "index", "doc_ids"?} → {"answer", "sources", "timing"}
+    POST /query/stream    same body → newline-delimited JSON: sources, tokens, then timing
+    GET  /metrics         Prometheus text
+    GET  /health
+
+Indexes are loaded once and shared by every request (API_PRELOAD=1 loads
+them all at startup). Requests run on the chain's async path, and at most
+API_MAX_INFLIGHT LLM calls are in flight at a time; the rest wait for a
+slot. RAG_FAKE_LLM=1 answers with the local fake LLM, for load tests.
+"""
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+# Load .env before the RAG modules read their settings from the environment
+load_dotenv()
+
+from metrics import configure_logging, log_event, metrics  # noqa: E402
+
+configure_logging()
+
+from fastapi import FastAPI, HTTPException  # noqa: E402
+from fastapi.responses import PlainTextResponse, StreamingResponse  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+from index_cache import IndexCache, is_index_key  # noqa: E402
+from ingest_jobs import DEFAULT_INDEX_DIR  # noqa: E402
+from rag_chain import astream_answer, build_qa_chain, doc_sources, get_llm, record_answer_metrics  # noqa: E402
+from rag_utils_ocr import load_pdf_index, pdf_collection_name  # noqa: E402
+
+API_MAX_INFLIGHT = int(os.getenv("API_MAX_INFLIGHT") or 16)
+API_PRELOAD = (os.getenv("API_PRELOAD") or "1").lower() not in ("0", "false", "no")
+LIBRARY = "library"
+
+
+class Query(BaseModel):
+    question: str
+    index: str
+    doc_ids: Optional[List[str]] = None  # library only: restrict to these documents
+
+
+class RagService:
+    """Indexes, LLM client and the in-flight LLM limit shared by every request"""
+
+    def __init__(self, index_dir, corpus_dir=None, max_inflight=API_MAX_INFLIGHT):
+        self.index_cache = IndexCache(
+            max_entries=int(os.getenv("INDEX_CACHE_SIZE") or 8),
+            persist_dir=index_dir,
+        )
+        self.corpus = None
+        if corpus_dir:
+            from corpus import Corpus
+
+            self.corpus = Corpus(corpus_dir)
+        self.llm = get_llm()
+        self.llm_limit = asyncio.Semaphore(max_inflight)
+        self._load_lock = asyncio.Lock()
+
+    def _load(self, key):
+        return self.index_cache.load(
+            key,
+            lambda persist_directory: load_pdf_index(persist_directory, collection_name=pdf_collection_name(key)),
+        )
+
+    def preload(self):
+        keys = self.index_cache.keys_on_disk()[:self.index_cache.max_entries]
+        for key in keys:
+            self._load(key)
+        log_event("📂 Indexes preloaded", indexes=len(keys))
+
+    async def pdf_index(self, key):
+        # The key names a folder whose pickles get loaded: only accept real keys
+        if not is_index_key(key):
+            raise HTTPException(status_code=404, detail=f"Unknown index: {key}")
+        if key in self.index_cache:
+            return self._load(key)
+        # Reading an index from disk blocks: do it off the event loop, one at a time
+        async with self._load_lock:
+            index = await asyncio.to_thread(self._load, key)
+        if index is None:
+            raise HTTPException(status_code=404, detail=f"Unknown index: {key}")
+        return index
+
+    async def chain(self, query):
+        if query.index == LIBRARY:
+            if self.corpus is None:
+                raise HTTPException(status_code=404, detail="No library: set CORPUS_DIR")
+            retriever = self.corpus.as_retriever(doc_ids=query.doc_ids)
+        else:
+            retriever = (await self.pdf_index(query.index)).as_retriever()
+        return build_qa_chain(retriever, self.llm, llm_limit=self.llm_limit)
+
+    def indexes(self):
+        found = []
+        for key in self.index_cache.keys_on_disk():
+            entry = {"index": key, "loaded": key in self.index_cache}
+            index = self.index_cache.get(key)
+            if index is not None and index.lexical is not None and index.lexical.docs:
+                entry["source"] = index.lexical.docs[0].metadata.get("source")
+            found.append(entry)
+        if self.corpus is not None:
+            found.append({"index": LIBRARY, "documents": [doc["doc_id"] for doc in self.corpus.documents()]})
+        return found
+
+
+service = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global service
+    service = RagService(
+        os.getenv("INDEX_CACHE_DIR") or DEFAULT_INDEX_DIR,
+        corpus_dir=os.getenv("CORPUS_DIR") or None,
+    )
+    if API_PRELOAD:
+        await asyncio.to_thread(service.preload)
+    yield
+
+
+app = FastAPI(title="PDF Chat RAG", lifespan=lifespan)
+
+
+def _observe_request(endpoint, start):
+    metrics.observe("rag_api_request_seconds", time.perf_counter() - start,
+                    help="API request latency", endpoint=endpoint)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus():
+    return metrics.prometheus_text()
+
+
+@app.get("/indexes")
+async def indexes():
+    return service.indexes()
+
+
+@app.post("/query")
+async def query(q: Query):
+    start = time.perf_counter()
+    chain = await service.chain(q)
+    try:
+        result = await chain.ainvoke(q.question)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Answer failed: {e}")
+    total_s = time.perf_counter() - start
+    record_answer_metrics({"total_s": total_s, "tokens": 0})
+    _observe_request("query", start)
+    return {
+        "answer": result["answer"],
+        "sources": doc_sources(result["docs"]),
+        "timing": {"total_s": round(total_s, 4)},
+    }
+
+
+@app.post("/query/stream")
+async def query_stream(q: Query):
+    start = time.perf_counter()
+    chain = await service.chain(q)
+
+    async def events():
+        stats = {}
+        sources_sent = False
+        try:
+            async for token in astream_answer(chain, q.question, stats):
+                if not sources_sent:
+                    yield json.dumps({"sources": doc_sources(stats["docs"])}) + "\n"
+                    sources_sent = True
+                yield json.dumps({"token": token}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Answer failed: {e}"}) + "\n"
+            return
+        if not sources_sent:
+            yield json.dumps({"sources": doc_sources(stats["docs"])}) + "\n"
+        _observe_request("query_stream", start)
+        yield json.dumps({"timing": {
+            "retrieval_s": stats["retrieval_s"],
+            "ttft_s": stats["ttft_s"],
+            "total_s": stats["total_s"],
+            "tokens": stats["tokens"],
+        }}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
@@ -1,78 +1,121 @@
 import streamlit as st
 import os
+import time
+import uuid
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from rag_utils_ocr import process_pdf_to_vectorstore
 
+# Load .env before the RAG modules read their settings from the environment
 load_dotenv()
 
+from metrics import configure_logging, metrics, start_metrics_server
+
+# Before the other RAG imports so their startup messages go through it too
+configure_logging()
+
+from rag_utils_ocr import (
+    iter_ingest,
+    load_pdf_index,
+    pdf_index_key,
+    pdf_collection_name,
+    capabilities,
+    PdfIndex,
+    EMBEDDING_MODEL,
+)
+from index_cache import IndexCache, content_hash
+from embedding_service import get_embedding_service
+from corpus import Corpus
+from ingest_jobs import (
+    IngestQueue,
+    job_error,
+    ACTIVE_STATES,
+    DEFAULT_INDEX_DIR,
+    INGEST_POLL_SECONDS,
+    INGEST_WORKERS,
+)
+from rag_chain import get_llm, use_fake_llm, build_qa_chain, stream_answer, doc_sources
+from answer_cache import SemanticAnswerCache
+from hybrid_retrieval import is_identifier_query
+
 st.set_page_config(page_title="My Free RAG Bot", page_icon="🤖")
 
 api_key = os.getenv("GROQ_API_KEY")
-if not api_key:
+if not api_key and not use_fake_llm():
     st.error("Missing GROQ_API_KEY!")
     st.stop()
 
 st.title("🤖 Chat with your PDF (Free & Fast)")
 st.sidebar.header("Settings & Support")
 
+@st.cache_resource
+def get_index_cache():
+    """One index cache per server process, shared by every session"""
+    # Background ingestion hands indexes back through disk, so it needs a folder
+    return IndexCache(
+        max_entries=int(os.getenv("INDEX_CACHE_SIZE") or 8),
+        persist_dir=os.getenv("INDEX_CACHE_DIR") or (DEFAULT_INDEX_DIR if INGEST_WORKERS else None),
+    )
+
+@st.cache_resource
+def get_ingest_queue():
+    """Worker processes ingesting uploads in the background (None when INGEST_WORKERS=0)"""
+    return IngestQueue(get_index_cache(), INGEST_WORKERS) if INGEST_WORKERS else None
+
+@st.cache_resource
+def get_corpus():
+    """Persistent multi-document library, enabled by setting CORPUS_DIR"""
+    corpus_dir = os.getenv("CORPUS_DIR")
+    return Corpus(corpus_dir) if corpus_dir else None
+
+@st.cache_resource
+def get_answer_cache():
+    """Semantic answer cache shared by every session"""
+    return SemanticAnswerCache(
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD") or 0.92),
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE") or 512),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL") or 3600),
+    )
+
+@st.cache_resource
+def get_shared_llm():
+    """One LLM client (and its HTTP connection pool) shared by every session"""
+    return get_llm(api_key)
+
+@st.cache_resource
+def get_metrics_server():
+    """Prometheus /metrics endpoint, started once when RAG_METRICS_PORT is set"""
+    port = os.getenv("RAG_METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
+
+get_metrics_server()
+
 # Show PDF upload
 uploaded_file = st.sidebar.file_uploader("Upload your PDF", type="pdf")
 
 
-# Initialize vectorstore and qa_chain
-vectorstore = None
+# Initialize pdf_index and qa_chain
+pdf_index = None
 qa_chain = None
 
-llm = ChatGroq(
-    groq_api_key=api_key,
-    model_name="llama-3.3-70b-versatile",
-    temperature=0.2
-)
-
-# تصميم الـ Prompt يدوياً (أسرع وأضمن من تحميله من الإنترنت كل مرة)
-template = """Answer the question based only on the following context:
-{context}
+llm = get_shared_llm()
+if use_fake_llm():
+    st.sidebar.info("🧪 Offline mode: answers come from a local fake LLM")
 
-Question: {question}
-"""
-prompt = ChatPromptTemplate.from_template(template)
+def show_ingest_error(e):
+    if not isinstance(e, ValueError):
+        st.sidebar.error(f"❌ Unexpected error: {str(e)}")
+        return
+    error_msg = str(e)
+    st.sidebar.error(error_msg)
 
-if uploaded_file:
-    with open("temp.pdf", "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    
-    with st.spinner("Analyzing PDF..."):
-        try:
-            vectorstore = process_pdf_to_vectorstore("temp.pdf")
-            retriever = vectorstore.as_retriever()
-            
-            def format_docs(docs):
-                return "\n\n".join(doc.page_content for doc in docs)
-            
-            # بناء الـ Chain بالطريقة الحديثة (LCEL)
-            qa_chain = (
-                {"context": retriever | format_docs, "question": RunnablePassthrough()}
-                | prompt
-                | llm
-                | StrOutputParser()
-            )
-            st.sidebar.success("✅ PDF Indexed Successfully!")
-        except ValueError as e:
-            error_msg = str(e)
-            st.sidebar.error(error_msg)
-            
-            if "EXTRACTION FAILED" in error_msg:
-                st.sidebar.warning("""
+    if "EXTRACTION FAILED" in error_msg:
+        caps = capabilities()
+        languages = "+".join(caps["languages"]) or "none"
+        st.sidebar.warning(f"""
 🛠️ **Troubleshooting:**
 
 **Current Setup:**
-- ✅ Tesseract OCR installed 
-- ✅ PyMuPDF & pdf2image ready
-- ⚠️ Arabic language data NOT installed (only English)
+- {'✅' if caps['tesseract'] else '❌'} Tesseract OCR (languages: {languages})
+- {'✅' if caps['pymupdf'] else '❌'} PyMuPDF, {'✅' if caps['pdf2image'] and caps['poppler'] else '❌'} pdf2image + Poppler
 
 **If Your PDF is in Arabic:**
 To install Arabic support:
@@ -84,22 +127,206 @@ To install Arabic support:
 **Quick Fix:**
 - Use **Google Docs** → Download as PDF (works great!)
 - Or try an **online converter** like ILovePDF or SmallPDF
-                """)
-            else:
-                st.sidebar.info("💡 Please try another PDF")
-            vectorstore = None
-            qa_chain = None
-        except Exception as e:
-            st.sidebar.error(f"❌ Unexpected error: {str(e)}")
-            vectorstore = None
-            qa_chain = None
+        """)
+    else:
+        st.sidebar.info("💡 Please try another PDF")
+
+
+def stop_ingest(ingest):
+    """Abandon an unfinished ingestion (new upload or file removed)"""
+    if ingest is None or ingest["done"]:
+        return
+    ingest["events"].close()
+    partial = ingest["progress"] and ingest["progress"]["vectorstore"]
+    if partial is not None and get_index_cache().persist_dir is None:
+        PdfIndex(partial).delete_collection()
+
+
+status = st.sidebar.empty()
+ingest = None
+job = None
+cache_key = None
+ingest_queue = get_ingest_queue()
+
+if uploaded_file:
+    # Every chat message reruns this script, so the index is looked up by
+    # content hash instead of being rebuilt from the upload each time
+    pdf_bytes = uploaded_file.getvalue()
+    cache_key = pdf_index_key(content_hash(pdf_bytes))
+    collection_name = pdf_collection_name(cache_key)
+elif "job_key" in st.session_state:
+    # The user removed the file they uploaded in this session: forget the
+    # document instead of reattaching to it
+    st.session_state.pop("job_key")
+    st.query_params.pop("job", None)
+elif ingest_queue is not None and "job" in st.query_params:
+    # A refreshed page starts with an empty uploader, but the job and its
+    # index are still there: reattach to them through the URL
+    job = ingest_queue.job(st.query_params["job"])
+    if job is not None:
+        cache_key, collection_name = job["key"], job["collection_name"]
+
+if cache_key is not None:
+    index_cache = get_index_cache()
+
+    try:
+        pdf_index = index_cache.load(
+            cache_key,
+            lambda persist_directory: load_pdf_index(persist_directory, collection_name=collection_name),
+        )
+    except Exception as e:
+        show_ingest_error(e)
+
+    if pdf_index is None and ingest_queue is not None:
+        # Not indexed yet: hand it to the worker processes. An identical
+        # upload from another session (or before a refresh) joins that job.
+        if uploaded_file:
+            job = ingest_queue.submit(cache_key, pdf_bytes, name=uploaded_file.name,
+                                      collection_name=collection_name)
+        if job["state"] == "failed":
+            show_ingest_error(job_error(job))
+            if uploaded_file and st.sidebar.button("🔁 Retry"):
+                ingest_queue.submit(cache_key, pdf_bytes, name=uploaded_file.name,
+                                    collection_name=collection_name, retry=True)
+                st.rerun()
+    elif pdf_index is None:
+        # In-session ingestion (INGEST_WORKERS=0): stream it in batches. The
+        # generator lives in the session so a rerun (e.g. a chat message)
+        # resumes it where it was, and the partial index answers questions
+        # in the meantime.
+        ingest = st.session_state.get("ingest")
+        if ingest is None or ingest["key"] != cache_key:
+            stop_ingest(ingest)
+            persist_directory = index_cache.prepare_build(cache_key)
+            if persist_directory is None:
+                # An evicted in-memory index keeps its collection until the
+                # last session using it lets go: never build into that one
+                collection_name = f"{collection_name}-{uuid.uuid4().hex[:8]}"
+            # Straight from the upload's bytes: no file shared between sessions
+            ingest = {
+                "key": cache_key,
+                "events": iter_ingest(
+                    pdf_bytes,
+                    name=uploaded_file.name,
+                    persist_directory=persist_directory,
+                    collection_name=collection_name,
+                ),
+                "progress": None,
+                "error": None,
+                "done": False,
+            }
+            st.session_state.ingest = ingest
+        if ingest["error"] is not None:
+            show_ingest_error(ingest["error"])
+        elif ingest["progress"] is not None and ingest["progress"]["vectorstore"] is not None:
+            pdf_index = PdfIndex(ingest["progress"]["vectorstore"], ingest["progress"]["lexical"])
+
+    if ingest_queue is not None:
+        st.query_params["job"] = cache_key
+        if uploaded_file:
+            st.session_state.job_key = cache_key
+
+    if pdf_index is not None:
+        if ingest is None:
+            status.success("✅ PDF Indexed Successfully!")
+            embedding_stats = get_embedding_service(EMBEDDING_MODEL).stats()
+            if embedding_stats["chunks_encoded"]:
+                st.sidebar.caption(
+                    f"⚡ Embeddings: {embedding_stats['chunks_per_second']:.1f} chunks/sec "
+                    f"(batch size {embedding_stats['batch_size']})"
+                )
+elif "ingest" in st.session_state:
+    stop_ingest(st.session_state.pop("ingest"))
+
+# Library: a persistent corpus many PDFs can be added to / removed from
+corpus = get_corpus()
+library_scope = False
+library_docs = []
+if corpus is not None:
+    st.sidebar.subheader("📚 Library")
+    if uploaded_file and st.sidebar.button("Add this PDF to library"):
+        with st.spinner("Adding to library..."):
+            try:
+                result = corpus.add_pdf(
+                    pdf_bytes,
+                    doc_id=uploaded_file.name,
+                    name=uploaded_file.name,
+                    doc_hash=content_hash(pdf_bytes),
+                )
+                st.sidebar.success(f"✅ {uploaded_file.name}: {result}")
+            except Exception as e:
+                show_ingest_error(e)
+
+    library_entries = corpus.documents()
+    library_ids = [doc["doc_id"] for doc in library_entries]
+    if library_ids:
+        library_scope = st.sidebar.radio("Answer from", ["This PDF", "Library"]) == "Library"
+        library_docs = st.sidebar.multiselect(
+            "Library documents (none = all)" if library_scope else "Library documents",
+            library_ids,
+        )
+        if library_docs and st.sidebar.button("Remove selected from library"):
+            for doc_id in library_docs:
+                corpus.remove(doc_id)
+            st.rerun()
+        if library_scope:
+            st.sidebar.caption(f"Searching {len(library_docs) or len(library_ids)} of {len(library_ids)} documents")
+    else:
+        st.sidebar.caption("Library is empty")
+
+# Cached answers are only reused for exactly the same searchable content
+if library_scope:
+    retriever = corpus.as_retriever(doc_ids=library_docs)
+    answer_doc_key = "library:" + content_hash(" ".join(
+        f"{doc['doc_id']}={doc['sha256']}" for doc in library_entries
+        if not library_docs or doc["doc_id"] in library_docs
+    ).encode("utf-8"))
+elif pdf_index is not None:
+    retriever = pdf_index.as_retriever()
+    answer_doc_key = cache_key
+else:
+    retriever = None
+    answer_doc_key = None
+
+if retriever is not None:
+    # بناء الـ Chain بالطريقة الحديثة (LCEL)
+    qa_chain = build_qa_chain(retriever, llm)
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+def timing_caption(timing):
+    if timing.get("cached"):
+        return f"⚡ cached answer (similarity {timing['similarity']:.2f}) · {timing['total_s']:.2f}s"
+    return f"⏱️ first token {timing['ttft_s']:.2f}s · total {timing['total_s']:.2f}s"
+
+
+def show_sources(sources):
+    if not sources:
+        return
+    with st.expander("📄 Sources"):
+        for src in sources:
+            page = f"p. {src['page'] + 1}" if isinstance(src.get("page"), int) else ""
+            st.caption(f"**{src.get('source') or ''}** {page}: {src['snippet']}…")
+
+
+answer_cache = get_answer_cache()
+cache_stats = answer_cache.stats()
+if cache_stats["hits"] + cache_stats["misses"]:
+    st.sidebar.caption(
+        f"🗂️ Answer cache: {cache_stats['hit_rate']:.0%} hit rate "
+        f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}, {cache_stats['entries']} entries)"
+    )
+
+with st.sidebar.expander("📈 Metrics"):
+    st.code(metrics.prometheus_text(), language="text")
+
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
+        if msg.get("timing"):
+            st.caption(timing_caption(msg["timing"]))
+        show_sources(msg.get("sources"))
 
 if user_input := st.chat_input("Ask me anything..."):
     st.session_state.messages.append({"role": "user", "content": user_input})
@@ -107,13 +334,109 @@ if user_input := st.chat_input("Ask me anything..."):
         st.markdown(user_input)
 
     with st.chat_message("assistant"):
-        if uploaded_file and vectorstore is not None:
+        timing = None
+        sources = []
+        if qa_chain is not None:
             # هنا بننادي الـ qa_chain اللي عملناه فوق
             try:
-                response = qa_chain.invoke(user_input)
+                start = time.perf_counter()
+                # Answers from a half-built index are neither served from nor stored in the cache.
+                # Identifier lookups ("clause 4.2") skip it too: their embeddings sit close to
+                # every other identifier, and skipping it keeps the lexical path embedding-free.
+                partial = ingest is not None and not library_scope
+                use_answer_cache = not partial and not is_identifier_query(user_input)
+                query_vector = None
+                cached = None
+                if use_answer_cache:
+                    query_vector = get_embedding_service(EMBEDDING_MODEL).embed_query(user_input)
+                    cached = answer_cache.lookup(answer_doc_key, query_vector)
+                if cached is not None:
+                    response = cached["answer"]
+                    sources = cached["sources"]
+                    st.markdown(response)
+                    timing = {"cached": True, "similarity": cached["similarity"],
+                              "total_s": time.perf_counter() - start}
+                    st.caption(timing_caption(timing))
+                else:
+                    # Tokens are rendered as they arrive instead of after the full completion
+                    stats = {}
+                    response = st.write_stream(stream_answer(qa_chain, user_input, stats))
+                    sources = doc_sources(stats["docs"])
+                    if stats["ttft_s"] is not None:
+                        timing = {"ttft_s": stats["ttft_s"], "total_s": stats["total_s"]}
+                        st.caption(timing_caption(timing))
+                    if use_answer_cache:
+                        answer_cache.store(answer_doc_key, user_input, query_vector, response, sources)
+                show_sources(sources)
+                if partial:
+                    progress = ingest["progress"]
+                    note = (f"_⏳ Still indexing: answered from the first "
+                            f"{progress['pages_done']}/{progress['total_pages'] or '?'} pages._")
+                    st.markdown(note)
+                    response += "\n\n" + note
             except Exception as e:
                 response = f"❌ Error generating response: {str(e)}"
+                st.markdown(response)
         else:
-            response = "❌ Please upload a valid PDF first!"
-        st.markdown(response)
-        st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+            if (ingest is not None and ingest["error"] is None) or (job is not None and job["state"] in ACTIVE_STATES):
+                response = "⏳ Still indexing the first pages, please ask again in a moment."
+            else:
+                response = "❌ Please upload a valid PDF first!"
+            st.markdown(response)
+        st.session_state.messages.append(
+            {"role": "assistant", "content": response, "timing": timing, "sources": sources}
+        )
+
+# Keep feeding the ingestion pipeline last, after any question has been
+# answered, so the chat stays usable while the rest of the PDF is indexed
+if ingest is not None and not ingest["done"] and ingest["error"] is None:
+    def show_progress(progress):
+        total = progress["total_pages"] if progress else None
+        done = progress["pages_done"] if progress else 0
+        return status.progress(
+            min(done / total, 1.0) if total else 0.0,
+            text=f"Analyzing PDF... {done}/{total or '?'} pages indexed",
+        )
+
+    bar = show_progress(ingest["progress"])
+    try:
+        for progress in ingest["events"]:
+            ingest["progress"] = progress
+            bar = show_progress(progress)
+        ingest["done"] = True
+    except Exception as e:
+        ingest["error"] = e
+        stop_ingest(ingest)
+        show_ingest_error(e)
+
+    if ingest["done"]:
+        get_index_cache().put(
+            ingest["key"],
+            PdfIndex(ingest["progress"]["vectorstore"], ingest["progress"]["lexical"]),
+        )
+        del st.session_state["ingest"]
+        st.rerun()
+
+# Background job: only this fragment reruns while the workers ingest, and a
+# full rerun once the job ends attaches the finished index (or shows the error)
+@st.fragment(run_every=INGEST_POLL_SECONDS)
+def poll_job(key):
+    job = ingest_queue.job(key)
+    if job is None or job["state"] not in ACTIVE_STATES:
+        st.rerun()
+    if job["state"] == "queued":
+        st.progress(0.0, text="Queued for indexing...")
+        return
+    total, done = job["total_pages"], job["pages_done"]
+    st.progress(
+        min(done / total, 1.0) if total else 0.0,
+        text=f"Analyzing PDF... {done}/{total or '?'} pages indexed",
+    )
+    if job["stages"]:
+        st.caption(f"🔧 {job['stage'] or 'starting'} · " + " · ".join(
+            f"{name} {seconds:.1f}s" for name, seconds in job["stages"].items()
+        ))
+
+if job is not None and job["state"] in ACTIVE_STATES:
+    with st.sidebar:
+        poll_job(job["key"])
@@ -0,0 +1,55 @@
+"""
+Answer latency: time-to-first-token vs total time through the streaming chain.
+
+Uses the offline FakeChatModel and a fixed in-memory retriever by default,
+so it runs without network or an index. Pass --groq to hit the real model.
+
+    python benchmarks/bench_answer_latency.py --runs 20
+"""
+import argparse
+import os
+
+import common
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--groq", action="store_true", help="use ChatGroq (needs GROQ_API_KEY)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="fake LLM delay per token (s)")
+    args = parser.parse_args()
+
+    if not args.groq:
+        os.environ["RAG_FAKE_LLM"] = "1"
+    from rag_chain import get_llm, build_qa_chain, stream_answer
+
+    llm = get_llm()
+    if not args.groq:
+        llm.token_delay = args.token_delay
+
+    docs = [
+        Document(page_content=f"Clause {n}: either party may terminate this agreement with {n * 10} days notice.",
+                 metadata={"page": n})
+        for n in range(1, 5)
+    ]
+    retriever = RunnableLambda(lambda question: docs)
+    chain = build_qa_chain(retriever, llm)
+
+    ttft, total = [], []
+    for _ in range(args.runs):
+        stats = {}
+        answer = "".join(stream_answer(chain, "What is the termination clause?", stats))
+        assert answer and stats["docs"] == docs
+        ttft.append(stats["ttft_s"])
+        total.append(stats["total_s"])
+
+    print(f"\n{'LLM':<10}{'runs':>6}{'TTFT p50':>12}{'TTFT p99':>12}{'total p50':>12}{'total p99':>12}")
+    print(f"{'groq' if args.groq else 'fake':<10}{args.runs:>6}"
+          f"{common.percentile(ttft, 50):>11.3f}s{common.percentile(ttft, 99):>11.3f}s"
+          f"{common.percentile(total, 50):>11.3f}s{common.percentile(total, 99):>11.3f}s")
+
+
+if __name__ == "__main__":
+    main()
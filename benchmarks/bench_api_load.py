@@ -0,0 +1,187 @@
+"""
+Load test for the headless API (api.py): many concurrent questions against
+a preloaded index, answered by the local fake LLM, so no network or Groq
+key is needed and runs are comparable.
+
+By default it indexes a synthetic PDF into a temporary index folder,
+starts `uvicorn api:app` on it with RAG_FAKE_LLM=1 and fires --requests
+questions at each --concurrency level, reporting requests/sec and p50/p99
+latency (and time to first token with --stream).
+
+    python benchmarks/bench_api_load.py --concurrency 1,16,64 --requests 200
+    python benchmarks/bench_api_load.py --url http://localhost:8000 --index <key> --stream
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import common
+import synthetic_pdfs
+
+ROOT = os.path.dirname(common.RAG_DIR)
+QUESTIONS = ("What does clause {n}.1 say?", "Summarize part {n}", "Which obligations apply in section {n}?")
+
+
+def _build_index(index_dir, pages):
+    """Index a synthetic PDF the way the app does and return its key"""
+    from index_cache import IndexCache, content_hash
+    from rag_utils_ocr import pdf_collection_name, pdf_index_key, process_pdf_to_index
+
+    pdf_path = os.path.join(index_dir, "bench.pdf")
+    synthetic_pdfs.make_pdf(pdf_path, "native", pages)
+    with open(pdf_path, "rb") as f:
+        key = pdf_index_key(content_hash(f.read()))
+    cache = IndexCache(persist_dir=index_dir)
+    process_pdf_to_index(pdf_path, cache.prepare_build(key), pdf_collection_name(key))
+    cache.mark_complete(key)
+    os.remove(pdf_path)
+    return key
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(index_dir, port, max_inflight, delay):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [common.RAG_DIR, os.getenv("PYTHONPATH")])),
+        RAG_FAKE_LLM="1",
+        INDEX_CACHE_DIR=index_dir,
+        API_MAX_INFLIGHT=str(max_inflight),
+        RAG_FAKE_LLM_DELAY=str(delay),
+        RAG_LOG_LEVEL="WARNING",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+
+
+async def _wait_ready(client, url, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{url}/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"API at {url} did not come up")
+
+
+async def _one(client, url, index, question, stream):
+    """(latency, ttft or None, ok)"""
+    body = {"question": question, "index": index}
+    start = time.perf_counter()
+    if not stream:
+        resp = await client.post(f"{url}/query", json=body)
+        return time.perf_counter() - start, None, resp.status_code == 200
+    ttft = None
+    ok = False
+    async with client.stream("POST", f"{url}/query/stream", json=body) as resp:
+        async for line in resp.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if "token" in event and ttft is None:
+                ttft = time.perf_counter() - start
+            ok = ok or "timing" in event
+    return time.perf_counter() - start, ttft, ok
+
+
+async def _level(client, url, index, concurrency, requests, stream):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(n):
+        async with slots:
+            return await _one(client, url, index, QUESTIONS[n % len(QUESTIONS)].format(n=n % 50 + 1), stream)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run(n) for n in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies = [r[0] for r in results if r[2]]
+    ttfts = [r[1] for r in results if r[2] and r[1] is not None]
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for r in results if not r[2]),
+        "req_per_s": len(latencies) / elapsed,
+        "p50_ms": 1000 * common.percentile(latencies, 50) if latencies else None,
+        "p99_ms": 1000 * common.percentile(latencies, 99) if latencies else None,
+        "ttft_p50_ms": 1000 * common.percentile(ttfts, 50) if ttfts else None,
+    }
+
+
+async def _run(args, url, index):
+    import httpx
+
+    limits = httpx.Limits(max_connections=max(int(c) for c in args.concurrency.split(",")))
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        await _wait_ready(client, url)
+        # Warm-up: first query loads the embedding model in the server
+        await _one(client, url, index, "warm up", False)
+        return [
+            await _level(client, url, index, int(c), args.requests, args.stream)
+            for c in args.concurrency.split(",")
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="existing API to target (default: start one on a synthetic index)")
+    parser.add_argument("--index", help="index key to query (required with --url)")
+    parser.add_argument("--pages", type=int, default=50, help="pages in the synthetic PDF")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="comma-separated concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="questions per concurrency level")
+    parser.add_argument("--max-inflight", type=int, default=16, help="API_MAX_INFLIGHT for the started server")
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="fake LLM first-token delay (s)")
+    parser.add_argument("--stream", action="store_true", help="use /query/stream and report time to first token")
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    server = None
+    index_dir = None
+    url, index = args.url, args.index
+    try:
+        if url is None:
+            index_dir = tempfile.mkdtemp(prefix="bench-api-")
+            print(f"📄 Indexing a {args.pages}-page synthetic PDF...")
+            index = _build_index(index_dir, args.pages)
+            port = _free_port()
+            server = _start_server(index_dir, port, args.max_inflight, args.llm_delay)
+            url = f"http://127.0.0.1:{port}"
+        elif index is None:
+            parser.error("--index is required with --url")
+        results = asyncio.run(_run(args, url, index))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if index_dir:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+    mode = "stream" if args.stream else "query"
+    print(f"\n{'clients':>8} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50':>9} {'p99':>9} {'ttft p50':>9}  ({mode})")
+    for r in results:
+        ttft = f"{r['ttft_p50_ms']:>7.0f}ms" if r["ttft_p50_ms"] is not None else f"{'-':>9}"
+        print(f"{r['concurrency']:>8} {r['requests']:>9} {r['errors']:>7} {r['req_per_s']:>8.1f} "
+              f"{r['p50_ms'] or 0:>7.0f}ms {r['p99_ms'] or 0:>7.0f}ms {ttft}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
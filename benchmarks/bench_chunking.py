@@ -0,0 +1,141 @@
+"""
+Chunking benchmark: LangChain's RecursiveCharacterTextSplitter vs the
+page-aware span chunker (RAG/chunking.py) on a large synthetic document.
+
+For each chunker it reports the best split time over --repeat runs, the
+peak and retained Python memory of one split (tracemalloc), the chunk
+count and size, and citation accuracy: the share of chunks whose text is
+found in their page at their start_index.
+
+    recursive     split_documents(add_start_index=True) → list of Documents
+    span          split_pages() → (page, start, end) spans only
+    span+docs     split_pages().documents(), what ingestion hands to embedding;
+                  its memory, not that of the bare spans, is what ingestion pays
+
+    python benchmarks/bench_chunking.py --pages 2000 --repeat 3
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+import common
+import synthetic_pdfs
+
+
+def _pages(num_pages, paragraphs):
+    from langchain_core.documents import Document
+
+    rng = random.Random(0)
+    return [
+        Document(
+            page_content="\n\n".join(synthetic_pdfs.page_text(n * paragraphs + k, rng) for k in range(paragraphs)),
+            metadata={"source": "bench.pdf", "page": n, "method": "pdfplumber"},
+        )
+        for n in range(num_pages)
+    ]
+
+
+def _recursive(documents, chunk_size, chunk_overlap):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                              add_start_index=True)
+    return splitter.split_documents(documents)
+
+
+def _span(documents, chunk_size, chunk_overlap):
+    from chunking import split_pages
+
+    return split_pages(documents, chunk_size, chunk_overlap)
+
+
+def _span_docs(documents, chunk_size, chunk_overlap):
+    return _span(documents, chunk_size, chunk_overlap).documents()
+
+
+CHUNKERS = {"recursive": _recursive, "span": _span, "span+docs": _span_docs}
+
+
+def _accuracy(documents, chunks):
+    """Share of chunks whose text sits at start_index of the page they cite"""
+    texts = {doc.metadata["page"]: doc.page_content for doc in documents}
+    exact = 0
+    for chunk in chunks:
+        start = chunk.metadata["start_index"]
+        exact += texts[chunk.metadata["page"]][start:start + len(chunk.page_content)] == chunk.page_content
+    return exact / max(1, len(chunks))
+
+
+def _measure(name, documents, chunk_size, chunk_overlap, repeat):
+    split = CHUNKERS[name]
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        chunks = split(documents, chunk_size, chunk_overlap)
+        timings.append(time.perf_counter() - start)
+        del chunks
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    chunks = split(documents, chunk_size, chunk_overlap)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sizes = [len(chunks.text(i)) for i in range(len(chunks))] if name == "span" else \
+        [len(chunk.page_content) for chunk in chunks]
+    return {
+        "chunker": name,
+        "seconds": min(timings),
+        "chunks": len(chunks),
+        "avg_chars": sum(sizes) / max(1, len(sizes)),
+        "max_chars": max(sizes, default=0),
+        "peak_mb": (peak - before) / (1024 * 1024),
+        "retained_mb": (retained - before) / (1024 * 1024),
+        "accuracy": _accuracy(documents, chunks),
+    }
+
+
+def main():
+    from rag_utils_ocr import CHUNK_SIZE, CHUNK_OVERLAP
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000, help="pages in the synthetic document")
+    parser.add_argument("--paragraphs", type=int, default=3, help="~350-word paragraphs per page")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per chunker (best is reported)")
+    parser.add_argument("--chunkers", default=",".join(CHUNKERS), help="comma-separated chunkers to run")
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    documents = _pages(args.pages, args.paragraphs)
+    chars = sum(len(doc.page_content) for doc in documents)
+    print(f"📄 {args.pages} pages, {chars / 1e6:.1f}M chars, chunk_size={args.chunk_size} "
+          f"overlap={args.chunk_overlap}")
+
+    results = [
+        _measure(name, documents, args.chunk_size, args.chunk_overlap, args.repeat)
+        for name in args.chunkers.split(",")
+    ]
+
+    print(f"\n{'chunker':<10} {'seconds':>8} {'MB/s':>7} {'chunks':>7} {'avg':>6} {'max':>6} "
+          f"{'peak MB':>8} {'kept MB':>8} {'exact':>6}")
+    for r in results:
+        print(f"{r['chunker']:<10} {r['seconds']:>8.3f} {chars / 1e6 / r['seconds']:>7.1f} {r['chunks']:>7} "
+              f"{r['avg_chars']:>6.0f} {r['max_chars']:>6} {r['peak_mb']:>8.1f} {r['retained_mb']:>8.1f} "
+              f"{r['accuracy']:>6.1%}")
+    print(f"\nProcess peak RSS: {common.peak_rss_mb() or 0:.0f} MB")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"pages": args.pages, "chars": chars, "results": results}, f, indent=2)
+        print(f"\n✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
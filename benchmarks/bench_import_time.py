@@ -0,0 +1,127 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import the RAG
+modules (what every new Streamlit server / OCR worker process pays), and
+what the first capabilities() probe costs on top.
+
+Each measurement is a new `python` process, repeated --runs times. With
+--baseline-ref the same imports are timed against the RAG/ folder of an
+older commit (extracted with `git archive`), so the improvement can be
+shown side by side:
+
+    python benchmarks/bench_import_time.py --runs 10 --baseline-ref HEAD~1
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+import common
+
+REPO_DIR = os.path.dirname(common.RAG_DIR)
+
+# Everything app.py imports from RAG/, in the same order
+APP_IMPORTS = ("metrics", "rag_utils_ocr", "index_cache", "embedding_service", "corpus",
+               "ingest_jobs", "rag_chain", "answer_cache", "hybrid_retrieval")
+
+_CHILD = """
+import json, os, sys, time
+sys.path.insert(0, {rag_dir!r})
+before = set(sys.modules)
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+imported = time.perf_counter() - start
+probe = None
+if {probe!r}:
+    import rag_utils_ocr
+    start = time.perf_counter()
+    if hasattr(rag_utils_ocr, "capabilities"):
+        rag_utils_ocr.capabilities()
+    else:
+        rag_utils_ocr.TESSERACT_OK
+    probe = time.perf_counter() - start
+print(json.dumps({{"import_s": imported, "probe_s": probe, "modules": len(set(sys.modules) - before)}}))
+"""
+
+
+def _extract_rag(ref, dest):
+    """Copy RAG/ as it was at `ref` into dest and return its path"""
+    archive = subprocess.run(["git", "archive", ref, "RAG"], cwd=REPO_DIR, capture_output=True, check=True)
+    with tarfile.open(fileobj=io.BytesIO(archive.stdout)) as tar:
+        tar.extractall(dest)
+    return os.path.join(dest, "RAG")
+
+
+def _time_imports(rag_dir, modules, runs, probe):
+    samples, errors = [], []
+    # An older --baseline-ref may predate some of the modules app.py imports now
+    modules = tuple(name for name in modules if os.path.exists(os.path.join(rag_dir, f"{name}.py")))
+    if not modules:
+        return {"error": "not in this version"}
+    code = _CHILD.format(rag_dir=rag_dir, modules=modules, probe=probe)
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    # Warm the OS file cache and the bytecode cache once; time the rest
+    subprocess.run([sys.executable, "-c", code], capture_output=True, env=env)
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+        if proc.returncode != 0:
+            errors.append(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+            continue
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    if not samples:
+        return {"error": errors[0] if errors else "no runs"}
+    imports = [s["import_s"] for s in samples]
+    probes = [s["probe_s"] for s in samples if s["probe_s"] is not None]
+    return {
+        "runs": len(samples),
+        "import_ms_p50": 1000 * common.percentile(imports, 50),
+        "import_ms_min": 1000 * min(imports),
+        "probe_ms_p50": 1000 * common.percentile(probes, 50) if probes else None,
+        "modules_loaded": samples[0]["modules"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--baseline-ref", help="git ref to compare against, e.g. HEAD~1")
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    targets = [(name, (name,)) for name in ("rag_utils_ocr", "corpus", "rag_chain")]
+    targets.append(("app imports", APP_IMPORTS))
+
+    variants = [("current", common.RAG_DIR)]
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.baseline_ref:
+            variants.insert(0, (args.baseline_ref, _extract_rag(args.baseline_ref, tmp)))
+
+        results = {}
+        for label, rag_dir in variants:
+            results[label] = {}
+            for name, modules in targets:
+                results[label][name] = _time_imports(rag_dir, modules, args.runs, probe=name == "rag_utils_ocr")
+
+    print(f"\n{'target':<16} {'variant':<14} {'import p50':>11} {'min':>9} {'1st probe':>10} {'modules':>8}")
+    for name, _ in targets:
+        for label, _ in variants:
+            r = results[label][name]
+            if "error" in r:
+                print(f"{name:<16} {label:<14} {'error: ' + r['error']}")
+                continue
+            probe = f"{r['probe_ms_p50']:.1f}ms" if r["probe_ms_p50"] is not None else "-"
+            print(f"{name:<16} {label:<14} {r['import_ms_p50']:>9.1f}ms {r['import_ms_min']:>7.1f}ms "
+                  f"{probe:>10} {r['modules_loaded']:>8}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"python": sys.version.split()[0], "platform": sys.platform, "results": results}, f, indent=2)
+        print(f"\n✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+OCR engine benchmark: pytesseract (one tesseract process per page) vs
+tesserocr (libtesseract initialized once per process), on the same
+preprocessed pages of a synthetic scan.
+
+Pages are rendered and preprocessed once up front, so only the engine
+call is timed. For each engine it reports the one-off initialization, the
+time per page (mean, p50, p99) and the fixed per-call overhead, measured
+on a tiny blank image where recognition itself costs next to nothing.
+Texts are compared with the known page text and with the first engine's.
+
+    python benchmarks/bench_ocr_engine.py --pages 20 --overhead-calls 20
+"""
+import argparse
+import difflib
+import json
+import os
+import random
+import time
+
+import common
+import synthetic_pdfs
+
+
+def _similarity(a, b):
+    return difflib.SequenceMatcher(None, a.lower().split(), b.lower().split(), autojunk=False).ratio()
+
+
+def _pages(pdf_path, num_pages):
+    import fitz
+    from rag_utils_ocr import OCR_ZOOM, pixmap_array, prepare_page_image, render_pixmap
+
+    images = []
+    with fitz.open(pdf_path) as pdf_doc:
+        for page_num in range(num_pages):
+            pix = render_pixmap(pdf_doc[page_num])
+            images.append(prepare_page_image(pixmap_array(pix), 72 * OCR_ZOOM))
+            del pix
+    return images
+
+
+def _measure(name, images, truths, overhead_calls):
+    from PIL import Image
+
+    from ocr_engines import ENGINES
+    from rag_utils_ocr import OCR_CONFIG, OCR_LANG
+
+    start = time.perf_counter()
+    engine = ENGINES[name](OCR_LANG, OCR_CONFIG)
+    # First call: pytesseract starts the executable, tesserocr warms up
+    tiny = Image.new("L", (64, 32), 255)
+    engine.image_to_string(tiny)
+    init_s = time.perf_counter() - start
+
+    overhead = []
+    for _ in range(overhead_calls):
+        start = time.perf_counter()
+        engine.image_to_string(tiny)
+        overhead.append(time.perf_counter() - start)
+
+    page_times, texts = [], []
+    for img in images:
+        if img is None:
+            texts.append("")
+            continue
+        start = time.perf_counter()
+        texts.append(engine.image_to_string(img))
+        page_times.append(time.perf_counter() - start)
+    engine.close()
+
+    scored = [(text, truth) for text, truth, img in zip(texts, truths, images) if img is not None]
+    return {
+        "engine": name,
+        "version": engine.version(),
+        "init_ms": 1000 * init_s,
+        "overhead_ms": 1000 * common.percentile(overhead, 50),
+        "page_mean_ms": 1000 * sum(page_times) / max(1, len(page_times)),
+        "page_p50_ms": 1000 * common.percentile(page_times, 50),
+        "page_p99_ms": 1000 * common.percentile(page_times, 99),
+        "pages_per_s": len(page_times) / (sum(page_times) or 1e-9),
+        "accuracy": sum(_similarity(t, truth) for t, truth in scored) / max(1, len(scored)),
+    }, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20, help="pages in the synthetic scan")
+    parser.add_argument("--engines", default="pytesseract,tesserocr", help="comma-separated engines to compare")
+    parser.add_argument("--overhead-calls", type=int, default=20, help="calls on a tiny image per engine")
+    parser.add_argument("--workdir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdfs"))
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    pdf_path = synthetic_pdfs.make_pdf(os.path.join(args.workdir, f"scanned-{args.pages}.pdf"),
+                                       "scanned", args.pages)
+    rng = random.Random(0)
+    truths = [synthetic_pdfs.page_text(n, rng) for n in range(args.pages)]
+    images = _pages(pdf_path, args.pages)
+
+    results, first_texts = [], None
+    for name in args.engines.split(","):
+        try:
+            result, texts = _measure(name, images, truths, args.overhead_calls)
+        except Exception as e:
+            print(f"⚠️ {name} skipped: {e}")
+            continue
+        if first_texts is None:
+            first_texts = texts
+        result["agreement"] = sum(_similarity(a, b) for a, b in zip(texts, first_texts) if a or b) / \
+            max(1, sum(1 for a, b in zip(texts, first_texts) if a or b))
+        results.append(result)
+
+    print(f"\n{args.pages} pages ({sum(img is not None for img in images)} OCRed)")
+    print(f"{'engine':<12} {'version':>8} {'init':>9} {'overhead':>9} {'mean':>9} {'p50':>9} {'p99':>9} "
+          f"{'pages/s':>8} {'accuracy':>9} {'agree':>6}")
+    for r in results:
+        print(f"{r['engine']:<12} {r['version']:>8} {r['init_ms']:>7.0f}ms {r['overhead_ms']:>7.1f}ms "
+              f"{r['page_mean_ms']:>7.0f}ms {r['page_p50_ms']:>7.0f}ms {r['page_p99_ms']:>7.0f}ms "
+              f"{r['pages_per_s']:>8.2f} {r['accuracy']:>9.3f} {r['agreement']:>6.3f}")
+    if len(results) > 1:
+        saved = results[0]["page_mean_ms"] - results[1]["page_mean_ms"]
+        print(f"\n{results[1]['engine']} vs {results[0]['engine']}: {saved:.0f}ms per page "
+              f"({saved / (results[0]['page_mean_ms'] or 1):.0%})")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+OCR preprocessing benchmark: the contrast boost on the whole page vs the
+NumPy stage in RAG/ocr_preprocess.py (binarize, skip blank pages, crop to
+text, deskew), on a synthetic "messy" scan with blank separator pages,
+photos and skewed pages whose text is known.
+
+Per page and path it times preprocessing and Tesseract and scores the OCR
+text against the page's real text (word-level similarity, 1.0 = exact; a
+blank page scores 1.0 when nothing is read). Without Tesseract only the
+preprocessing side is measured: blank pages found, pixels kept, skew.
+Tesseract is called directly, never through the OCR cache, so a rerun on
+the same (deterministic) scan times Tesseract again, not cache lookups.
+
+    python benchmarks/bench_ocr_preprocess.py --pages 20
+"""
+import argparse
+import difflib
+import json
+import os
+import random
+import time
+
+import common
+import synthetic_pdfs
+
+
+def _accuracy(text, truth):
+    words, truth_words = text.lower().split(), truth.lower().split()
+    if not truth_words:
+        return 1.0 if not words else 0.0
+    return difflib.SequenceMatcher(None, words, truth_words, autojunk=False).ratio()
+
+
+def _contrast(pix, view, dpi):
+    from rag_utils_ocr import enhance_contrast
+
+    return enhance_contrast(view), {}
+
+
+def _numpy(pix, view, dpi):
+    from ocr_preprocess import preprocess
+    from rag_utils_ocr import pixmap_array
+
+    # Straight from the pixmap's memory, as the OCR workers do
+    return preprocess(pixmap_array(pix), dpi)
+
+
+PATHS = {"contrast": _contrast, "numpy": _numpy}
+
+
+def _run(pdf_path, truths, ocr):
+    import fitz
+    from rag_utils_ocr import OCR_ZOOM, get_ocr_engine, render_page
+
+    dpi = 72 * OCR_ZOOM
+    rows = []
+    with fitz.open(pdf_path) as pdf_doc:
+        for page_num, truth in enumerate(truths):
+            for name, prepare in PATHS.items():
+                pix, view = render_page(pdf_doc[page_num])
+                start = time.perf_counter()
+                img, info = prepare(pix, view, dpi)
+                prepared = time.perf_counter() - start
+                text, ocr_s = "", 0.0
+                if ocr and img is not None:
+                    start = time.perf_counter()
+                    text = get_ocr_engine().image_to_string(img)
+                    ocr_s = time.perf_counter() - start
+                rows.append({
+                    "page": page_num,
+                    "path": name,
+                    "prep_s": prepared,
+                    "ocr_s": ocr_s,
+                    "blank": img is None,
+                    "truth_blank": not truth,
+                    "kept": info.get("kept", 1.0),
+                    "skew": info.get("skew", 0.0),
+                    "accuracy": _accuracy(text, truth) if ocr else None,
+                })
+                del img, view, pix
+    return rows
+
+
+def _summary(rows, name):
+    mine = [r for r in rows if r["path"] == name]
+    pages = len(mine) or 1
+    return {
+        "path": name,
+        "prep_ms": 1000 * sum(r["prep_s"] for r in mine) / pages,
+        "ocr_ms": 1000 * sum(r["ocr_s"] for r in mine) / pages,
+        "total_ms": 1000 * sum(r["prep_s"] + r["ocr_s"] for r in mine) / pages,
+        "blank_skipped": sum(r["blank"] for r in mine),
+        "blank_missed": sum(r["truth_blank"] and not r["blank"] for r in mine),
+        "text_skipped": sum(r["blank"] and not r["truth_blank"] for r in mine),
+        "kept": sum(r["kept"] for r in mine) / pages,
+        "accuracy": (sum(r["accuracy"] for r in mine) / pages) if mine and mine[0]["accuracy"] is not None else None,
+    }
+
+
+def main():
+    from rag_utils_ocr import capabilities
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20, help="pages in the synthetic messy scan")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdfs"))
+    parser.add_argument("--no-ocr", action="store_true", help="time preprocessing only")
+    parser.add_argument("--out", help="write per-page rows and the summary as JSON")
+    args = parser.parse_args()
+
+    pdf_path = synthetic_pdfs.make_pdf(os.path.join(args.workdir, f"messy-{args.pages}-{args.seed}.pdf"),
+                                       "messy", args.pages, args.seed)
+    rng = random.Random(args.seed)
+    truths = [
+        "" if synthetic_pdfs.is_blank("messy", n) else text
+        for n, text in ((n, synthetic_pdfs.page_text(n, rng)) for n in range(args.pages))
+    ]
+    ocr = not args.no_ocr and capabilities()["tesseract"]
+    if not ocr:
+        print("⚠️ Tesseract not used: timing preprocessing only")
+
+    rows = _run(pdf_path, truths, ocr)
+    summaries = [_summary(rows, name) for name in PATHS]
+
+    print(f"\n{args.pages} pages ({sum(not t for t in truths)} blank)")
+    print(f"{'path':<9} {'prep':>8} {'ocr':>8} {'total':>8} {'blank skipped':>14} {'text skipped':>13} "
+          f"{'pixels kept':>12} {'accuracy':>9}")
+    for s in summaries:
+        accuracy = f"{s['accuracy']:>9.3f}" if s["accuracy"] is not None else f"{'-':>9}"
+        print(f"{s['path']:<9} {s['prep_ms']:>6.0f}ms {s['ocr_ms']:>6.0f}ms {s['total_ms']:>6.0f}ms "
+              f"{s['blank_skipped']:>14} {s['text_skipped']:>13} {s['kept']:>12.0%} {accuracy}")
+    if ocr:
+        saved = summaries[0]["total_ms"] - summaries[1]["total_ms"]
+        print(f"\nSaved per page: {saved:.0f}ms ({saved / (summaries[0]['total_ms'] or 1):.0%})")
+    print(f"Process peak RSS: {common.peak_rss_mb() or 0:.0f} MB")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"summary": summaries, "pages": rows}, f, indent=2)
+        print(f"\n✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Page render benchmark: old PPM round-trip vs zero-copy grayscale view.
+
+Old path: RGB pixmap → pix.tobytes("ppm") → Image.open(BytesIO) → ImageEnhance.Contrast
+New path: gray pixmap → Image.frombuffer view over pix.samples → LUT contrast
+
+Each path runs in its own process so peak RSS is not shared between them.
+
+    python benchmarks/bench_page_render.py temp.pdf --pages 20 --ocr
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+import common
+
+
+def _legacy_render(page, zoom):
+    import io
+    import fitz
+    from PIL import Image, ImageEnhance
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    img_data = pix.tobytes("ppm")
+    img = Image.open(io.BytesIO(img_data))
+    img = ImageEnhance.Contrast(img).enhance(1.8)
+    # pixmap + PPM bytes + decoded image + ImageEnhance's gray image and blend output
+    copied = len(pix.samples_mv) + len(img_data) + 3 * img.width * img.height * len(img.getbands())
+    return pix, img, copied
+
+
+def _zero_copy_render(page, zoom):
+    from rag_utils_ocr import render_page, enhance_contrast
+
+    pix, view = render_page(page, zoom)
+    img = enhance_contrast(view)
+    # pixmap + LUT output (the view itself allocates nothing)
+    copied = len(pix.samples_mv) + img.width * img.height
+    return pix, img, copied
+
+
+def _run(variant, pdf_path, max_pages, zoom, ocr, queue):
+    import fitz
+
+    render = _legacy_render if variant == "legacy" else _zero_copy_render
+    if ocr:
+        import rag_utils_ocr
+    baseline = common.peak_rss_mb()
+    timings, copied_total, chars = [], 0, 0
+    with fitz.open(pdf_path) as pdf_doc:
+        for page_num in range(min(max_pages, len(pdf_doc))):
+            start = time.perf_counter()
+            pix, img, copied = render(pdf_doc[page_num], zoom)
+            if ocr:
+                chars += len(rag_utils_ocr.get_tesseract().image_to_string(
+                    img, lang=rag_utils_ocr.OCR_LANG, config=rag_utils_ocr.OCR_CONFIG).strip())
+            timings.append(time.perf_counter() - start)
+            copied_total += copied
+            del pix, img
+    peak = common.peak_rss_mb()
+    queue.put({
+        "variant": variant,
+        "pages": len(timings),
+        "avg_ms": 1000 * sum(timings) / max(len(timings), 1),
+        "p99_ms": 1000 * common.percentile(timings, 99),
+        "bytes_per_page_mb": copied_total / max(len(timings), 1) / (1024 * 1024),
+        "peak_rss_growth_mb": (peak - baseline) if peak is not None and baseline is not None else None,
+        "ocr_chars": chars if ocr else None,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", default="temp.pdf")
+    parser.add_argument("--pages", type=int, default=20, help="max pages to render")
+    parser.add_argument("--zoom", type=float, default=3)
+    parser.add_argument("--ocr", action="store_true", help="also run Tesseract to compare extracted text")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pdf):
+        raise SystemExit(f"❌ {args.pdf} not found")
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for variant in ("legacy", "zero-copy"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(variant, args.pdf, args.pages, args.zoom, args.ocr, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+
+    print(f"\n📄 {args.pdf} · zoom {args.zoom}x · {results[0]['pages']} pages")
+    print("=" * 78)
+    print(f"{'variant':<12}{'avg ms':>10}{'p99 ms':>10}{'alloc MB/pg':>12}{'peak RSS +MB':>15}{'OCR chars':>12}")
+    for r in results:
+        rss = f"{r['peak_rss_growth_mb']:.1f}" if r["peak_rss_growth_mb"] is not None else "n/a"
+        chars = r["ocr_chars"] if r["ocr_chars"] is not None else "-"
+        print(f"{r['variant']:<12}{r['avg_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+              f"{r['bytes_per_page_mb']:>12.1f}{rss:>15}{chars!s:>12}")
+    legacy, fast = results
+    if fast["avg_ms"]:
+        print(f"\n⚡ Speedup: {legacy['avg_ms'] / fast['avg_ms']:.2f}x, "
+              f"{legacy['bytes_per_page_mb'] - fast['bytes_per_page_mb']:.1f} MB less allocated per page")
+
+
+if __name__ == "__main__":
+    main()
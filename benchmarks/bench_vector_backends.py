@@ -0,0 +1,181 @@
+"""
+Vector backend benchmark: Chroma vs FAISS flat / IVF / HNSW, and flat
+indexes stored as float16 / int8 / binary codes with exact re-ranking.
+
+Uses synthetic clustered 384-d vectors (the size all-MiniLM-L6-v2
+produces) looked up by precomputed embeddings, so only the index itself is
+timed. For each backend one process builds and saves the index, and a
+second process loads it and runs the queries, so build and load memory are
+measured separately:
+
+    build_s, build_rss_mb       building + saving the index
+    disk_mb                     size of the saved files
+    load_s, load_rss_mb         reopening it: resident memory it adds (FAISS:
+                                mmap vs read into RAM)
+    p50/p99 ms, recall@k        query latency, overlap with exact search
+
+    python benchmarks/bench_vector_backends.py --vectors 20000,100000 --queries 200
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import common
+from langchain_core.embeddings import Embeddings
+
+DIM = 384
+
+# label -> (backend name, FaissBackend options)
+VARIANTS = {
+    "chroma": ("chroma", {}),
+    "faiss-flat": ("faiss", {"index_type": "flat"}),
+    "faiss-flat-nommap": ("faiss", {"index_type": "flat", "mmap": False}),
+    "faiss-ivf": ("faiss", {"index_type": "ivf"}),
+    "faiss-hnsw": ("faiss", {"index_type": "hnsw"}),
+    "faiss-float16": ("faiss", {"quantization": "float16"}),
+    "faiss-int8": ("faiss", {"quantization": "int8"}),
+    "faiss-int8-norerank": ("faiss", {"quantization": "int8", "rerank": 0}),
+    "faiss-binary": ("faiss", {"quantization": "binary"}),
+    "faiss-binary-rerank10": ("faiss", {"quantization": "binary", "rerank": 10}),
+    "faiss-binary-norerank": ("faiss", {"quantization": "binary", "rerank": 0}),
+}
+
+
+def _dataset(count, num_queries, seed=0):
+    """Clustered unit vectors, and queries that are noisy copies of stored ones"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(8, count // 200), DIM)).astype("float32")
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.3 * rng.normal(size=(count, DIM)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.integers(0, count, num_queries)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(num_queries, DIM)).astype("float32")
+    return vectors, queries
+
+
+class _PrecomputedEmbeddings(Embeddings):
+    """Looks vectors up by text ("chunk-12", "query-3") instead of running a model"""
+
+    def __init__(self, vectors, queries):
+        self.vectors = vectors
+        self.queries = queries
+
+    def embed_documents(self, texts):
+        return [self.vectors[int(t.split("-")[1])].tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self.queries[int(text.split("-")[1])].tolist()
+
+
+def _build(label, count, num_queries, directory, batch, queue):
+    from langchain_core.documents import Document
+    from vector_backends import get_backend
+
+    name, options = VARIANTS[label]
+    backend = get_backend(name, **options)
+    vectors, queries = _dataset(count, num_queries)
+    embeddings = _PrecomputedEmbeddings(vectors, queries)
+    docs = [Document(page_content=f"chunk-{i}", metadata={"i": i}) for i in range(count)]
+    baseline = common.peak_rss_mb()
+    start = time.perf_counter()
+    # Same shape as iter_ingest: create from the first batch, then add
+    store = backend.create(docs[:batch], embeddings, collection_name=f"bench-{label}", persist_directory=directory)
+    for first in range(batch, count, batch):
+        store.add_documents(docs[first:first + batch])
+    backend.finish(store, directory)
+    build_s = time.perf_counter() - start
+    disk = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(directory) for f in files)
+    queue.put({"build_s": build_s, "build_rss_mb": common.peak_rss_mb() - baseline, "disk_mb": disk / 2**20})
+
+
+def _query(label, count, num_queries, directory, k, queue):
+    import numpy as np
+    from vector_backends import get_backend
+
+    name, options = VARIANTS[label]
+    backend = get_backend(name, **options)
+    vectors, queries = _dataset(count, num_queries)
+    embeddings = _PrecomputedEmbeddings(vectors, queries)
+    # Libraries imported up front so load_rss_mb is the index alone
+    from langchain_community.vectorstores import FAISS  # noqa: F401
+    if name == "faiss":
+        import faiss  # noqa: F401
+    # Current (not peak) RSS: generating the dataset peaks higher than the load
+    baseline = common.rss_mb()
+    start = time.perf_counter()
+    store = backend.load(directory, embeddings, collection_name=f"bench-{label}")
+    load_s = time.perf_counter() - start
+    load_rss_mb = common.rss_mb() - baseline
+    latencies, found_ids = [], []
+    for q in range(num_queries):
+        start = time.perf_counter()
+        docs = store.similarity_search(f"query-{q}", k=k)
+        latencies.append(time.perf_counter() - start)
+        found_ids.append({doc.metadata["i"] for doc in docs})
+    # Exact neighbours by brute force
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+    found = sum(len(ids & set(exact[q].tolist())) for q, ids in enumerate(found_ids))
+    queue.put({
+        "load_s": load_s,
+        "load_rss_mb": load_rss_mb,
+        "p50_ms": 1000 * common.percentile(latencies, 50),
+        "p99_ms": 1000 * common.percentile(latencies, 99),
+        "recall": found / (k * num_queries),
+    })
+
+
+def _in_process(ctx, target, *args):
+    queue = ctx.Queue()
+    proc = ctx.Process(target=target, args=(*args, queue))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        return {"error": f"exit code {proc.exitcode}"}
+    return queue.get()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", default="20000", help="comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=2000, help="chunks per add, like an ingest batch")
+    parser.add_argument("--backends", default=",".join(VARIANTS))
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    print(f"\n{'backend':<22} {'vectors':>8} {'build':>8} {'build MB':>9} {'disk MB':>8} {'load':>8} "
+          f"{'load MB':>8} {'p50':>8} {'p99':>8} {'recall':>7}")
+    for count in [int(n) for n in args.vectors.split(",")]:
+        for label in args.backends.split(","):
+            directory = tempfile.mkdtemp(prefix=f"bench-{label}-")
+            try:
+                result = {"backend": label, "vectors": count}
+                result.update(_in_process(ctx, _build, label, count, args.queries, directory, args.batch))
+                if "error" not in result:
+                    result.update(_in_process(ctx, _query, label, count, args.queries, directory, args.k))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            results.append(result)
+            if "error" in result:
+                print(f"{label:<22} {count:>8} error: {result['error']}")
+                continue
+            print(f"{label:<22} {count:>8} {result['build_s']:>7.2f}s {result['build_rss_mb']:>9.0f} "
+                  f"{result['disk_mb']:>8.0f} {result['load_s']:>7.3f}s {result['load_rss_mb']:>8.0f} {result['p50_ms']:>6.2f}ms "
+                  f"{result['p99_ms']:>6.2f}ms {result['recall']:>7.3f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
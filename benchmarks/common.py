@@ -0,0 +1,36 @@
+"""
+Helpers shared by the benchmark scripts in this folder.
+Run the scripts from the repo root, e.g. `python benchmarks/bench_page_render.py temp.pdf`.
+"""
+import os
+import sys
+
+RAG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "RAG")
+if RAG_DIR not in sys.path:
+    sys.path.insert(0, RAG_DIR)
+
+from metrics import peak_rss_mb  # noqa: E402,F401  (re-exported for the scripts)
+
+
+def rss_mb():
+    """Current resident memory of this process in MB (None if it can't be read)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
@@ -0,0 +1,343 @@
+"""
+Offline ingestion + retrieval benchmark suite on synthetic PDFs.
+
+Generates native / scanned / mixed PDFs of the requested sizes, then runs
+each stage in a fresh process so its peak RSS is its own:
+
+    extraction (every kind): pdfplumber, PyPDFLoader, PyMuPDF OCR, pdf2image OCR
+    downstream (native text): splitting, embedding, index build, retrieval
+
+Results (pages/sec, items/sec, peak RSS, retrieval p50/p99) are written to a
+JSON report; --compare flags stages that got slower or fatter than a
+previous report.
+
+    python benchmarks/run_suite.py --sizes 10,100,1000 --out bench_report.json
+    python benchmarks/run_suite.py --sizes 10,100 --compare bench_report.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import common
+import synthetic_pdfs
+
+EXTRACTION_STAGES = ("pdfplumber", "PyPDFLoader", "PyMuPDF-OCR", "pdf2image-OCR")
+DOWNSTREAM_STAGES = ("split", "embed", "index-build", "retrieval")
+
+
+# ===== Stages (run inside a fresh worker process) =====
+
+def _page_texts(num_pages):
+    """The exact text the generator put on each page"""
+    import random
+
+    rng = random.Random(0)
+    return [synthetic_pdfs.page_text(page_num, rng) for page_num in range(num_pages)]
+
+
+def _chunks(num_pages):
+    from langchain_core.documents import Document
+    from rag_utils_ocr import split_documents
+
+    docs = [Document(page_content=text, metadata={"page": idx}) for idx, text in enumerate(_page_texts(num_pages))]
+    return split_documents(docs)
+
+
+def stage_pdfplumber(pdf_path, num_pages, opts):
+    import pdfplumber
+
+    start = time.perf_counter()
+    chars = 0
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            chars += len(page.extract_text() or "")
+    return {"seconds": time.perf_counter() - start, "pages": num_pages, "items": chars}
+
+
+def stage_pypdfloader(pdf_path, num_pages, opts):
+    from langchain_community.document_loaders import PyPDFLoader
+
+    start = time.perf_counter()
+    chars = sum(len(doc.page_content) for doc in PyPDFLoader(pdf_path).lazy_load())
+    return {"seconds": time.perf_counter() - start, "pages": num_pages, "items": chars}
+
+
+def _ocr_cache_hits():
+    from metrics import metrics
+
+    return sum(v for series, v in metrics.snapshot()["counters"].items()
+               if series.startswith("rag_ocr_cache_hits_total"))
+
+
+def _ocr_stage(ocr_pages, available, pdf_path, num_pages, opts):
+    if not available:
+        return {"skipped": "OCR backend not available"}
+    import tempfile
+
+    pages = list(range(min(num_pages, opts["ocr_pages"])))
+    # A cold OCR cache of its own: the synthetic PDFs are deterministic, so
+    # with the persistent one a second run would time lookups, not Tesseract.
+    # Set before ocr_cache is imported here or in the pool workers.
+    with tempfile.TemporaryDirectory(prefix="bench-ocr-cache-") as folder:
+        os.environ["OCR_CACHE_PATH"] = os.path.join(folder, "ocr_cache.sqlite3")
+        start = time.perf_counter()
+        results = ocr_pages(pdf_path, pages=pages, workers=opts["ocr_workers"])
+        seconds = time.perf_counter() - start
+        cache_hits = _ocr_cache_hits()
+        from ocr_cache import get_ocr_cache
+
+        cache = get_ocr_cache()
+        if cache is not None:
+            cache.close()
+    return {
+        "seconds": seconds,
+        "pages": len(pages),
+        "items": sum(len(text) for _, text, _, _ in results),
+        "page_seconds_p50": common.percentile([s for _, _, s, _ in results], 50),
+        "page_seconds_p99": common.percentile([s for _, _, s, _ in results], 99),
+        "ocr_cache_hits": cache_hits,
+    }
+
+
+def stage_pymupdf_ocr(pdf_path, num_pages, opts):
+    import rag_utils_ocr as r
+
+    return _ocr_stage(r.ocr_pages_with_pymupdf, r.PYMUPDF_OK and r.TESSERACT_OK, pdf_path, num_pages, opts)
+
+
+def stage_pdf2image_ocr(pdf_path, num_pages, opts):
+    import rag_utils_ocr as r
+
+    return _ocr_stage(r.ocr_pages_with_pdf2image, r.PDF2IMAGE_OK and r.POPPLER_OK and r.TESSERACT_OK,
+                      pdf_path, num_pages, opts)
+
+
+def stage_split(pdf_path, num_pages, opts):
+    start = time.perf_counter()
+    chunks = _chunks(num_pages)
+    return {"seconds": time.perf_counter() - start, "pages": num_pages, "items": len(chunks)}
+
+
+def stage_embed(pdf_path, num_pages, opts):
+    from embedding_service import get_embedding_service
+    from rag_utils_ocr import EMBEDDING_MODEL
+
+    texts = [c.page_content for c in _chunks(num_pages)][:opts["embed_chunks"]]
+    service = get_embedding_service(EMBEDDING_MODEL, batch_size=opts["batch_size"])
+    start = time.perf_counter()
+    service.embed_documents(texts)
+    return {
+        "seconds": time.perf_counter() - start,
+        "pages": num_pages,
+        "items": len(texts),
+        "model_load_seconds": service.load_seconds,
+    }
+
+
+class _PrecomputedEmbeddings:
+    """Looks vectors up instead of running the model, to time index build alone"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[t] for t in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def stage_index_build(pdf_path, num_pages, opts):
+    from langchain_community.vectorstores import Chroma
+    from embedding_service import get_embedding_service
+    from rag_utils_ocr import EMBEDDING_MODEL
+
+    texts = [c.page_content for c in _chunks(num_pages)][:opts["embed_chunks"]]
+    service = get_embedding_service(EMBEDDING_MODEL, batch_size=opts["batch_size"])
+    vectors = dict(zip(texts, service.embed_documents(texts)))
+    start = time.perf_counter()
+    Chroma.from_texts(texts, _PrecomputedEmbeddings(vectors), collection_name="bench-build")
+    return {"seconds": time.perf_counter() - start, "pages": num_pages, "items": len(texts)}
+
+
+def stage_retrieval(pdf_path, num_pages, opts):
+    from langchain_community.vectorstores import Chroma
+    from embedding_service import get_embedding_service
+    from hybrid_retrieval import BM25Index
+    from rag_utils_ocr import EMBEDDING_MODEL, PdfIndex
+
+    chunks = _chunks(num_pages)
+    service = get_embedding_service(EMBEDDING_MODEL, batch_size=opts["batch_size"])
+    vectorstore = Chroma.from_documents(chunks, service, collection_name="bench-retrieval")
+    lexical = BM25Index()
+    lexical.add_documents(chunks)
+    retrievers = {
+        "dense": vectorstore.as_retriever(),
+        "hybrid": PdfIndex(vectorstore, lexical).as_retriever(),
+    }
+
+    result = {"pages": num_pages, "items": 0, "seconds": 0.0}
+    queries = synthetic_pdfs.facts(num_pages) * max(1, opts["query_repeats"])
+    for name, retriever in retrievers.items():
+        latencies, hits = [], 0
+        for query, expected_page in queries:
+            start = time.perf_counter()
+            docs = retriever.invoke(query)
+            latencies.append(time.perf_counter() - start)
+            hits += any(doc.metadata.get("page") == expected_page for doc in docs)
+        result[f"{name}_p50_ms"] = 1000 * common.percentile(latencies, 50)
+        result[f"{name}_p99_ms"] = 1000 * common.percentile(latencies, 99)
+        result[f"{name}_hit_rate"] = hits / len(queries)
+        result["items"] += len(queries)
+        result["seconds"] += sum(latencies)
+    return result
+
+
+STAGES = {
+    "pdfplumber": stage_pdfplumber,
+    "PyPDFLoader": stage_pypdfloader,
+    "PyMuPDF-OCR": stage_pymupdf_ocr,
+    "pdf2image-OCR": stage_pdf2image_ocr,
+    "split": stage_split,
+    "embed": stage_embed,
+    "index-build": stage_index_build,
+    "retrieval": stage_retrieval,
+}
+
+
+def _run_stage(name, pdf_path, num_pages, opts):
+    baseline = common.peak_rss_mb()
+    try:
+        result = STAGES[name](pdf_path, num_pages, opts)
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    peak = common.peak_rss_mb()
+    result["peak_rss_mb"] = peak
+    if peak is not None and baseline is not None:
+        result["peak_rss_growth_mb"] = peak - baseline
+    if result.get("seconds"):
+        result["pages_per_sec"] = result["pages"] / result["seconds"]
+        result["items_per_sec"] = result["items"] / result["seconds"]
+    return result
+
+
+# ===== Driver =====
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(report, baseline, tolerance):
+    """Print per-stage deltas against a previous report; returns the regressions"""
+    old = {(r["pdf"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'pdf':<16}{'stage':<15}{'seconds':>22}{'peak RSS MB':>22}")
+    for r in report["results"]:
+        prev = old.get((r["pdf"], r["stage"]))
+        if not prev or not r.get("seconds") or not prev.get("seconds"):
+            continue
+        ratio = r["seconds"] / prev["seconds"]
+        rss_now, rss_old = r.get("peak_rss_mb"), prev.get("peak_rss_mb")
+        rss_ratio = rss_now / rss_old if rss_now and rss_old else 1.0
+        flag = ""
+        if ratio > 1 + tolerance or rss_ratio > 1 + tolerance:
+            flag = "  ❌ regression"
+            regressions.append((r["pdf"], r["stage"]))
+        print(f"{r['pdf']:<16}{r['stage']:<15}"
+              f"{prev['seconds']:>9.2f} → {r['seconds']:<7.2f}({ratio:.2f}x)"
+              f"{(rss_old or 0):>9.0f} → {(rss_now or 0):<7.0f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100", help="comma-separated page counts")
+    parser.add_argument("--kinds", default="native,scanned,mixed")
+    parser.add_argument("--stages", default=",".join(EXTRACTION_STAGES + DOWNSTREAM_STAGES))
+    parser.add_argument("--workdir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdfs"))
+    parser.add_argument("--out", default="bench_report.json")
+    parser.add_argument("--compare", help="previous report to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging")
+    parser.add_argument("--ocr-pages", type=int, default=20, help="max pages OCR'd per PDF")
+    parser.add_argument("--ocr-workers", type=int, default=None)
+    parser.add_argument("--embed-chunks", type=int, default=2000, help="max chunks embedded/indexed")
+    parser.add_argument("--batch-size", type=int, default=None, help="embedding batch size")
+    parser.add_argument("--query-repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    kinds = [k for k in args.kinds.split(",") if k]
+    stages = [s for s in args.stages.split(",") if s]
+    opts = {
+        "ocr_pages": args.ocr_pages,
+        "ocr_workers": args.ocr_workers,
+        "embed_chunks": args.embed_chunks,
+        "batch_size": args.batch_size,
+        "query_repeats": args.query_repeats,
+    }
+
+    jobs = []
+    for size in sizes:
+        for kind in kinds:
+            pdf_path = os.path.join(args.workdir, f"{kind}-{size}.pdf")
+            print(f"📄 Generating {pdf_path}...")
+            synthetic_pdfs.make_pdf(pdf_path, kind, size)
+            jobs += [(f"{kind}-{size}", s, pdf_path, size) for s in stages if s in EXTRACTION_STAGES]
+        # Downstream stages only depend on the text, not how the PDF was made
+        jobs += [(f"text-{size}", s, None, size) for s in stages if s in DOWNSTREAM_STAGES]
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for label, stage, pdf_path, size in jobs:
+        print(f"⏱️ {label:<16}{stage:<15}", end="", flush=True)
+        with ctx.Pool(1) as pool:
+            result = pool.apply(_run_stage, (stage, pdf_path, size, opts))
+        result.update(pdf=label, stage=stage)
+        results.append(result)
+        if "seconds" in result:
+            cache_hits = f"  {result['ocr_cache_hits']} OCR cache hits" if "ocr_cache_hits" in result else ""
+            print(f"{result['seconds']:8.2f}s  {result.get('pages_per_sec', 0):8.1f} pages/s  "
+                  f"peak {result['peak_rss_mb'] or 0:.0f} MB{cache_hits}")
+        else:
+            print(f"  ⚠️ {result.get('skipped') or result.get('error')}")
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "options": opts,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Report written to {args.out}")
+
+    for r in results:
+        if r["stage"] == "retrieval" and "dense_p50_ms" in r:
+            print(f"🔎 {r['pdf']}: dense p50 {r['dense_p50_ms']:.1f} ms / p99 {r['dense_p99_ms']:.1f} ms "
+                  f"(hit {r['dense_hit_rate']:.0%}), hybrid p50 {r['hybrid_p50_ms']:.1f} ms / "
+                  f"p99 {r['hybrid_p99_ms']:.1f} ms (hit {r['hybrid_hit_rate']:.0%})")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} stage(s) regressed beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Deterministic synthetic PDFs for the benchmarks: no real documents needed.
+
+    native   text layer on every page
+    scanned  every page is a rasterized image (no text layer)
+    mixed    every third page scanned, the rest native
+    messy    scanned, with what real scans have: every fifth page a blank
+             separator, photos on some pages, a few pages slightly skewed
+
+Pages contain contract-style prose with clause numbers and part codes, so
+both dense and lexical retrieval have something to find. `FACTS` lists
+(query, expected page) pairs for retrieval checks.
+
+    python benchmarks/synthetic_pdfs.py --kind mixed --pages 100 out.pdf
+"""
+import argparse
+import os
+import random
+
+WORDS = (
+    "agreement party parties supplier customer delivery payment invoice term termination notice "
+    "warranty liability service schedule clause section obligation confidential information "
+    "breach remedy period written consent law jurisdiction dispute price order goods quantity "
+    "inspection acceptance defect replacement insurance indemnity force majeure renewal audit "
+    "records report quality standard compliance assignment subcontract fee interest late"
+).split()
+
+DPI_SCANNED = 150
+
+
+def page_text(page_num, rng):
+    """About 350 words of clause-like prose with a unique clause and part code"""
+    clause = f"{page_num // 10 + 1}.{page_num % 10 + 1}"
+    part = f"PX-{1000 + page_num}"
+    sentences = [f"Clause {clause}. Part {part} is covered by this section."]
+    while sum(len(s.split()) for s in sentences) < 350:
+        words = rng.choices(WORDS, k=rng.randint(8, 18))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def facts(num_pages):
+    """(query, expected 0-based page) pairs answerable from the generated text"""
+    step = max(1, num_pages // 20)
+    pairs = []
+    for page_num in range(0, num_pages, step):
+        pairs.append((f"PX-{1000 + page_num}", page_num))
+        pairs.append((f"What does clause {page_num // 10 + 1}.{page_num % 10 + 1} cover?", page_num))
+    return pairs
+
+
+def _is_scanned(kind, page_num):
+    return kind in ("scanned", "messy") or (kind == "mixed" and page_num % 3 == 2)
+
+
+def is_blank(kind, page_num):
+    return kind == "messy" and page_num % 5 == 4
+
+
+def _has_photo(kind, page_num):
+    return kind == "messy" and page_num % 4 == 1
+
+
+SKEW_DEGREES = 1.5
+
+
+def _is_skewed(kind, page_num):
+    return kind == "messy" and page_num % 3 == 0
+
+
+def _photo_png(seed, width=480, height=260):
+    """A smooth random grayscale 'photo' with some grain"""
+    import fitz
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(30, 230, size=(height // 20 + 2, width // 20 + 2)).astype(np.float32)
+    ys, xs = np.linspace(0, coarse.shape[0] - 1.01, height), np.linspace(0, coarse.shape[1] - 1.01, width)
+    y0, x0 = ys.astype(int), xs.astype(int)
+    fy, fx = (ys - y0)[:, None], (xs - x0)[None, :]
+    img = (coarse[y0][:, x0] * (1 - fy) * (1 - fx) + coarse[y0 + 1][:, x0] * fy * (1 - fx)
+           + coarse[y0][:, x0 + 1] * (1 - fy) * fx + coarse[y0 + 1][:, x0 + 1] * fy * fx)
+    img = np.clip(img + rng.normal(0, 12, img.shape), 0, 255).astype(np.uint8)
+    pix = fitz.Pixmap(fitz.csGRAY, width, height, img.tobytes(), False)
+    return pix.tobytes("png")
+
+
+def _scan(page, skew):
+    """The page as a grayscale JPEG, as a scanner would produce it"""
+    import fitz
+
+    pix = page.get_pixmap(dpi=DPI_SCANNED, colorspace=fitz.csGRAY)
+    if not skew:
+        return pix.tobytes("jpeg")
+    import io
+    from PIL import Image
+
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples).rotate(skew, fillcolor=255)
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+def make_pdf(path, kind="native", num_pages=10, seed=0):
+    """Write a synthetic PDF and return its path (skips work if it already exists)"""
+    import fitz
+
+    if os.path.exists(path):
+        return path
+    rng = random.Random(seed)
+    out = fitz.open()
+    scratch = fitz.open()
+    for page_num in range(num_pages):
+        text = page_text(page_num, rng)
+        page = (scratch if _is_scanned(kind, page_num) else out).new_page()
+        if not is_blank(kind, page_num):
+            page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50),
+                                text, fontsize=10, fontname="helv")
+        if _has_photo(kind, page_num):
+            page.insert_image(fitz.Rect(60, page.rect.height - 330, page.rect.width - 60, page.rect.height - 70),
+                              stream=_photo_png(seed * 1000 + page_num))
+        if _is_scanned(kind, page_num):
+            # Rasterize the text page and keep only the image, like a scanner would
+            image_page = out.new_page(width=page.rect.width, height=page.rect.height)
+            image_page.insert_image(image_page.rect,
+                                    stream=_scan(page, SKEW_DEGREES if _is_skewed(kind, page_num) else 0))
+            scratch.delete_page(0)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    out.save(path, garbage=3, deflate=True)
+    out.close()
+    scratch.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out")
+    parser.add_argument("--kind", choices=("native", "scanned", "mixed", "messy"), default="native")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if os.path.exists(args.out):
+        os.remove(args.out)
+    make_pdf(args.out, args.kind, args.pages, args.seed)
+    print(f"✅ Wrote {args.out} ({args.kind}, {args.pages} pages)")
+
+
+if __name__ == "__main__":
+    main()